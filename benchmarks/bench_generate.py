@@ -0,0 +1,321 @@
+"""
+Generation throughput benchmarks.
+
+Times each top-level generator and each planner page drawer in a fresh
+process, recording pages/sec, output size and peak RSS. The startup_* cases
+time imports and `generate.py --help` instead, with one "page" per start. Results can be saved
+as JSON and compared against a stored baseline:
+
+    python benchmarks/bench_generate.py                    # run and compare to baseline.json
+    python benchmarks/bench_generate.py --save out.json    # also save the results
+    python benchmarks/bench_generate.py --update-baseline  # store the results as the new baseline
+    python benchmarks/bench_generate.py daily_page icon    # run only some cases
+
+The exit status is 1 when a case is slower or larger than the baseline by more
+than --tolerance. Baselines are machine-specific; regenerate them on the
+machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BENCH_YEAR = 2026
+
+def _peak_rss_kb():
+    # ru_maxrss is in KiB on Linux but bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def _run_generator(generate):
+    """
+    Runs a generator writing to a temporary file; returns (seconds, pages, bytes)
+    and the peak RSS of the generation with the number of link annotations and
+    objects in the output.
+    """
+    from planner.core.pdffile import read_pdf
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.pdf")
+        start = time.perf_counter()
+        generate(path)
+        seconds = time.perf_counter() - start
+        # Before the output is read back and parsed, which takes more memory than some builds
+        peak_rss_kb = _peak_rss_kb()
+        with open(path, "rb") as f:
+            data = f.read()
+    doc = read_pdf(data)
+    page_refs = doc.page_refs()
+    annotations = sum(len(doc.get(doc.get(ref).get("Annots", []))) for ref in page_refs)
+    return seconds, len(page_refs), len(data), {"peak_rss_kb": peak_rss_kb, "annotations": annotations,
+                                                "objects": len(doc.objects)}
+
+def _run_pages(draw_func, arg_list):
+    """Renders one page per args tuple with draw_func; returns (seconds, pages, bytes)."""
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    from planner.core.render import render_pages
+    pages = [(None, draw_func, args) for args in arg_list]
+    start = time.perf_counter()
+    data = render_pages(pages, IPAD_PRO_11_LANDSCAPE)
+    return time.perf_counter() - start, len(pages), len(data)
+
+def bench_year_pdf():
+    from planner import generate_year_pdf
+    return _run_generator(lambda path: generate_year_pdf(BENCH_YEAR, path))
+
+def bench_year_pdf_streaming():
+    from planner import generate_year_pdf
+    return _run_generator(lambda path: generate_year_pdf(BENCH_YEAR, path, streaming=True))
+
+def bench_range_pdf_2y():
+    from planner import generate_range_pdf
+    return _run_generator(lambda path: generate_range_pdf(date(BENCH_YEAR, 1, 1), date(BENCH_YEAR + 1, 12, 31), path))
+
+def bench_range_pdf_5y():
+    from planner import generate_range_pdf
+    return _run_generator(lambda path: generate_range_pdf(date(BENCH_YEAR, 1, 1), date(BENCH_YEAR + 4, 12, 31), path))
+
+def bench_range_pdf_5y_streaming():
+    from planner import generate_range_pdf
+    return _run_generator(lambda path: generate_range_pdf(date(BENCH_YEAR, 1, 1), date(BENCH_YEAR + 4, 12, 31), path,
+                                                          streaming=True))
+
+def bench_meeting_notes_pdf():
+    from planner import generate_meeting_notes_pdf
+    return _run_generator(generate_meeting_notes_pdf)
+
+def bench_bi_requirements_pdf():
+    from planner import generate_bi_requirements_pdf
+    return _run_generator(generate_bi_requirements_pdf)
+
+# Compact (object stream) variants; their sizes next to the plain cases compare the two per template
+def bench_year_pdf_compact():
+    from planner import generate_year_pdf
+    return _run_generator(lambda path: generate_year_pdf(BENCH_YEAR, path, compact=True))
+
+def bench_meeting_notes_pdf_compact():
+    from planner import generate_meeting_notes_pdf
+    return _run_generator(lambda path: generate_meeting_notes_pdf(path, compact=True))
+
+def bench_bi_requirements_pdf_compact():
+    from planner import generate_bi_requirements_pdf
+    return _run_generator(lambda path: generate_bi_requirements_pdf(path, compact=True))
+
+def _bench_period():
+    from planner.core.yearmodel import planner_periods
+    return planner_periods(date(BENCH_YEAR, 1, 1), date(BENCH_YEAR, 12, 31))[0]
+
+def bench_daily_page():
+    from planner.templates.planner import draw_daily_page
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    period = _bench_period()
+    return _run_pages(draw_daily_page, [(period, datetime(BENCH_YEAR, 1, d), W, H) for d in range(1, 32)])
+
+def bench_monthly_page():
+    from planner.templates.planner import draw_monthly_page
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    period = _bench_period()
+    return _run_pages(draw_monthly_page, [(period, BENCH_YEAR, m, W, H) for m in range(1, 13)])
+
+def bench_yearly_tracker():
+    from planner.templates.planner import draw_yearly_tracker
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    period = _bench_period()
+    return _run_pages(draw_yearly_tracker, [(period, W, H)] * 10)
+
+def bench_six_month_overview():
+    from planner.templates.planner import draw_six_month_overview
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    period = _bench_period()
+    return _run_pages(draw_six_month_overview, [(period, 6*(i % 2), W, H) for i in range(10)])
+
+def bench_summary_page():
+    from planner.templates.planner import draw_summary_page
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    period = _bench_period()
+    return _run_pages(draw_summary_page, [(period, W, H)] * 10)
+
+def bench_meeting_notes_page():
+    from planner.templates.meeting_notes import draw_meeting_notes_page
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return _run_pages(draw_meeting_notes_page, [(W, H)] * 50)
+
+def bench_bi_requirements_page():
+    from planner.templates.bi_requirements import draw_bi_requirements_page
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return _run_pages(draw_bi_requirements_page, [(W, H)] * 50)
+
+def _draw_icon_page(c, W, H):
+    from reportlab.lib.units import mm
+    from planner.core.constants import ICONS, MONTH_COLORS
+    from planner.core.utils import draw_icon
+    for i in range(200):
+        icon_key = list(ICONS)[i % len(ICONS)]
+        draw_icon(c, icon_key, 10*mm + (i % 20) * 10*mm, 10*mm + (i // 20) * 10*mm, 4.5*mm,
+                  MONTH_COLORS[i % 12])
+
+def bench_icon():
+    from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return _run_pages(_draw_icon_page, [(W, H)] * 10)
+
+def _time_import(module):
+    """Times importing a module in a fresh interpreter; returns (seconds, 1, 0)."""
+    import importlib
+    start = time.perf_counter()
+    importlib.import_module(module)
+    return time.perf_counter() - start, 1, 0
+
+def bench_startup_package():
+    return _time_import("planner")
+
+def bench_startup_meeting_notes():
+    return _time_import("planner.templates.meeting_notes")
+
+def bench_startup_cli_help():
+    # Includes interpreter startup, as paid by every CLI invocation
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "generate.py"), "--help"],
+                   check=True, capture_output=True)
+    return time.perf_counter() - start, 1, 0
+
+# Cases that measure imports, so nothing may be imported before they run
+STARTUP_CASES = {"startup_package", "startup_meeting_notes", "startup_cli_help"}
+
+CASES = {
+    "year_pdf": bench_year_pdf,
+    "year_pdf_streaming": bench_year_pdf_streaming,
+    "range_pdf_2y": bench_range_pdf_2y,
+    "range_pdf_5y": bench_range_pdf_5y,
+    "range_pdf_5y_streaming": bench_range_pdf_5y_streaming,
+    "meeting_notes_pdf": bench_meeting_notes_pdf,
+    "bi_requirements_pdf": bench_bi_requirements_pdf,
+    "year_pdf_compact": bench_year_pdf_compact,
+    "meeting_notes_pdf_compact": bench_meeting_notes_pdf_compact,
+    "bi_requirements_pdf_compact": bench_bi_requirements_pdf_compact,
+    "daily_page": bench_daily_page,
+    "monthly_page": bench_monthly_page,
+    "yearly_tracker": bench_yearly_tracker,
+    "six_month_overview": bench_six_month_overview,
+    "summary_page": bench_summary_page,
+    "meeting_notes_page": bench_meeting_notes_page,
+    "bi_requirements_page": bench_bi_requirements_page,
+    "icon": bench_icon,
+    "startup_package": bench_startup_package,
+    "startup_meeting_notes": bench_startup_meeting_notes,
+    "startup_cli_help": bench_startup_cli_help,
+}
+
+def run_case_in_process(name):
+    """Child side: runs one case and prints its measurements as JSON."""
+    # Import everything before timing so the numbers are about rendering only
+    if name not in STARTUP_CASES:
+        import planner.templates.planner, planner.templates.meeting_notes, planner.templates.bi_requirements
+    seconds, pages, size, *counts = CASES[name]()
+    print(json.dumps({
+        "seconds": round(seconds, 4),
+        "pages": pages,
+        "pages_per_sec": round(pages / seconds, 2),
+        "bytes": size,
+        "peak_rss_kb": _peak_rss_kb(),
+        # Generator cases measure the peak RSS themselves
+        **(counts[0] if counts else {}),
+    }))
+
+def run_case(name, repeat):
+    """Runs a case `repeat` times, each in a fresh interpreter, and keeps the fastest run."""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name],
+                             check=True, capture_output=True, text=True, cwd=ROOT).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+def compare(results, baseline, tolerance):
+    """Prints the comparison with a baseline; returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<22}{'pages/s':>10}{'base':>10}{'change':>9}{'bytes':>11}{'base':>11}")
+    for name, r in results.items():
+        b = baseline.get("results", {}).get(name)
+        if not b:
+            print(f"{name:<22}{r['pages_per_sec']:>10.1f}{'-':>10}{'':>9}{r['bytes']:>11}{'-':>11}")
+            continue
+        change = r["pages_per_sec"] / b["pages_per_sec"] - 1
+        regressed = (change < -tolerance or r["bytes"] > b["bytes"] * (1 + tolerance)
+                     or r["peak_rss_kb"] > b["peak_rss_kb"] * (1 + tolerance))
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<22}{r['pages_per_sec']:>10.1f}{b['pages_per_sec']:>10.1f}{change:>+9.1%}"
+              f"{r['bytes']:>11}{b['bytes']:>11}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF generation throughput.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    parser.add_argument("--save", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown / size / memory growth (fraction)")
+    parser.add_argument("--child", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_case_in_process(args.child)
+        return
+
+    names = args.cases or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    import reportlab
+    results = {}
+    for name in names:
+        results[name] = r = run_case(name, args.repeat)
+        print(f"{name:<22}{r['pages']:>5} pages  {r['seconds']:>8.3f}s  {r['pages_per_sec']:>8.1f} pages/s"
+              f"  {r['bytes']:>9} bytes  {r['peak_rss_kb']:>7} KiB peak RSS"
+              + (f"  {r['annotations']} annotations  {r['objects']} objects" if "objects" in r else ""))
+
+    report = {
+        "python": platform.python_version(),
+        "reportlab": reportlab.Version,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
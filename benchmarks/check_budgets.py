@@ -0,0 +1,95 @@
+"""
+Page weight budgets.
+
+Generates every template, analyzes the output per page type (see
+planner/core/analyze.py) and compares it with the budgets in budgets.json:
+the most content bytes, operators, path segments, annotations, graphics
+states and objects a page of each type may have, and the bytes and objects
+per page of the whole document.
+
+    python benchmarks/check_budgets.py                    # check all templates
+    python benchmarks/check_budgets.py planner            # check some templates
+    python benchmarks/check_budgets.py --update-budgets   # budgets = current outputs + headroom
+
+The exit status is 1 when a metric is over its budget. Unlike timings, the
+metrics do not depend on the machine, so the budgets are shared. Raise a
+budget in the same change that makes pages heavier on purpose.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "budgets.json")
+BENCH_YEAR = 2026
+
+def analyze_template(template):
+    """Generates a template to a temporary file and returns its report."""
+    from planner import TEMPLATES, get_generator
+    from planner.core.analyze import analyze_file, page_types
+    from planner.core.render import template_pages
+    module, function, yearly = TEMPLATES[template]
+    generate = get_generator(template)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.pdf")
+        generate(BENCH_YEAR, path) if yearly else generate(path)
+        pages, pagesize = template_pages(template, BENCH_YEAR)
+        return analyze_file(path, page_types(pages))
+
+def main():
+    from planner import TEMPLATES
+    from planner.core.analyze import check_budgets, format_report, report_budget
+    parser = argparse.ArgumentParser(description="Check generated PDFs against page weight budgets.")
+    parser.add_argument("templates", nargs="*", help=f"Templates to check (default: all of {', '.join(TEMPLATES)})")
+    parser.add_argument("--budgets", type=str, default=BUDGETS_PATH, help="Budgets JSON")
+    parser.add_argument("--update-budgets", action="store_true",
+                        help="Store the current outputs plus --headroom as the budgets")
+    parser.add_argument("--headroom", type=float, default=0.1, help="Growth allowed by --update-budgets (fraction)")
+    parser.add_argument("--verbose", action="store_true", help="Print the full report of every template")
+    args = parser.parse_args()
+
+    names = args.templates or list(TEMPLATES)
+    unknown = [n for n in names if n not in TEMPLATES]
+    if unknown:
+        parser.error(f"unknown template(s): {', '.join(unknown)}")
+
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets) as f:
+            budgets = json.load(f)
+
+    over = []
+    for name in names:
+        report = analyze_template(name)
+        if args.verbose:
+            print(f"{name}\n{format_report(report)}\n")
+        if args.update_budgets:
+            budgets[name] = report_budget(report, args.headroom)
+            continue
+        if name not in budgets:
+            print(f"{name:<18}no budget")
+            over.append(name)
+            continue
+        failures = check_budgets(report, budgets[name])
+        print(f"{name:<18}{'OVER BUDGET' if failures else 'ok'}")
+        for failure in failures:
+            print(f"    {failure}")
+        if failures:
+            over.append(name)
+
+    if args.update_budgets:
+        with open(args.budgets, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"Budgets written to {args.budgets}")
+        return
+    if over:
+        print(f"\nOver budget: {', '.join(over)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,276 @@
 import argparse
+import os
+import signal
+import sys
+import time
 from datetime import datetime
-from planner import (
-    generate_year_pdf, 
-    generate_meeting_notes_pdf, 
-    generate_bi_requirements_pdf
-)
+# Templates and reportlab are imported by the command that needs them, which keeps --help fast
+from planner import TEMPLATES, get_generator
+from planner.core.tracing import Tracer
+
+def print_trace_summary(tracer, limit=12):
+    """Prints the most expensive span names of a trace."""
+    totals = sorted(tracer.summary().items(), key=lambda item: -item[1]["seconds"])
+    print(f"{'span':<32}{'count':>7}{'ms':>10}{'ops':>9}{'links':>7}{'bytes':>10}{'elided':>8}")
+    for (category, name), t in totals[:limit]:
+        print(f"{category + ':' + name:<32}{t['count']:>7}{t['seconds'] * 1000:>10.1f}{t['ops']:>9}{t['links']:>7}{t['bytes']:>10}{t['elided']:>8}")
+
+def run_batch_command(args, parser):
+    """Runs the batch command; exits with status 1 if any job failed."""
+    from planner.core.batch import batch_jobs, parse_years, run_batch, result_status
+    try:
+        templates = [t.strip() for t in args.templates.split(",") if t.strip()]
+        jobs = batch_jobs(templates, parse_years(args.years), args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def report(result):
+        print(f"{result_status(result):<8}{result.seconds:>8.2f}s  {result.job.out_path}", flush=True)
+
+    print(f"Generating {len(jobs)} documents with {args.jobs} workers...")
+    start = time.perf_counter()
+    cache_dir = None if args.no_cache else args.cache_dir
+    results = run_batch(jobs, workers=args.jobs, cache_dir=cache_dir,
+                        cache_max_bytes=args.cache_size * 1024 * 1024, on_result=report, compact=args.compact)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'job':<28}{'status':>8}{'seconds':>10}{'bytes':>11}")
+    for r in results:
+        name = r.job.template + (f" {r.job.year}" if r.job.year is not None else "")
+        print(f"{name:<28}{result_status(r):>8}{r.seconds:>10.2f}{r.size:>11}")
+    failed = [r for r in results if not r.ok]
+    busy = sum(r.seconds for r in results)
+    print(f"{len(results) - len(failed)}/{len(results)} succeeded in {elapsed:.2f}s "
+          f"({busy:.2f}s of work, {busy / elapsed if elapsed else 0:.1f}x parallelism)")
+    for r in failed:
+        print(f"\n{r.job.out_path} failed:\n{r.error}")
+    if failed:
+        sys.exit(1)
+
+def run_serve_command(args):
+    """Runs the render daemon until interrupted."""
+    from planner.core.server import RenderServer, serve
+    renderer = RenderServer(workers=args.workers, max_queue=args.max_queue, timeout=args.timeout,
+                            cache_dir=None if args.no_cache else args.cache_dir,
+                            cache_max_bytes=args.cache_size * 1024 * 1024, compact=args.compact)
+    start = time.perf_counter()
+    print(f"Starting {args.workers} workers...", flush=True)
+    try:
+        renderer.start()
+        print(f"Workers ready in {time.perf_counter() - start:.2f}s", flush=True)
+        # Stop as cleanly on `kill` as on Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        serve(renderer, args.host, args.port, args.socket,
+              on_ready=lambda address: print(f"Serving on {address} (Ctrl-C to stop)", flush=True))
+    finally:
+        renderer.close()
+
+def run_preview_command(args, parser):
+    """Renders one page of a template to PNG."""
+    from planner.core.render import template_pages
+    from planner.core.preview import find_page, render_preview
+    try:
+        pages, pagesize = template_pages(args.template, args.year)
+        dest, draw_func, draw_args = find_page(pages, args.page)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or f"{args.template}_{args.page}.png"
+    cache_dir = None if args.no_cache else os.path.join(args.cache_dir, "previews")
+    start = time.perf_counter()
+    cached = render_preview(draw_func, draw_args, pagesize, output, cache_dir=cache_dir)
+    print(f"Wrote {output} in {(time.perf_counter() - start) * 1000:.0f} ms{' (from cache)' if cached else ''}")
+
+def run_analyze_command(args, parser):
+    """Analyzes a generated PDF per page type; exits with status 1 if it is over its budget."""
+    from planner.core.analyze import analyze_file, page_types, format_report, load_budgets, check_budgets
+    from planner.core.render import template_pages
+    try:
+        if args.start or args.end:
+            from planner.core.yearmodel import parse_date
+            from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+            from planner.templates.planner import range_page_plan
+            if args.template != "planner" or not (args.start and args.end):
+                parser.error("--start and --end must be given together, for the planner")
+            pages = range_page_plan(parse_date(args.start), parse_date(args.end, end=True), *IPAD_PRO_11_LANDSCAPE)
+        else:
+            pages, pagesize = template_pages(args.template, args.year)
+        report = analyze_file(args.pdf, page_types(pages))
+    except ValueError as e:
+        parser.error(f"{e} (was {args.pdf} generated from {args.template} with these options?)")
+    print(format_report(report))
+    if args.json:
+        import json
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.budgets:
+        budget = load_budgets(args.budgets).get(args.template)
+        if budget is None:
+            parser.error(f"{args.budgets} has no budget for {args.template}")
+        failures = check_budgets(report, budget)
+        print()
+        for failure in failures:
+            print(f"OVER BUDGET  {failure}")
+        print(f"{len(failures)} metrics over budget" if failures else "Within budget")
+        if failures:
+            sys.exit(1)
 
 def main():
     parser = argparse.ArgumentParser(description="Generate PDF Planner templates.")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
+    # Options shared by all commands
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument("--cache-dir", type=str, default=os.environ.get("PLANNER_CACHE_DIR"),
+                         help="Serve unchanged outputs from this cache directory (default: $PLANNER_CACHE_DIR)")
+    shared.add_argument("--cache-size", type=int, default=512, help="Maximum cache size in MB")
+    shared.add_argument("--no-cache", action="store_true", help="Always regenerate, ignoring --cache-dir")
+    shared.add_argument("--compact", action="store_true",
+                         help="Merge duplicate objects and write PDF 1.5 object streams and a cross-reference stream (smaller files)")
+
+    # Options shared by the single-document commands
+    common = argparse.ArgumentParser(add_help=False, parents=[shared])
+    common.add_argument("--trace", type=str, metavar="TRACE_JSON", help="Write a Chrome trace (speedscope compatible) of the generation")
+
     # Planner command
-    planner_parser = subparsers.add_parser("planner", help="Generate a yearly planner")
+    planner_parser = subparsers.add_parser("planner", help="Generate a yearly planner, or one for a date range", parents=[common])
     planner_parser.add_argument("--year", type=int, default=datetime.now().year + 1, help="Year for the planner")
+    planner_parser.add_argument("--start", type=str, metavar="DATE",
+                                help="First day of a planner for a date range instead of a year (YYYY-MM-DD or YYYY-MM)")
+    planner_parser.add_argument("--end", type=str, metavar="DATE",
+                                help="Last day of the date range (YYYY-MM-DD, or YYYY-MM for the end of the month)")
     planner_parser.add_argument("--output", type=str, help="Output file path")
+    planner_parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes (renders one chunk per month)")
+    planner_parser.add_argument("--stream", action="store_true",
+                                help="Write each month to the output as soon as it is drawn (bounded memory, single process)")
+    planner_parser.add_argument("--incremental", action="store_true",
+                                help="Only re-render the pages whose inputs changed since the last incremental build of --output")
+    planner_parser.add_argument("--named-destinations", action="store_true",
+                                help="Also list every page destination by name, for links like planner.pdf#Day_2027_1_5 from other apps")
 
     # Meeting Notes command
-    meeting_parser = subparsers.add_parser("meeting_notes", help="Generate meeting notes template")
+    meeting_parser = subparsers.add_parser("meeting_notes", help="Generate meeting notes template", parents=[common])
     meeting_parser.add_argument("--output", type=str, default="meeting_notes.pdf", help="Output file path")
 
     # BI Requirements command
-    bi_parser = subparsers.add_parser("bi_requirements", help="Generate BI requirements template")
+    bi_parser = subparsers.add_parser("bi_requirements", help="Generate BI requirements template", parents=[common])
     bi_parser.add_argument("--output", type=str, default="bi_requirements.pdf", help="Output file path")
 
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Generate many documents with a pool of workers", parents=[shared])
+    batch_parser.add_argument("--years", type=str, default=str(datetime.now().year + 1),
+                              help="Planner years, e.g. 2026-2035,2040")
+    batch_parser.add_argument("--templates", type=str, default=",".join(TEMPLATES),
+                              help=f"Comma-separated templates (default: {','.join(TEMPLATES)})")
+    batch_parser.add_argument("--output-dir", type=str, default=".", help="Directory for the generated files")
+    batch_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+
+    # Render daemon
+    serve_parser = subparsers.add_parser("serve", help="Serve documents over HTTP from a pool of warm workers",
+                                         parents=[shared])
+    serve_parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve_parser.add_argument("--socket", type=str, help="Listen on this Unix socket instead of a port")
+    serve_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                              help="Number of worker processes (documents rendered at once)")
+    serve_parser.add_argument("--max-queue", type=int, default=16,
+                              help="Requests allowed to wait for a worker before answering 503")
+    serve_parser.add_argument("--timeout", type=float, default=120, help="Seconds before a request is answered with 504")
+
+    # Page preview
+    preview_parser = subparsers.add_parser("preview", help="Render one page to PNG at iPad Pro 11\" resolution")
+    preview_parser.add_argument("template", choices=list(TEMPLATES), help="Template to preview")
+    preview_parser.add_argument("--page", type=str, required=True,
+                                help="Destination of the page (e.g. Month_2027_3, Day_2027_1_5) or page number from 1")
+    preview_parser.add_argument("--year", type=int, default=datetime.now().year + 1, help="Year for the planner")
+    preview_parser.add_argument("--output", type=str, help="Output PNG path (default: <template>_<page>.png)")
+    preview_parser.add_argument("--cache-dir", type=str,
+                                default=os.environ.get("PLANNER_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "planner"),
+                                help="Keep previews in the previews directory under this one (default: $PLANNER_CACHE_DIR or ~/.cache/planner)")
+    preview_parser.add_argument("--no-cache", action="store_true", help="Always render, ignoring cached previews")
+
+    # PDF structure analysis
+    analyze_parser = subparsers.add_parser("analyze", help="Report how heavy each page type of a generated PDF is, against budgets")
+    analyze_parser.add_argument("template", choices=list(TEMPLATES), help="Template the PDF was generated from")
+    analyze_parser.add_argument("pdf", help="PDF file to analyze")
+    analyze_parser.add_argument("--year", type=int, default=datetime.now().year + 1, help="Year of the planner")
+    analyze_parser.add_argument("--start", type=str, metavar="DATE", help="First day of a date-range planner")
+    analyze_parser.add_argument("--end", type=str, metavar="DATE", help="Last day of a date-range planner")
+    analyze_parser.add_argument("--budgets", type=str, metavar="BUDGETS_JSON",
+                                help="Fail if a metric is over its budget in this file (e.g. benchmarks/budgets.json)")
+    analyze_parser.add_argument("--json", type=str, metavar="REPORT_JSON", help="Also write the full report as JSON")
+
+    # Icon bundle
+    subparsers.add_parser("build_icons", help="Precompile the SVG icons into the icon bundle (run after changing icons)")
+
     args = parser.parse_args()
 
+    if args.command == "batch":
+        return run_batch_command(args, batch_parser)
+    if args.command == "serve":
+        return run_serve_command(args)
+    if args.command == "preview":
+        return run_preview_command(args, preview_parser)
+    if args.command == "analyze":
+        return run_analyze_command(args, analyze_parser)
+    if args.command == "build_icons":
+        from planner.core.icons import compile_icon_bundle, BUNDLE_PATH
+        count = compile_icon_bundle()
+        print(f"Compiled {count} icons to {BUNDLE_PATH}")
+        return
+    tracer = Tracer() if getattr(args, "trace", None) else None
+    cache = None
+    if getattr(args, "cache_dir", None) and not args.no_cache:
+        from planner.core.cache import OutputCache
+        cache = OutputCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+
     if args.command == "planner":
-        year = args.year
-        output = args.output or f"planner_{year}.pdf"
-        print(f"Generating planner for {year} to {output}...")
-        generate_year_pdf(year, output)
-        print("Done!")
+        options = dict(jobs=args.jobs, tracer=tracer, cache=cache, incremental=args.incremental,
+                       streaming=args.stream, named_destinations=args.named_destinations, compact=args.compact)
+        if args.start or args.end:
+            from planner.core.yearmodel import parse_date
+            if not (args.start and args.end):
+                planner_parser.error("--start and --end must be given together")
+            try:
+                first, last = parse_date(args.start), parse_date(args.end, end=True)
+            except ValueError as e:
+                planner_parser.error(str(e))
+            if last < first:
+                planner_parser.error(f"--end ({last}) is before --start ({first})")
+            output = args.output or f"planner_{first}_{last}.pdf"
+            print(f"Generating planner from {first} to {last} to {output}...")
+            from planner import generate_range_pdf
+            stats = generate_range_pdf(first, last, output, **options)
+        else:
+            year = args.year
+            output = args.output or f"planner_{year}.pdf"
+            print(f"Generating planner for {year} to {output}...")
+            generate_year_pdf = get_generator("planner")
+            stats = generate_year_pdf(year, output, **options)
+        if stats:
+            print(f"Reused {stats['reused']} pages, rebuilt {stats['rebuilt']} pages")
+        print("Done (from cache)!" if cache and cache.hits else "Done!")
     
     elif args.command == "meeting_notes":
         print(f"Generating meeting notes to {args.output}...")
-        generate_meeting_notes_pdf(args.output)
-        print("Done!")
+        generate_meeting_notes_pdf = get_generator("meeting_notes")
+        generate_meeting_notes_pdf(args.output, tracer=tracer, cache=cache, compact=args.compact)
+        print("Done (from cache)!" if cache and cache.hits else "Done!")
     
     elif args.command == "bi_requirements":
         print(f"Generating BI requirements to {args.output}...")
-        generate_bi_requirements_pdf(args.output)
-        print("Done!")
+        generate_bi_requirements_pdf = get_generator("bi_requirements")
+        generate_bi_requirements_pdf(args.output, tracer=tracer, cache=cache, compact=args.compact)
+        print("Done (from cache)!" if cache and cache.hits else "Done!")
     
     else:
         parser.print_help()
+        return
+
+    if tracer is not None:
+        tracer.dump(args.trace)
+        print_trace_summary(tracer)
+        print(f"Trace written to {args.trace}")
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,31 @@
 """Simple planner package"""
-from .templates.planner import generate_year_pdf
-from .templates.meeting_notes import generate_meeting_notes_pdf
-from .templates.bi_requirements import generate_bi_requirements_pdf
+import importlib
 
-__all__ = ["generate_year_pdf", "generate_meeting_notes_pdf", "generate_bi_requirements_pdf"]
+__version__ = "0.2.0"
 
+# Template name: (module, generate function, whether it takes a year).
+# Template modules (and reportlab with them) are only imported when used.
+TEMPLATES = {
+    "planner": (".templates.planner", "generate_year_pdf", True),
+    "meeting_notes": (".templates.meeting_notes", "generate_meeting_notes_pdf", False),
+    "bi_requirements": (".templates.bi_requirements", "generate_bi_requirements_pdf", False),
+}
+
+_GENERATOR_MODULES = {function: module for module, function, yearly in TEMPLATES.values()}
+# Planners from any first to any last date
+_GENERATOR_MODULES["generate_range_pdf"] = ".templates.planner"
+
+def get_generator(template):
+    """Imports a template's module and returns its generate function."""
+    module, function, yearly = TEMPLATES[template]
+    return getattr(importlib.import_module(module, __name__), function)
+
+def __getattr__(name):
+    # `from planner import generate_year_pdf` imports the template on first access
+    if name in _GENERATOR_MODULES:
+        value = getattr(importlib.import_module(_GENERATOR_MODULES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ["generate_year_pdf", "generate_range_pdf", "generate_meeting_notes_pdf", "generate_bi_requirements_pdf"]
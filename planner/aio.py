@@ -0,0 +1,159 @@
+"""
+asyncio API of the generators.
+
+The generate_* functions here take the arguments of the generators of the
+same name and run them in a thread, so that the event loop keeps serving
+while a document is drawn. They return a Generation, which can be awaited
+for the generator's result and iterated for progress events:
+
+    from planner import aio
+
+    await aio.generate_meeting_notes_pdf("notes.pdf")
+
+    generation = aio.generate_year_pdf(2027, "planner_2027.pdf", compact=True)
+    async for event in generation:
+        print(f"{event.done}/{event.total} {event.destination or ''}")
+
+An event (ProgressEvent) is sent when the generator knows how many pages
+it will draw and after every page drawn. Cancelling a Generation, or the
+task awaiting it, stops the generator at the next page boundary and removes
+the partial output. A document served from the cache (cache=...) sends no
+events.
+
+At most `concurrency` documents (see set_concurrency, default 2) are drawn
+at once across all calls; the others wait for a slot. The threads share the
+interpreter, so running documents at once mostly helps when they wait on
+I/O or compression; the planner's jobs=N renders its months in processes.
+"""
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .core.progress import GenerationCancelled, Progress, ProgressEvent
+
+DEFAULT_CONCURRENCY = 2
+
+_concurrency = DEFAULT_CONCURRENCY
+_executor = None
+# One semaphore per event loop, as asyncio primitives belong to a loop
+_semaphores = weakref.WeakKeyDictionary()
+
+def set_concurrency(limit):
+    """Sets how many documents are drawn at once, across all calls and event loops."""
+    global _concurrency, _executor
+    if limit < 1:
+        raise ValueError("the concurrency limit must be at least 1")
+    _concurrency = limit
+    _semaphores.clear()
+    if _executor is not None:
+        # Documents being drawn finish in the old threads
+        _executor.shutdown(wait=False)
+        _executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_concurrency, thread_name_prefix="planner-render")
+    return _executor
+
+def _get_semaphore(loop):
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_concurrency)
+    return semaphore
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class Generation:
+    """
+    A generator running in a thread: await it for the result, iterate it for
+    ProgressEvents, cancel it with cancel(). Created by the generate_* functions.
+
+    Iterating a generation that was cancelled raises GenerationCancelled after
+    the last event rather than CancelledError, which would make the iterating
+    task look cancelled itself; awaiting it raises CancelledError, as awaiting
+    a cancelled task does.
+    """
+    def __init__(self, generator, args, kwargs, out_path):
+        loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        self._progress = Progress(lambda event: loop.call_soon_threadsafe(self._events.put_nowait, event))
+        self._call = functools.partial(generator, *args, progress=self._progress, **kwargs)
+        self._out_path = out_path
+        self._task = loop.create_task(self._run(loop))
+
+    async def _run(self, loop):
+        try:
+            async with _get_semaphore(loop):
+                before = _stat(self._out_path)
+                future = loop.run_in_executor(_get_executor(), self._call)
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # Wait for the thread to stop at the next page, so that it
+                    # does not keep its slot or write after it was cancelled
+                    self._progress.cancel()
+                    try:
+                        await future
+                    except Exception:
+                        pass
+                    # Most generators write the output at the end; a partial
+                    # file (e.g. from streaming) is removed
+                    after = _stat(self._out_path)
+                    if after is not None and after != before:
+                        os.unlink(self._out_path)
+                    raise
+        finally:
+            self._events.put_nowait(None)
+
+    def cancel(self):
+        """Stops the generation at the next page boundary."""
+        self._task.cancel()
+
+    def cancelled(self):
+        return self._task.cancelled()
+
+    def done(self):
+        return self._task.done()
+
+    def __await__(self):
+        return self._task.__await__()
+
+    async def __aiter__(self):
+        while True:
+            event = await self._events.get()
+            if event is None:
+                break
+            yield event
+        # The task is done once the events end
+        if self._task.cancelled():
+            raise GenerationCancelled("the generation was cancelled")
+        # Raise the generator's error, if any
+        self._task.result()
+
+def generate_year_pdf(year, out_path, **kwargs):
+    """Runs planner.generate_year_pdf in a thread; returns its Generation."""
+    from .templates.planner import generate_year_pdf
+    return Generation(generate_year_pdf, (year, out_path), kwargs, out_path)
+
+def generate_range_pdf(first, last, out_path, **kwargs):
+    """Runs planner.generate_range_pdf in a thread; returns its Generation."""
+    from .templates.planner import generate_range_pdf
+    return Generation(generate_range_pdf, (first, last, out_path), kwargs, out_path)
+
+def generate_meeting_notes_pdf(out_path, **kwargs):
+    """Runs planner.generate_meeting_notes_pdf in a thread; returns its Generation."""
+    from .templates.meeting_notes import generate_meeting_notes_pdf
+    return Generation(generate_meeting_notes_pdf, (out_path,), kwargs, out_path)
+
+def generate_bi_requirements_pdf(output_path, **kwargs):
+    """Runs planner.generate_bi_requirements_pdf in a thread; returns its Generation."""
+    from .templates.bi_requirements import generate_bi_requirements_pdf
+    return Generation(generate_bi_requirements_pdf, (output_path,), kwargs, output_path)
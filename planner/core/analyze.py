@@ -0,0 +1,304 @@
+"""
+Static analysis of generated PDFs.
+
+How heavy a page is for a viewer (an iPad scrolling through the planner)
+depends on what it asks the viewer to do, not on how long it took to
+generate. analyze_pdf reads a finished document and measures every page:
+
+    content_bytes   decoded bytes of the page's content streams
+    form_bytes      decoded bytes of the Form XObjects it draws (once per form)
+    operators       operators executed, including those of the forms it
+                    draws (each time it draws them), also counted by kind
+    path_segments   lines and curves built (a rectangle counts 4)
+    annotations     link annotations
+    ext_gstates     distinct graphics states it sets with gs
+    alpha_gstates   those of them with a fill or stroke alpha below 1
+    objects         objects reachable from the page, short of other pages
+
+Pages are grouped by page type, which comes from the page plan the document
+was drawn from (see page_types): the draw function of each page. Reports
+hold per page type the number of pages and the total and maximum of every
+metric, plus document totals.
+
+Budgets (benchmarks/budgets.json) give per template the maximum of each
+metric per page of a type, and the maximum bytes and objects per page of the
+document. check_budgets lists what a report exceeds.
+"""
+from collections import Counter, namedtuple
+import json
+import math
+import re
+
+from .pdffile import PDFStream, read_pdf
+
+# Page type of each draw function of the page plans; others use the function name
+PAGE_TYPES = {
+    "draw_cover": "cover",
+    "draw_summary_page": "summary",
+    "draw_six_month_overview": "six_month",
+    "draw_yearly_tracker": "tracker",
+    "draw_monthly_page": "monthly",
+    "draw_daily_page": "daily",
+    "draw_meeting_notes_page": "notes",
+    "draw_full_meeting_notes_page": "notes_full",
+    "draw_bi_requirements_page": "requirements",
+    "draw_full_notes_page": "notes_full",
+}
+
+# Operator kinds, as grouped in the PDF reference
+OPERATOR_KINDS = {
+    "path": ("m", "l", "c", "v", "y", "h", "re"),
+    "paint": ("S", "s", "f", "F", "f*", "B", "B*", "b", "b*", "n", "W", "W*"),
+    "text": ("BT", "ET", "Tc", "Tw", "Tz", "TL", "Tf", "Tr", "Ts", "Td", "TD", "Tm", "T*",
+             "Tj", "TJ", "'", '"'),
+    "color": ("CS", "cs", "SC", "SCN", "sc", "scn", "G", "g", "RG", "rg", "K", "k"),
+    "state": ("q", "Q", "cm", "w", "J", "j", "M", "d", "ri", "i", "gs"),
+    "xobject": ("Do",),
+}
+_KIND = {op: kind for kind, ops in OPERATOR_KINDS.items() for op in ops}
+
+# Path segments added by each path construction operator
+_SEGMENTS = {"l": 1, "c": 1, "v": 1, "y": 1, "h": 1, "re": 4}
+
+# Metrics of a page, in report order
+METRICS = ("content_bytes", "form_bytes", "operators", "path_segments", "annotations",
+           "ext_gstates", "alpha_gstates", "objects")
+
+def page_types(pages):
+    """Returns the page type of every entry of a page plan."""
+    types = []
+    for dest, draw_func, args in pages:
+        name = draw_func.__name__
+        types.append(PAGE_TYPES.get(name, name[5:] if name.startswith("draw_") else name))
+    return types
+
+# Tokens of a content stream that matter here: names and operators. Strings
+# (whose parentheses reportlab always escapes) and comments are matched so
+# that their contents are skipped; numbers and delimiters are not matched.
+_TOKEN_RE = re.compile(rb"""\((?:\\.|[^\\)])*\)|%[^\r\n]*|<[0-9A-Fa-f\s]*>"""
+                       rb"""|/([^\s/\[\]()<>{}%]*)|([A-Za-z'"][A-Za-z0-9*'"]*)""")
+_NOT_OPERATORS = {b"true", b"false", b"null"}
+
+def content_operators(data):
+    """
+    Yields (operator, name) for every operator of a decoded content stream,
+    where name is the last name among its operands (the resource of Do and
+    gs), or None.
+    """
+    pos = 0
+    name = None
+    while True:
+        m = _TOKEN_RE.search(data, pos)
+        if m is None:
+            return
+        pos = m.end()
+        op = m.group(2)
+        if op is None or op in _NOT_OPERATORS:
+            if m.group(1) is not None:
+                name = m.group(1).decode("latin-1")
+            continue
+        if op == b"ID":
+            # Inline image data runs up to EI
+            pos = data.index(b"EI", pos) + 2
+            op = b"BI"
+        yield op.decode("latin-1"), name
+        name = None
+
+def _stream_data(doc, contents):
+    """Decoded data of a page's /Contents (a stream or an array of them)."""
+    contents = doc.get(contents)
+    if isinstance(contents, PDFStream):
+        return contents.decoded()
+    return b"\n".join(doc.get(part).decoded() for part in contents or [])
+
+def _resource(doc, resources, category, name):
+    return doc.get(doc.get(doc.get(resources or {}).get(category, {})).get(name))
+
+class _ContentStats:
+    """Operator counts of a content stream, with the forms and graphics states it uses."""
+    def __init__(self, doc, data, resources):
+        self.bytes = len(data)
+        self.operators = Counter()
+        self.path_segments = 0
+        self.forms = Counter()
+        self.gstates = set()
+        operators = Counter()
+        for op, name in content_operators(data):
+            operators[op] += 1
+            if op == "Do" and name is not None:
+                ref = doc.get(doc.get(resources or {}).get("XObject", {})).get(name)
+                xobject = doc.get(ref)
+                if isinstance(xobject, PDFStream) and xobject.dict.get("Subtype") == "Form":
+                    self.forms[ref.num] += 1
+            elif op == "gs" and name is not None:
+                gstate = _resource(doc, resources, "ExtGState", name)
+                if gstate is not None:
+                    self.gstates.add((name, _is_alpha(gstate)))
+        for op, count in operators.items():
+            self.operators[_KIND.get(op, "other")] += count
+            self.path_segments += _SEGMENTS.get(op, 0) * count
+
+def _is_alpha(gstate):
+    return any(isinstance(gstate.get(key), (int, float)) and gstate[key] < 1 for key in ("CA", "ca"))
+
+# Counts of a content stream including the forms it draws; form_bytes maps each form drawn to its size
+_Totals = namedtuple("_Totals", "bytes operators path_segments form_bytes gstates")
+
+class _Analyzer:
+    """Measures the pages of one document, analyzing every form once."""
+    def __init__(self, doc, page_nums):
+        self.doc = doc
+        self.page_nums = page_nums
+        self.forms = {}
+
+    def totals(self, data, resources):
+        stats = _ContentStats(self.doc, data, resources)
+        operators = Counter(stats.operators)
+        segments = stats.path_segments
+        form_bytes = {}
+        gstates = set(stats.gstates)
+        for num, times in stats.forms.items():
+            form = self.form(num)
+            if form is None:
+                continue
+            for kind, count in form.operators.items():
+                operators[kind] += count * times
+            segments += form.path_segments * times
+            form_bytes[num] = form.bytes
+            form_bytes.update(form.form_bytes)
+            gstates |= form.gstates
+        return _Totals(stats.bytes, operators, segments, form_bytes, gstates)
+
+    def form(self, num):
+        if num not in self.forms:
+            # None while the form is analyzed, in case it draws itself
+            self.forms[num] = None
+            stream = self.doc.objects[num]
+            self.forms[num] = self.totals(stream.decoded(), stream.dict.get("Resources"))
+        return self.forms[num]
+
+    def page(self, ref):
+        """Returns the metrics of a page and its operator counts by kind."""
+        doc = self.doc
+        page = doc.get(ref)
+        totals = self.totals(_stream_data(doc, page.get("Contents")), page.get("Resources"))
+        metrics = {
+            "content_bytes": totals.bytes,
+            "form_bytes": sum(totals.form_bytes.values()),
+            "operators": sum(totals.operators.values()),
+            "path_segments": totals.path_segments,
+            "annotations": len(doc.get(page.get("Annots", [])) or []),
+            "ext_gstates": len(totals.gstates),
+            "alpha_gstates": sum(1 for name, alpha in totals.gstates if alpha),
+            # Links lead to other pages, which are not part of this one
+            "objects": len(doc.reachable([page], skip_parents=True, exclude=self.page_nums)),
+        }
+        return metrics, totals.operators
+
+def _object_type(obj):
+    """Type of an object for the document totals: Page, Annot, Action, Form, Content, Font, ..."""
+    if isinstance(obj, PDFStream):
+        return "Form" if obj.dict.get("Subtype") == "Form" else obj.dict.get("Type") or "Content"
+    if isinstance(obj, dict):
+        if "S" in obj and "Type" not in obj:
+            return "Action"
+        return obj.get("Type") or "Other"
+    return "Other"
+
+def analyze_pdf(data, types=None):
+    """
+    Returns the report of a PDF file's bytes (see the module docstring).
+    types gives the page type of every page (see page_types); without it
+    all pages are of type "page".
+    """
+    doc = read_pdf(data)
+    refs = doc.page_refs()
+    if types is None:
+        types = ["page"] * len(refs)
+    if len(types) != len(refs):
+        raise ValueError(f"the document has {len(refs)} pages but the page plan has {len(types)}")
+
+    analyzer = _Analyzer(doc, {ref.num for ref in refs})
+    report = {}
+    for ref, page_type in zip(refs, types):
+        metrics, operators = analyzer.page(ref)
+        entry = report.setdefault(page_type, {
+            "pages": 0, "total": dict.fromkeys(METRICS, 0), "max": dict.fromkeys(METRICS, 0),
+            "operators": Counter()})
+        entry["pages"] += 1
+        for name, value in metrics.items():
+            entry["total"][name] += value
+            entry["max"][name] = max(entry["max"][name], value)
+        entry["operators"].update(operators)
+    for entry in report.values():
+        entry["operators"] = dict(sorted(entry["operators"].items()))
+
+    object_types = Counter(_object_type(obj) for obj in doc.objects.values())
+    return {
+        "document": {"pages": len(refs), "bytes": len(data), "objects": len(doc.objects),
+                     "object_types": dict(sorted(object_types.items()))},
+        "page_types": report,
+    }
+
+def analyze_file(path, types=None):
+    with open(path, "rb") as f:
+        return analyze_pdf(f.read(), types)
+
+def format_report(report):
+    """Formats a report as a table of the mean and maximum of every metric per page type."""
+    doc = report["document"]
+    lines = [f"{doc['pages']} pages, {doc['bytes']} bytes, {doc['objects']} objects "
+             f"({', '.join(f'{name} {count}' for name, count in doc['object_types'].items())})", ""]
+    header = f"{'page type':<14}{'pages':>6}" + "".join(f"{name:>15}" for name in METRICS)
+    lines.append(header)
+    lines.append(" " * 20 + "".join(f"{'mean / max':>15}" for name in METRICS))
+    for page_type, entry in report["page_types"].items():
+        n = entry["pages"]
+        cells = "".join(f"{entry['total'][name] / n:>8.0f} /{entry['max'][name]:>6}" for name in METRICS)
+        lines.append(f"{page_type:<14}{n:>6}{cells}")
+    lines.append("")
+    lines.append("operators per page by kind")
+    kinds = list(OPERATOR_KINDS) + ["other"]
+    lines.append(f"{'page type':<14}" + "".join(f"{kind:>9}" for kind in kinds))
+    for page_type, entry in report["page_types"].items():
+        n = entry["pages"]
+        lines.append(f"{page_type:<14}" + "".join(f"{entry['operators'].get(kind, 0) / n:>9.0f}" for kind in kinds))
+    return "\n".join(lines)
+
+# --- Budgets ---
+
+def load_budgets(path):
+    with open(path) as f:
+        return json.load(f)
+
+def report_budget(report, headroom=0.1):
+    """Returns budgets for a report: its maxima and per-page document totals plus headroom, rounded up."""
+    def limit(value):
+        return math.ceil(value * (1 + headroom))
+    doc = report["document"]
+    return {
+        "document": {"bytes_per_page": limit(doc["bytes"] / doc["pages"]),
+                     "objects_per_page": limit(doc["objects"] / doc["pages"])},
+        "page_types": {page_type: {name: limit(value) for name, value in entry["max"].items()}
+                       for page_type, entry in report["page_types"].items()},
+    }
+
+def check_budgets(report, budget):
+    """Returns a message for every metric of a report over its budget (budget is one template's entry)."""
+    failures = []
+    doc = report["document"]
+    for name, value in (("bytes_per_page", doc["bytes"] / doc["pages"]),
+                        ("objects_per_page", doc["objects"] / doc["pages"])):
+        limit = budget.get("document", {}).get(name)
+        if limit is not None and value > limit:
+            failures.append(f"document: {name} {value:.0f} > {limit}")
+    for page_type, entry in report["page_types"].items():
+        limits = budget.get("page_types", {}).get(page_type)
+        if limits is None:
+            failures.append(f"{page_type}: no budget for this page type")
+            continue
+        for name, limit in limits.items():
+            value = entry["max"].get(name, 0)
+            if value > limit:
+                failures.append(f"{page_type}: {name} {value} > {limit}")
+    return failures
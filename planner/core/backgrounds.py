@@ -0,0 +1,39 @@
+"""Writing backgrounds (dot grids) for notes areas."""
+from reportlab.lib.units import mm
+import hashlib
+
+from .constants import SEPARATOR_COLOR
+from .utils import draw_form
+
+def _steps(start, stop, step):
+    """Positions from start towards stop (inclusive) by repeatedly adding step."""
+    values = []
+    v = start
+    while (v <= stop) if step > 0 else (v >= stop):
+        values.append(v)
+        v += step
+    return values
+
+def _draw_dot_row(c, xs, dot_size, color):
+    c.setFillColor(color)
+    for x in xs:
+        c.circle(x, 0, dot_size, fill=1, stroke=0)
+
+def draw_dot_grid(c, left, right, top, bottom, spacing=5*mm, dot_size=0.25*mm, color=SEPARATOR_COLOR):
+    """
+    Draws a dot grid starting at the top-left corner of the given area.
+    One row of dots is drawn as a Form XObject and repeated for every row,
+    so the page carries a single row of circles instead of one per dot.
+    """
+    xs = _steps(left, right, spacing)
+    ys = _steps(top, bottom, -spacing)
+    if not xs or not ys:
+        return
+
+    key = repr((xs[0], len(xs), spacing, dot_size, color.hexval())).encode()
+    name = "DotRow_" + hashlib.md5(key, usedforsecurity=False).hexdigest()[:12]
+    for y in ys:
+        c.saveState()
+        c.translate(0, y)
+        draw_form(c, name, _draw_dot_row, xs, dot_size, color)
+        c.restoreState()
@@ -0,0 +1,129 @@
+"""
+Building many documents in one run.
+
+A batch is a list of jobs (template, year, output path) run in a pool of
+worker processes. Each worker imports the templates and loads the icons and
+fonts once when it starts, so every job after the first in a worker only
+pays for rendering. A failing job is reported and does not stop the others.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import namedtuple
+import inspect
+import os
+import time
+import traceback
+
+from .. import TEMPLATES, get_generator
+from .cache import DEFAULT_MAX_BYTES
+
+BatchJob = namedtuple("BatchJob", "template year out_path")
+BatchResult = namedtuple("BatchResult", "job ok seconds size cached error")
+
+def result_status(result):
+    return "cached" if result.cached else ("ok" if result.ok else "FAILED")
+
+def parse_years(spec):
+    """Parses a year list such as "2026-2030,2035" into a sorted list of years."""
+    years = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, stop = part.partition("-")
+        start = int(start)
+        stop = int(stop) if sep else start
+        if stop < start:
+            raise ValueError(f"empty year range '{part}'")
+        years.update(range(start, stop + 1))
+    return sorted(years)
+
+def batch_jobs(templates, years, output_dir):
+    """Returns the jobs building each template (for every year, if it takes one) into output_dir."""
+    jobs = []
+    for template in templates:
+        if template not in TEMPLATES:
+            raise ValueError(f"unknown template '{template}'")
+        module, function, yearly = TEMPLATES[template]
+        if yearly:
+            jobs.extend(BatchJob(template, year, os.path.join(output_dir, f"{template}_{year}.pdf"))
+                        for year in years)
+        else:
+            jobs.append(BatchJob(template, None, os.path.join(output_dir, f"{template}.pdf")))
+    return jobs
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+def warm_up():
+    """
+    Imports the templates and warms the icon and font caches of this process;
+    returns the generate function of every template.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from .cache import environment_fingerprint, generator_fingerprint
+    from .utils import preload_icons
+
+    generators = {template: get_generator(template) for template in TEMPLATES}
+    preload_icons()
+    for font in ("Helvetica", "Helvetica-Bold"):
+        pdfmetrics.getFont(font)
+    environment_fingerprint()
+    for generate in generators.values():
+        generator_fingerprint(inspect.unwrap(generate))
+    return generators
+
+def _init_worker(cache_dir, cache_max_bytes, compact=False):
+    """Sets up a worker process (see warm_up)."""
+    from .cache import OutputCache
+
+    _worker["generators"] = warm_up()
+    _worker["cache"] = OutputCache(cache_dir, cache_max_bytes) if cache_dir else None
+    _worker["compact"] = compact
+
+def _run_job(job):
+    """Runs one job in a worker; failures are returned rather than raised."""
+    cache = _worker["cache"]
+    hits = cache.hits if cache else 0
+    start = time.perf_counter()
+    try:
+        generate = _worker["generators"][job.template]
+        args = (job.year, job.out_path) if job.year is not None else (job.out_path,)
+        generate(*args, cache=cache, compact=_worker["compact"])
+    except Exception:
+        return BatchResult(job, False, time.perf_counter() - start, 0, False,
+                           traceback.format_exc(limit=-3).strip())
+    seconds = time.perf_counter() - start
+    return BatchResult(job, True, seconds, os.path.getsize(job.out_path),
+                       bool(cache) and cache.hits > hits, None)
+
+def run_batch(jobs, workers=1, cache_dir=None, cache_max_bytes=None, on_result=None, compact=False):
+    """
+    Runs jobs in `workers` processes (in this process if workers is 1) and
+    returns their BatchResults in job order. on_result(result) is called as
+    each job finishes. With compact, documents are written with object streams.
+    """
+    initargs = (cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES, compact)
+    for job in jobs:
+        os.makedirs(os.path.dirname(job.out_path) or ".", exist_ok=True)
+
+    results = {}
+    if workers <= 1:
+        _init_worker(*initargs)
+        for job in jobs:
+            results[job] = result = _run_job(job)
+            if on_result:
+                on_result(result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = {pool.submit(_run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. killed or out of memory)
+                    result = BatchResult(job, False, 0.0, 0, False, f"{type(e).__name__}: {e}")
+                results[job] = result
+                if on_result:
+                    on_result(result)
+    return [results[job] for job in jobs]
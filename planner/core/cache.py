@@ -0,0 +1,172 @@
+"""
+Content-addressed cache of generated PDFs.
+
+A cache key is a hash of everything an output depends on: the template and
+its arguments, the code of the generator and of every planner function it
+uses (see incremental.code_fingerprint, as for incremental builds and
+previews), the values in planner.core.constants (palette, sizes, icon
+names), the contents of the icon files, and the package and reportlab
+versions. Generators decorated with @cached_output copy a cached file to
+the output path on a hit, and store their output on a miss. Outputs are
+generated with invariant=1 (fixed dates and document IDs), so a hit is
+byte-identical to a fresh build. Build modes that write the same document
+with a different object layout (the planner's jobs > 1 and streaming) are
+part of the key, so a hit is byte-identical to a build in the same mode.
+
+The cache is a flat directory of <key>.pdf files. When it grows past
+max_bytes, the least recently used files are removed.
+"""
+from reportlab.lib import colors
+from functools import lru_cache
+import functools
+import hashlib
+import inspect
+import os
+import shutil
+import tempfile
+
+from . import constants
+
+# Default size bound of a cache directory
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def constant_value(value):
+    """Returns a value with colors replaced by their hex strings, for hashing its repr."""
+    if isinstance(value, colors.Color):
+        return value.hexval()
+    if isinstance(value, (list, tuple)):
+        return [constant_value(v) for v in value]
+    if isinstance(value, dict):
+        try:
+            items = sorted(value.items())
+        except TypeError:
+            # Keys of mixed types, e.g. None and strings
+            items = sorted(value.items(), key=lambda item: repr(item[0]))
+        return {k: constant_value(v) for k, v in items}
+    return value
+
+@lru_cache(maxsize=1)
+def icon_fingerprint():
+    """Hash of the contents of the icon files."""
+    h = hashlib.sha256()
+    for icon_key, filename in sorted(constants.ICONS.items()):
+        with open(os.path.join(constants.ICON_DIR, filename), "rb") as f:
+            h.update(f"{icon_key}:".encode() + hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+@lru_cache(maxsize=1)
+def environment_fingerprint():
+    """Hash of the constants, icon files and versions shared by all templates."""
+    import reportlab
+    from .. import __version__
+    h = hashlib.sha256()
+    h.update(f"planner {__version__} reportlab {reportlab.Version}\n".encode())
+    for name in sorted(vars(constants)):
+        # ICON_DIR is machine specific; the icon contents are hashed instead
+        if name.isupper() and name != "ICON_DIR":
+            h.update(f"{name}={constant_value(getattr(constants, name))!r}\n".encode())
+    h.update(icon_fingerprint().encode())
+    return h.hexdigest()
+
+@lru_cache(maxsize=None)
+def generator_fingerprint(func):
+    """Hash of the code of a generator and of the planner functions it uses."""
+    # incremental imports this module
+    from .incremental import code_fingerprint
+    # The icon paths are machine specific; the icon contents are in environment_fingerprint
+    return code_fingerprint(func, narrowed=("ICON_DIR", "BUNDLE_PATH"))
+
+def cache_key(template, code, *args):
+    """Returns the cache key of a template drawn by code (see generator_fingerprint) with args."""
+    h = hashlib.sha256(environment_fingerprint().encode())
+    h.update(code.encode())
+    h.update(repr((template, args)).encode())
+    return h.hexdigest()
+
+class OutputCache:
+    """A directory of generated PDFs, keyed by cache_key."""
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pdf")
+
+    def fetch(self, key, out_path):
+        """Copies the cached output for key to out_path; returns False if there is none."""
+        path = self.path(key)
+        try:
+            shutil.copyfile(path, out_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        # Mark as recently used for eviction
+        os.utime(path)
+        self.hits += 1
+        return True
+
+    def store(self, key, out_path):
+        """Adds a generated file to the cache, then evicts down to max_bytes."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(out_path, tmp)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        """Returns (mtime, size, path) of every cached file, oldest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Removes least recently used files until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def cached_output(template, key_args=(), path_arg="out_path", build_mode=None):
+    """
+    Decorates a generator so that it accepts cache=OutputCache(...).
+    key_args names the parameters that change the output; path_arg names
+    the output path parameter. build_mode, if given, is called with the
+    generator's arguments by name and returns the name of the build mode,
+    which is added to the key.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+        @functools.wraps(func)
+        def wrapper(*args, cache=None, **kwargs):
+            if cache is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key_values = [bound.arguments[name] for name in key_args]
+            if build_mode is not None:
+                key_values.append(build_mode(**bound.arguments))
+            key = cache_key(template, generator_fingerprint(func), *key_values)
+            out_path = bound.arguments[path_arg]
+            if cache.fetch(key, out_path):
+                return None
+            result = func(*args, **kwargs)
+            cache.store(key, out_path)
+            return result
+        return wrapper
+    return decorate
@@ -0,0 +1,276 @@
+"""
+Display lists: pages recorded as drawing primitives.
+
+A Recorder stands in for the canvas when a draw function runs and records
+what it draws instead of writing PDF: state changes (colors, alpha, line
+width, font, save/restore, translate/rotate), shapes (rect, round_rect,
+line, lines, circle), text, icons, links and Form XObjects (recorded once,
+referenced by name). The result is a display list of plain values, which
+dumps/loads turn into JSON and back.
+
+replay draws a display list on a backend: an object with one method per
+operation. CanvasBackend draws on a reportlab canvas and produces the same
+PDF as running the draw function on it. A PageCache keeps display lists on
+disk by page fingerprint; previews (see preview.py) use it to rasterize a
+page whose inputs did not change without running its draw function. PDF
+builds do not use it and always run the draw functions.
+
+Operations (colors are [r, g, b, alpha] lists):
+
+    save / restore
+    fill_color color          stroke_color color
+    fill_alpha a              stroke_alpha a
+    line_width w              font name size leading
+    translate dx dy           rotate degrees
+    rect x y w h stroke fill  round_rect x y w h radius stroke fill
+    line x1 y1 x2 y2          lines [[x1, y1, x2, y2], ...]
+    circle x y r stroke fill  text x y string align ("left", "right", "center")
+    icon key x y size color   link destination x1 y1 x2 y2
+    form name
+"""
+from reportlab.lib.colors import Color
+from reportlab.pdfbase import pdfmetrics
+import hashlib
+import json
+import os
+import tempfile
+
+from .incremental import code_fingerprint
+from .cache import constant_value, environment_fingerprint
+
+DISPLAY_LIST_FORMAT = 1
+
+def _encode_color(color):
+    if color is None:
+        return None
+    if isinstance(color, Color):
+        return [color.red, color.green, color.blue, color.alpha]
+    return list(color)
+
+class Recorder:
+    """Records the canvas calls of draw functions as a display list (see the module docstring)."""
+    recording = True
+
+    def __init__(self, pagesize):
+        self.pagesize = tuple(pagesize)
+        self.ops = []
+        self.forms = {}
+        self._font = ("Helvetica", 12)
+        self._font_stack = []
+
+    def display_list(self):
+        return {"format": DISPLAY_LIST_FORMAT, "pagesize": list(self.pagesize),
+                "ops": self.ops, "forms": self.forms}
+
+    # Hooks for draw_icon, link_rect and draw_form
+    def record(self, op, *args):
+        self.ops.append((op,) + args)
+
+    def record_icon(self, icon_key, x, y, size, color):
+        self.ops.append(("icon", icon_key, x, y, size, _encode_color(color)))
+
+    def record_form(self, name, draw_func, args):
+        if name not in self.forms:
+            ops, self.ops = self.ops, []
+            font_stack, self._font_stack = self._font_stack, []
+            draw_func(self, *args)
+            self.forms[name], self.ops, self._font_stack = self.ops, ops, font_stack
+        self.ops.append(("form", name))
+
+    # Canvas API used by the draw functions
+    def saveState(self):
+        self._font_stack.append(self._font)
+        self.ops.append(("save",))
+
+    def restoreState(self):
+        self._font = self._font_stack.pop()
+        self.ops.append(("restore",))
+
+    def setFillColor(self, aColor, alpha=None):
+        self.ops.append(("fill_color", _encode_color(aColor)))
+        if alpha is not None:
+            self.ops.append(("fill_alpha", alpha))
+
+    def setStrokeColor(self, aColor, alpha=None):
+        self.ops.append(("stroke_color", _encode_color(aColor)))
+        if alpha is not None:
+            self.ops.append(("stroke_alpha", alpha))
+
+    def setFillAlpha(self, a):
+        self.ops.append(("fill_alpha", a))
+
+    def setStrokeAlpha(self, a):
+        self.ops.append(("stroke_alpha", a))
+
+    def setLineWidth(self, width):
+        self.ops.append(("line_width", width))
+
+    def setFont(self, psfontname, size, leading=None):
+        self._font = (psfontname, size)
+        self.ops.append(("font", psfontname, size, leading))
+
+    def stringWidth(self, text, fontName=None, fontSize=None):
+        return pdfmetrics.stringWidth(text, fontName or self._font[0], fontSize or self._font[1])
+
+    def translate(self, dx, dy):
+        self.ops.append(("translate", dx, dy))
+
+    def rotate(self, theta):
+        self.ops.append(("rotate", theta))
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self.ops.append(("rect", x, y, width, height, stroke, fill))
+
+    def roundRect(self, x, y, width, height, radius, stroke=1, fill=0):
+        self.ops.append(("round_rect", x, y, width, height, radius, stroke, fill))
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(("line", x1, y1, x2, y2))
+
+    def lines(self, linelist):
+        self.ops.append(("lines", [list(line) for line in linelist]))
+
+    def circle(self, x_cen, y_cen, r, stroke=1, fill=0):
+        self.ops.append(("circle", x_cen, y_cen, r, stroke, fill))
+
+    def drawString(self, x, y, text):
+        self.ops.append(("text", x, y, text, "left"))
+
+    def drawRightString(self, x, y, text):
+        self.ops.append(("text", x, y, text, "right"))
+
+    def drawCentredString(self, x, y, text):
+        self.ops.append(("text", x, y, text, "center"))
+
+def record_page(draw_func, args, pagesize):
+    """Runs draw_func(recorder, *args) and returns the display list it drew."""
+    recorder = Recorder(pagesize)
+    draw_func(recorder, *args)
+    return recorder.display_list()
+
+def replay(display_list, backend):
+    """Draws a display list on a backend (see the module docstring)."""
+    forms = display_list["forms"]
+    for op, *args in display_list["ops"]:
+        if op == "form":
+            backend.form(args[0], forms[args[0]], forms)
+        else:
+            getattr(backend, op)(*args)
+
+def dumps(display_list):
+    return json.dumps(display_list, separators=(",", ":"))
+
+def loads(data):
+    return json.loads(data)
+
+# --- reportlab backend ---
+
+def _color(value):
+    return None if value is None else Color(*value)
+
+def _draw_form_ops(c, backend, ops, forms):
+    replay({"ops": ops, "forms": forms}, backend)
+
+class CanvasBackend:
+    """Replays display lists on a reportlab canvas."""
+    def __init__(self, c):
+        self.c = c
+
+    def save(self):
+        self.c.saveState()
+
+    def restore(self):
+        self.c.restoreState()
+
+    def fill_color(self, color):
+        self.c.setFillColor(_color(color))
+
+    def stroke_color(self, color):
+        self.c.setStrokeColor(_color(color))
+
+    def fill_alpha(self, a):
+        self.c.setFillAlpha(a)
+
+    def stroke_alpha(self, a):
+        self.c.setStrokeAlpha(a)
+
+    def line_width(self, width):
+        self.c.setLineWidth(width)
+
+    def font(self, name, size, leading):
+        self.c.setFont(name, size, leading)
+
+    def translate(self, dx, dy):
+        self.c.translate(dx, dy)
+
+    def rotate(self, theta):
+        self.c.rotate(theta)
+
+    def rect(self, x, y, w, h, stroke, fill):
+        self.c.rect(x, y, w, h, stroke, fill)
+
+    def round_rect(self, x, y, w, h, radius, stroke, fill):
+        self.c.roundRect(x, y, w, h, radius, stroke, fill)
+
+    def line(self, x1, y1, x2, y2):
+        self.c.line(x1, y1, x2, y2)
+
+    def lines(self, linelist):
+        self.c.lines(linelist)
+
+    def circle(self, x, y, r, stroke, fill):
+        self.c.circle(x, y, r, stroke, fill)
+
+    def text(self, x, y, text, align):
+        if align == "right":
+            self.c.drawRightString(x, y, text)
+        elif align == "center":
+            self.c.drawCentredString(x, y, text)
+        else:
+            self.c.drawString(x, y, text)
+
+    def icon(self, key, x, y, size, color):
+        from .utils import draw_icon
+        draw_icon(self.c, key, x, y, size, _color(color))
+
+    def link(self, destination, x1, y1, x2, y2):
+        from .links import link_rect
+        link_rect(self.c, destination, (x1, y1, x2, y2))
+
+    def form(self, name, ops, forms):
+        from .utils import draw_form
+        draw_form(self.c, name, _draw_form_ops, self, ops, forms)
+
+# --- Cache ---
+
+def page_fingerprint(draw_func, args, pagesize):
+    """Hash of a page's inputs: the code of its drawer (see code_fingerprint), its arguments and the environment."""
+    h = hashlib.sha256(code_fingerprint(draw_func).encode())
+    h.update(repr((constant_value(args), tuple(pagesize), DISPLAY_LIST_FORMAT)).encode())
+    h.update(environment_fingerprint().encode())
+    return h.hexdigest()
+
+class PageCache:
+    """Display lists stored in a directory as <page fingerprint>.json."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def display_list(self, draw_func, args, pagesize):
+        """Returns the display list of a page, recording and storing it if it is not cached."""
+        path = os.path.join(self.directory, page_fingerprint(draw_func, args, pagesize) + ".json")
+        try:
+            with open(path) as f:
+                display_list = loads(f.read())
+            self.hits += 1
+            return display_list
+        except (OSError, ValueError):
+            pass
+        self.misses += 1
+        display_list = record_page(draw_func, args, pagesize)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(dumps(display_list))
+        os.replace(tmp, path)
+        return display_list
@@ -0,0 +1,115 @@
+"""
+Precompiled icon bundle.
+
+Parsing SVG files needs svglib and lxml and is the slowest part of drawing
+the first icons in a process. `generate.py build_icons` parses every icon in
+ICON_DIR once and stores the resulting reportlab shapes (groups, transforms
+and path operators) as JSON in BUNDLE_PATH. draw_icon rebuilds drawings from
+the bundle, and only falls back to svglib for icons that are missing from it
+or whose SVG file changed since the bundle was built.
+"""
+import hashlib
+import json
+import os
+
+from .constants import ICON_DIR
+
+BUNDLE_PATH = os.path.join(ICON_DIR, "bundle.json")
+BUNDLE_FORMAT = 1
+
+# Attributes kept for each shape type; other attributes keep reportlab's defaults
+_DRAWING_ATTRS = ("width", "height", "transform")
+_GROUP_ATTRS = ("transform",)
+_PATH_ATTRS = ("points", "operators", "isClipPath", "autoclose", "fillMode", "fillColor", "fillOpacity",
+               "strokeColor", "strokeWidth", "strokeLineCap", "strokeLineJoin", "strokeMiterLimit",
+               "strokeDashArray", "strokeOpacity")
+
+_bundle = None
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _encode_value(value):
+    from reportlab.lib import colors
+    if isinstance(value, colors.Color):
+        return {"color": [value.red, value.green, value.blue, value.alpha]}
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+def _decode_value(name, value):
+    from reportlab.lib import colors
+    if isinstance(value, dict):
+        return colors.Color(*value["color"])
+    if name == "transform":
+        return tuple(value)
+    return value
+
+def _encode_shape(shape):
+    from reportlab.graphics.shapes import Drawing, Group, Path
+    if isinstance(shape, Drawing):
+        kind, attrs = "drawing", _DRAWING_ATTRS
+    elif isinstance(shape, Group):
+        kind, attrs = "group", _GROUP_ATTRS
+    elif isinstance(shape, Path):
+        kind, attrs = "path", _PATH_ATTRS
+    else:
+        raise ValueError(f"cannot compile {type(shape).__name__} shapes")
+    node = {"type": kind}
+    node.update((name, _encode_value(getattr(shape, name))) for name in attrs)
+    if kind != "path":
+        node["contents"] = [_encode_shape(child) for child in shape.contents]
+    return node
+
+def _decode_shape(node):
+    from reportlab.graphics.shapes import Drawing, Group, Path
+    kind = node["type"]
+    if kind == "drawing":
+        shape = Drawing(node["width"], node["height"])
+    elif kind == "group":
+        shape = Group()
+    else:
+        shape = Path()
+    for name, value in node.items():
+        if name not in ("type", "contents"):
+            setattr(shape, name, _decode_value(name, value))
+    for child in node.get("contents", ()):
+        shape.add(_decode_shape(child))
+    return shape
+
+def compile_icon_bundle(icon_dir=ICON_DIR, out_path=BUNDLE_PATH):
+    """Parses every SVG in icon_dir and writes the bundle; returns the number of icons."""
+    from svglib.svglib import svg2rlg
+    icons = {}
+    for filename in sorted(os.listdir(icon_dir)):
+        if filename.endswith(".svg"):
+            path = os.path.join(icon_dir, filename)
+            icons[filename] = {"sha256": _file_hash(path), "drawing": _encode_shape(svg2rlg(path))}
+    with open(out_path, "w") as f:
+        json.dump({"format": BUNDLE_FORMAT, "icons": icons}, f, separators=(",", ":"))
+    return len(icons)
+
+def _load_bundle():
+    global _bundle
+    if _bundle is None:
+        try:
+            with open(BUNDLE_PATH) as f:
+                bundle = json.load(f)
+        except (OSError, ValueError):
+            bundle = {}
+        _bundle = bundle.get("icons", {}) if bundle.get("format") == BUNDLE_FORMAT else {}
+    return _bundle
+
+def load_bundled_icon(filename):
+    """
+    Returns the drawing of an icon file from the bundle, or None if it is not
+    bundled or the SVG file changed since the bundle was built.
+    """
+    entry = _load_bundle().get(filename)
+    if entry is None:
+        return None
+    path = os.path.join(ICON_DIR, filename)
+    if os.path.exists(path) and _file_hash(path) != entry["sha256"]:
+        return None
+    return _decode_shape(entry["drawing"])
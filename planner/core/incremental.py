@@ -0,0 +1,244 @@
+"""
+Incremental rebuilds of a page plan.
+
+Every page is fingerprinted from the code of its drawer and of every planner
+function and class that code reaches, the values of the upper-case constants
+it reads, and its arguments. Form XObjects drawn with draw_form are separate
+units, fingerprinted from their own draw function and arguments, so a change
+to the shared page chrome does not make every page dirty.
+
+The fingerprints are stored in a manifest next to the PDF. A rebuild renders
+only the pages whose fingerprint changed, plus one page using each changed
+form, and splices them into the previous file.
+
+A drawer that only reads part of a constant can say so with @depends_on,
+e.g. a daily page only uses its own month's entry of MONTH_COLORS.
+"""
+from contextlib import nullcontext
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+
+from .cache import constant_value, icon_fingerprint
+from .pdffile import (read_pdf, splice_pages, resolve_named_destinations, add_named_destinations, page_xobjects,
+                      deduplicate)
+from .render import render_pages, plan_destinations
+
+MANIFEST_VERSION = 1
+
+_PACKAGE = __name__.split(".")[0]
+_FORM_PREFIX = "FormXob."
+
+def depends_on(declare):
+    """
+    Declares which parts of constants a drawer reads: declare(*args) returns
+    {constant name: value}. Those constants are then fingerprinted by the
+    declared values instead of as a whole.
+    """
+    def decorate(func):
+        func._depends_on = declare
+        return func
+    return decorate
+
+def qualified_name(func):
+    return f"{func.__module__}:{func.__qualname__}"
+
+def _resolve(name):
+    """Returns the function named by qualified_name, or None if it no longer exists."""
+    module, _, qualname = name.partition(":")
+    try:
+        obj = importlib.import_module(module)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+    except (ImportError, AttributeError):
+        return None
+    return obj
+
+def _in_package(value):
+    if not (inspect.isfunction(value) or inspect.isclass(value) or hasattr(value, "__wrapped__")):
+        return False
+    module = getattr(value, "__module__", None) or ""
+    return module == _PACKAGE or module.startswith(_PACKAGE + ".")
+
+def _code_objects(code):
+    yield code
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_objects(const)
+
+def code_fingerprint(func, exclude=(), narrowed=()):
+    """
+    Hashes the code of func and of every planner function or class it uses,
+    with the values of the upper-case constants they read (except the names in
+    narrowed). Functions whose qualified name is in exclude are not followed.
+    """
+    h = hashlib.sha256()
+    seen = set()
+    stack = [func]
+    while stack:
+        obj = inspect.unwrap(stack.pop())
+        name = qualified_name(obj)
+        if name in seen or name in exclude:
+            continue
+        seen.add(name)
+        h.update(name.encode())
+        if inspect.isclass(obj):
+            stack.extend(v for k, v in sorted(vars(obj).items(), reverse=True) if inspect.isfunction(v))
+            continue
+
+        for code in _code_objects(obj.__code__):
+            h.update(code.co_code)
+            h.update(repr([c for c in code.co_consts if not inspect.iscode(c)]).encode())
+            h.update(repr(code.co_names).encode())
+            for global_name in code.co_names:
+                if global_name not in obj.__globals__:
+                    continue
+                value = obj.__globals__[global_name]
+                if global_name.isupper():
+                    if global_name not in narrowed:
+                        h.update(f"{global_name}={constant_value(value)!r}".encode())
+                elif _in_package(value):
+                    stack.append(value)
+    return h.hexdigest()
+
+class _Fingerprinter:
+    """Page and form fingerprints, sharing the code walk between pages with the same drawer."""
+    def __init__(self, form_functions):
+        self.exclude = frozenset(form_functions)
+        self._code = {}
+
+    def code(self, func, narrowed=()):
+        key = (func, frozenset(narrowed))
+        if key not in self._code:
+            self._code[key] = code_fingerprint(func, self.exclude, narrowed)
+        return self._code[key]
+
+    def page(self, draw_func, args):
+        declare = getattr(draw_func, "_depends_on", None)
+        narrowed = declare(*args) if declare else {}
+        h = hashlib.sha256(self.code(draw_func, narrowed).encode())
+        h.update(repr((constant_value(narrowed), constant_value(args))).encode())
+        return h.hexdigest()
+
+def _form_fingerprint(draw_func, args_repr):
+    if draw_func is None:
+        return None
+    return hashlib.sha256((code_fingerprint(draw_func) + args_repr).encode()).hexdigest()
+
+def _environment(pagesize, named_destinations, compact):
+    import reportlab
+    from .. import __version__
+    return hashlib.sha256(repr((
+        __version__, reportlab.Version, sys.version_info[:2], tuple(pagesize), icon_fingerprint(),
+        named_destinations, compact,
+    )).encode()).hexdigest()
+
+def _load_previous(out_path, manifest_path, environment):
+    """Returns (manifest, pdf bytes) of the previous build, or None if it cannot be reused."""
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        with open(out_path, "rb") as f:
+            data = f.read()
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("environment") != environment
+            or manifest.get("pdf") != hashlib.md5(data, usedforsecurity=False).hexdigest()):
+        return None
+    return manifest, data
+
+def _used_forms(doc):
+    """Returns the names of the forms used by each page of a document."""
+    return [{name[len(_FORM_PREFIX):] for name in page_xobjects(doc, ref) if name.startswith(_FORM_PREFIX)}
+            for ref in doc.page_refs()]
+
+def build_incremental(pages, pagesize, out_path, tracer=None, named_destinations=False, compact=False,
+                      progress=None):
+    """
+    Renders a page plan to out_path, reusing the pages of the previous build at
+    the same path whose inputs did not change. The manifest is kept in
+    out_path + ".deps.json". Returns {"reused": pages, "rebuilt": pages}.
+    With named_destinations, the destinations are also listed by name in the
+    catalog, and with compact duplicate objects are merged and the file is
+    written with object streams. An optional Progress counts the reused pages
+    as done at once, then every page rendered.
+    """
+    manifest_path = out_path + ".deps.json"
+    environment = _environment(pagesize, named_destinations, compact)
+    previous = _load_previous(out_path, manifest_path, environment)
+    destinations = [dest for dest, draw_func, args in pages]
+
+    old_doc = None
+    dirty = range(len(pages))
+    if previous is not None and [dest for dest, fp in previous[0]["pages"]] == destinations:
+        manifest, data = previous
+        old_forms = manifest["forms"]
+        fingerprints = _Fingerprinter(func for func, args_repr, fp in old_forms.values())
+        dirty = {i for i, ((dest, draw_func, args), (old_dest, old_fp)) in enumerate(zip(pages, manifest["pages"]))
+                 if fingerprints.page(draw_func, args) != old_fp}
+
+        changed_forms = {name for name, (func, args_repr, fp) in old_forms.items()
+                         if _form_fingerprint(_resolve(func), args_repr) != fp}
+        if not dirty and not changed_forms:
+            if progress is not None:
+                progress.advance(len(pages))
+            return {"reused": len(pages), "rebuilt": 0}
+
+        old_doc = read_pdf(data)
+        used = _used_forms(old_doc)
+        # A changed form is drawn again by one of the pages using it
+        for name in changed_forms:
+            users = [i for i, names in enumerate(used) if name in names]
+            if users and not dirty.intersection(users):
+                dirty.add(users[0])
+        dirty = sorted(dirty)
+
+    if progress is not None and len(dirty) < len(pages):
+        progress.advance(len(pages) - len(dirty))
+    forms = {}
+    data = render_pages([pages[i] for i in dirty], pagesize, tracer=tracer, forms=forms,
+                        named_destinations=named_destinations and old_doc is None, progress=progress, invariant=1)
+    if old_doc is not None:
+        with tracer.span(None, "splice", "merge") if tracer else nullcontext():
+            doc = splice_pages(old_doc, read_pdf(data), {i: j for j, i in enumerate(dirty)})
+            resolve_named_destinations(doc, plan_destinations(pages))
+            if named_destinations:
+                add_named_destinations(doc, plan_destinations(pages))
+            if compact:
+                deduplicate(doc)
+            data = doc.tobytes(object_streams=compact)
+        used = _used_forms(doc)
+        form_entries = {name: entry for name, entry in previous[0]["forms"].items() if name not in forms}
+    else:
+        if compact:
+            doc = read_pdf(data)
+            deduplicate(doc)
+            data = doc.tobytes(object_streams=True)
+        used = None
+        form_entries = {}
+    for name, (draw_func, args) in forms.items():
+        args_repr = repr(constant_value(args))
+        form_entries[name] = [qualified_name(inspect.unwrap(draw_func)), args_repr,
+                              _form_fingerprint(draw_func, args_repr)]
+    if used is not None:
+        in_use = set().union(*used)
+        form_entries = {name: entry for name, entry in form_entries.items() if name in in_use}
+
+    # Fingerprints are stored with the form functions of this build excluded
+    fingerprints = _Fingerprinter(func for func, args_repr, fp in form_entries.values())
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "environment": environment,
+        "pdf": hashlib.md5(data, usedforsecurity=False).hexdigest(),
+        "pages": [[dest, fingerprints.page(draw_func, args)] for dest, draw_func, args in pages],
+        "forms": form_entries,
+    }
+    with open(out_path, "wb") as f:
+        f.write(data)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return {"reused": len(pages) - len(dirty), "rebuilt": len(dirty)}
@@ -0,0 +1,100 @@
+"""
+Declarative page layouts.
+
+A layout is a function of the page size returning the elements of a page:
+texts and sections. A section is a card with an optional title (icon and
+color), filled with rows of a given style, a checklist or a dot grid.
+compile_layout turns a layout into a draw plan, a flat list of canvas calls
+with every coordinate worked out, and keeps it per layout and page size;
+replay_plan draws a plan. Every copy of a page after the first only pays for
+issuing its canvas calls.
+
+A plan is a list of (operation, args) steps. The operation is the name of a
+canvas method, or a function called as operation(c, *args).
+"""
+from reportlab.lib.units import mm
+from collections import namedtuple
+from functools import lru_cache
+
+from .constants import BACKGROUND_COLOR, CARD_COLOR, SEPARATOR_COLOR
+from .utils import draw_icon
+from .backgrounds import draw_dot_grid
+
+# Elements; box is (x, top, width, height)
+Text = namedtuple("Text", "x y text font size color align", defaults=("left",))
+Section = namedtuple("Section", "box title icon color content", defaults=(None, None, None, None))
+
+# Section contents
+Rows = namedtuple("Rows", "height count marker", defaults=(None, None))
+Checklist = namedtuple("Checklist", "items font size color")
+DotGrid = namedtuple("DotGrid", "inset", defaults=(5 * mm,))
+
+_DRAW_STRING = {"left": "drawString", "right": "drawRightString", "center": "drawCentredString"}
+
+# Where the writing line of a row starts, by row marker
+_ROW_INDENT = {None: 5 * mm, "checkbox": 12 * mm, "bullet": 10 * mm}
+
+def _compile_rows(plan, rows, color, x, top, w, h):
+    """Rows with a writing line and an optional checkbox or bullet, centered vertically in the box."""
+    count = rows.count or max(1, int((h - 4*mm) / rows.height))
+    margin_y = (h - count * rows.height) / 2
+    for i in range(count):
+        row_top = top - margin_y - (i * rows.height)
+        row_bottom = row_top - rows.height
+        row_center = row_top - (rows.height / 2)
+        plan += [("setStrokeColor", (SEPARATOR_COLOR,)), ("setLineWidth", (0.5,)),
+                 ("line", (x + _ROW_INDENT[rows.marker], row_bottom + 2*mm, x + w - 5*mm, row_bottom + 2*mm))]
+        if rows.marker == "checkbox":
+            plan += [("setStrokeColor", (color,)), ("setLineWidth", (0.8,)),
+                     ("rect", (x + 5*mm, row_center - 2*mm, 4*mm, 4*mm, 1, 0))]
+        elif rows.marker == "bullet":
+            plan += [("setFillColor", (color,)), ("circle", (x + 7*mm, row_center, 1*mm, 0, 1))]
+
+def _compile_checklist(plan, checklist, color, x, top, h):
+    """Lines of text with a small checkbox each, spread over the height of the box."""
+    plan += [("setFont", (checklist.font, checklist.size)), ("setFillColor", (checklist.color,))]
+    y = top - 8 * mm
+    spacing = (h - 10*mm) / len(checklist.items)
+    for item in checklist.items:
+        plan += [("setStrokeColor", (color,)), ("setLineWidth", (0.6,)),
+                 ("rect", (x + 5*mm, y - 0.5*mm, 2.5*mm, 2.5*mm, 1, 0)),
+                 ("drawString", (x + 10*mm, y, item))]
+        y -= spacing
+
+def _compile_section(plan, section):
+    x, top, w, h = section.box
+    if section.title:
+        plan += [("setFillColor", (section.color,)), ("setFont", ("Helvetica-Bold", 13)),
+                 (draw_icon, (section.icon, x + 1*mm, top + 1.5*mm, 4.5*mm, section.color)),
+                 ("drawString", (x + 7*mm, top + 2.0*mm, section.title))]
+    plan += [("setFillColor", (CARD_COLOR,)), ("roundRect", (x, top - h, w, h, 5*mm, 0, 1))]
+
+    content = section.content
+    if isinstance(content, Rows):
+        _compile_rows(plan, content, section.color, x, top, w, h)
+    elif isinstance(content, Checklist):
+        _compile_checklist(plan, content, section.color, x, top, h)
+    elif isinstance(content, DotGrid):
+        inset = content.inset
+        plan.append((draw_dot_grid, (x + inset, x + w - inset, top - inset, top - h + inset)))
+
+@lru_cache(maxsize=32)
+def compile_layout(layout, W, H):
+    """Returns the draw plan of layout(W, H) on its page background."""
+    plan = [("saveState", ()), ("setFillColor", (BACKGROUND_COLOR,)), ("rect", (0, 0, W, H, 0, 1))]
+    for element in layout(W, H):
+        if isinstance(element, Text):
+            plan += [("setFillColor", (element.color,)), ("setFont", (element.font, element.size)),
+                     (_DRAW_STRING[element.align], (element.x, element.y, element.text))]
+        else:
+            _compile_section(plan, element)
+    plan.append(("restoreState", ()))
+    return tuple(plan)
+
+def replay_plan(c, plan):
+    """Draws a plan made by compile_layout."""
+    for operation, args in plan:
+        if isinstance(operation, str):
+            getattr(c, operation)(*args)
+        else:
+            operation(c, *args)
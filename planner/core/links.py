@@ -0,0 +1,86 @@
+"""
+Compact link annotations.
+
+reportlab's linkRect writes every link as a self-contained annotation with
+its own Border array, empty Contents and inline destination. The planner has
+thousands of links to a few hundred destinations, so link_rect writes lean
+annotations instead: all of them share one invisible Border array, and all
+links to the same destination share one GoTo action. A link to the same
+destination as an earlier link on the page whose rectangle lines up with it
+(touching or overlapping along a full edge, or contained in it) extends that
+annotation rather than adding one.
+
+Counts are kept on the canvas in `link_stats`: links requested, annotations
+written and shared objects (border and actions) created.
+"""
+from reportlab.pdfbase import pdfdoc
+
+# Rectangles closer than this (in points) are treated as touching
+_EPSILON = 0.01
+
+class _LinkAnnotation(pdfdoc.PDFObject):
+    """A link annotation whose rectangle can still grow until the document is saved."""
+    def __init__(self, rect, action, border):
+        self.rect = rect
+        self.action = action
+        self.border = border
+
+    def format(self, document):
+        return pdfdoc.format(pdfdoc.PDFDictionary({
+            "Type": pdfdoc.PDFName("Annot"),
+            "Subtype": pdfdoc.PDFName("Link"),
+            "Rect": pdfdoc.PDFArray(self.rect),
+            "Border": self.border,
+            "A": self.action,
+        }), document)
+
+def _merge_rects(a, b):
+    """Returns the union of two rectangles if it is itself a rectangle covering nothing else, else None."""
+    ax0, ay0, ax1, ay1 = a
+    bx0, by0, bx1, by1 = b
+    if ax0 - _EPSILON <= bx0 and bx1 <= ax1 + _EPSILON and ay0 - _EPSILON <= by0 and by1 <= ay1 + _EPSILON:
+        return a
+    same_x = abs(ax0 - bx0) <= _EPSILON and abs(ax1 - bx1) <= _EPSILON
+    same_y = abs(ay0 - by0) <= _EPSILON and abs(ay1 - by1) <= _EPSILON
+    if (same_x and by0 <= ay1 + _EPSILON and ay0 <= by1 + _EPSILON) or \
+       (same_y and bx0 <= ax1 + _EPSILON and ax0 <= bx1 + _EPSILON):
+        return (min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))
+    return None
+
+def _shared_ref(c, name, make):
+    """Registers a shared object under name on first use and returns a reference to it."""
+    if name not in c._doc.idToObject:
+        c._doc.Reference(make(), name)
+        c.link_stats["shared"] += 1
+    return pdfdoc.PDFObjectReference(name)
+
+def link_rect(c, destination, rect):
+    """
+    Makes rect (x1, y1, x2, y2 in the current user space) an invisible link to
+    the named destination, which may be bookmarked later.
+    """
+    if getattr(c, "recording", False):
+        return c.record("link", destination, *rect)
+    stats = getattr(c, "link_stats", None)
+    if stats is None:
+        stats = c.link_stats = {"links": 0, "annotations": 0, "shared": 0}
+    stats["links"] += 1
+    rect = c._absRect(rect, 1)
+
+    # Links to the same destination already on this page
+    if getattr(c, "_page_links", (None,))[0] != c._pageNumber:
+        c._page_links = (c._pageNumber, {})
+    page_links = c._page_links[1].setdefault(destination, [])
+    for annotation in page_links:
+        merged = _merge_rects(annotation.rect, rect) or _merge_rects(rect, annotation.rect)
+        if merged is not None:
+            annotation.rect = merged
+            return
+
+    border = _shared_ref(c, "LinkBorder", lambda: pdfdoc.PDFArray([0, 0, 0]))
+    action = _shared_ref(c, "LinkAction." + destination, lambda: pdfdoc.PDFDictionary({
+        "S": pdfdoc.PDFName("GoTo"), "D": c._bookmarkReference(destination)}))
+    annotation = _LinkAnnotation(rect, action, border)
+    c._addAnnotation(annotation)
+    page_links.append(annotation)
+    stats["annotations"] += 1
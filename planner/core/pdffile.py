@@ -0,0 +1,864 @@
+"""
+Minimal PDF object reader and writer.
+
+reportlab can only write documents, so anything done to a finished PDF
+(merging chunks rendered in other processes, resolving links between them,
+merging duplicate objects) goes through this module. It understands the
+subset of PDF that reportlab produces (classic cross-reference tables,
+indirect objects and Flate or ASCII85 streams) and can also write and read compact
+PDF 1.5 files, in which the objects that are not streams are packed into
+compressed object streams and the cross-reference table is itself a
+compressed stream.
+"""
+from collections import namedtuple
+import base64
+import hashlib
+import re
+import zlib
+
+class PDFName(str):
+    """A PDF name, stored without the leading slash."""
+    __slots__ = ()
+
+class PDFString(bytes):
+    """A PDF string (literal or hex in the file)."""
+    __slots__ = ()
+
+PDFRef = namedtuple("PDFRef", "num gen")
+
+class PDFStream:
+    """A stream object: its dictionary plus the raw (still encoded) data."""
+    def __init__(self, dictionary, data):
+        self.dict = dictionary
+        self.data = data
+
+    def decoded(self):
+        """Returns the stream data with its filters removed."""
+        filters = self.dict.get("Filter")
+        if filters is None:
+            return self.data
+        if not isinstance(filters, list):
+            filters = [filters]
+        data = self.data
+        for f in filters:
+            if f == "FlateDecode":
+                data = zlib.decompress(data)
+            elif f == "ASCII85Decode":
+                data = base64.a85decode(data.strip(), adobe=True)
+            else:
+                raise ValueError(f"unsupported stream filter /{f}")
+        return data
+
+    def set_data(self, data, compress=True):
+        """Replaces the stream content, optionally Flate-compressing it."""
+        self.dict.pop("DecodeParms", None)
+        if compress:
+            self.data = zlib.compress(data)
+            self.dict["Filter"] = PDFName("FlateDecode")
+        else:
+            self.data = data
+            self.dict.pop("Filter", None)
+
+# Objects packed into each object stream of a compact file
+OBJECTS_PER_STREAM = 100
+
+def _object_stream(items):
+    """Packs (object number, serialized object) pairs into an object stream."""
+    header, body, offset = [], [], 0
+    for num, data in items:
+        header.append(b"%d %d" % (num, offset))
+        body.append(data)
+        offset += len(data) + 1
+    header = b" ".join(header) + b"\n"
+    stream = PDFStream({"Type": PDFName("ObjStm"), "N": len(items), "First": len(header)}, b"")
+    stream.set_data(header + b"\n".join(body))
+    return stream
+
+def _xref_stream(entries, trailer):
+    """
+    Builds a cross-reference stream from one (type, field 2, field 3) entry per
+    object number: (1, offset, 0) for objects in the file and (2, object stream,
+    index) for objects packed into an object stream.
+    """
+    width = max(1, (max(f2 for t, f2, f3 in entries).bit_length() + 7) // 8)
+    data = b"".join(bytes((t,)) + f2.to_bytes(width, "big") + f3.to_bytes(2, "big") for t, f2, f3 in entries)
+    stream = PDFStream(dict({"Type": PDFName("XRef")}, **trailer, Size=len(entries), W=[1, width, 2]), b"")
+    stream.set_data(data)
+    return stream
+
+def _compact_version(version):
+    return max(version, "1.5")
+
+# --- Parsing ---
+
+_WHITESPACE = b" \t\r\n\x0c\x00"
+_DELIMITERS = b"()<>[]{}/%"
+_REGULAR_RE = re.compile(rb"[^ \t\r\n\x0c\x00()<>\[\]{}/%]+")
+_NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)$")
+_INT_RE = re.compile(rb"\d+$")
+_SPACE_RE = re.compile(rb"(?:[ \t\r\n\x0c\x00]+|%[^\r\n]*)*")
+_OBJ_HEADER_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj")
+_OCTAL_RE = re.compile(rb"[0-7]{1,3}")
+_ESCAPES = {
+    ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b",
+    ord("f"): b"\f", ord("("): b"(", ord(")"): b")", ord("\\"): b"\\",
+}
+
+class Keyword(str):
+    """A bare token that is not a number, boolean or null (obj, stream, R, operators...)."""
+    __slots__ = ()
+
+class Parser:
+    """Reads PDF objects from a byte string starting at a given offset."""
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def skip_space(self):
+        self.pos = _SPACE_RE.match(self.data, self.pos).end()
+
+    def at_end(self):
+        self.skip_space()
+        return self.pos >= len(self.data)
+
+    def parse(self):
+        """Parses and returns the next object."""
+        self.skip_space()
+        data = self.data
+        ch = data[self.pos:self.pos + 1]
+        if ch == b"/":
+            return self._parse_name()
+        if ch == b"<":
+            if data[self.pos + 1:self.pos + 2] == b"<":
+                return self._parse_dict()
+            return self._parse_hex_string()
+        if ch == b"[":
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_space()
+                if data[self.pos:self.pos + 1] == b"]":
+                    self.pos += 1
+                    return items
+                items.append(self.parse())
+        if ch == b"(":
+            return self._parse_literal_string()
+        if not ch:
+            raise ValueError("unexpected end of data")
+        if ch in b">)]}{":
+            # Stray delimiter (e.g. '>>' or ']' seen by a content stream reader)
+            self.pos += 2 if data[self.pos:self.pos + 2] == b">>" else 1
+            return Keyword(ch.decode("latin-1"))
+
+        m = _REGULAR_RE.match(data, self.pos)
+        token = m.group()
+        self.pos = m.end()
+        if _INT_RE.match(token):
+            # Could be the start of an indirect reference "num gen R"
+            save = self.pos
+            self.skip_space()
+            m2 = _REGULAR_RE.match(data, self.pos)
+            if m2 and _INT_RE.match(m2.group()):
+                self.pos = m2.end()
+                self.skip_space()
+                if data[self.pos:self.pos + 1] == b"R" and (
+                        self.pos + 1 >= len(data) or data[self.pos + 1] in _WHITESPACE + _DELIMITERS):
+                    self.pos += 1
+                    return PDFRef(int(token), int(m2.group()))
+            self.pos = save
+            return int(token)
+        if _NUMBER_RE.match(token):
+            return int(token) if b"." not in token else float(token)
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        return Keyword(token.decode("latin-1"))
+
+    def _parse_name(self):
+        m = _REGULAR_RE.match(self.data, self.pos + 1)
+        raw = m.group() if m else b""
+        self.pos = self.pos + 1 + len(raw)
+        if b"#" in raw:
+            raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda x: bytes([int(x.group(1), 16)]), raw)
+        return PDFName(raw.decode("latin-1"))
+
+    def _parse_dict(self):
+        self.pos += 2
+        d = {}
+        data = self.data
+        while True:
+            self.skip_space()
+            if data[self.pos:self.pos + 2] == b">>":
+                self.pos += 2
+                return d
+            key = self.parse()
+            if not isinstance(key, PDFName):
+                raise ValueError(f"dictionary key is not a name at offset {self.pos}")
+            d[key] = self.parse()
+
+    def _parse_hex_string(self):
+        end = self.data.index(b">", self.pos)
+        digits = re.sub(rb"\s", b"", self.data[self.pos + 1:end])
+        if len(digits) % 2:
+            digits += b"0"
+        self.pos = end + 1
+        return PDFString(bytes.fromhex(digits.decode("ascii")))
+
+    def _parse_literal_string(self):
+        data = self.data
+        pos = self.pos + 1
+        depth = 1
+        out = bytearray()
+        while True:
+            b = data[pos]
+            if b == 0x5C:  # backslash
+                nxt = data[pos + 1]
+                if nxt in _ESCAPES:
+                    out += _ESCAPES[nxt]
+                    pos += 2
+                elif 0x30 <= nxt <= 0x37:
+                    m = _OCTAL_RE.match(data, pos + 1)
+                    out.append(int(m.group(), 8) & 0xFF)
+                    pos = m.end()
+                elif nxt in b"\r\n":
+                    # Line continuation
+                    pos += 3 if data[pos + 1:pos + 3] == b"\r\n" else 2
+                else:
+                    out.append(nxt)
+                    pos += 2
+                continue
+            if b == 0x28:
+                depth += 1
+            elif b == 0x29:
+                depth -= 1
+                if not depth:
+                    break
+            out.append(b)
+            pos += 1
+        self.pos = pos + 1
+        return PDFString(bytes(out))
+
+# --- Serialization ---
+
+def _format_real(v):
+    s = ("%.6f" % v).rstrip("0").rstrip(".")
+    return "0" if s in ("-0", "") else s
+
+def _escape_name(name):
+    out = []
+    for ch in name.encode("latin-1"):
+        if ch < 0x21 or ch > 0x7E or ch in b"()<>[]{}/%#":
+            out.append("#%02X" % ch)
+        else:
+            out.append(chr(ch))
+    return "/" + "".join(out)
+
+def _escape_string(s):
+    if any(b < 0x20 or b > 0x7E for b in s if b not in b"\n\r\t"):
+        return b"<" + s.hex().encode("ascii") + b">"
+    s = s.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    # A raw CR in a literal string reads back as LF
+    return b"(" + s.replace(b"\r", b"\\r") + b")"
+
+def serialize(obj):
+    """Returns the PDF syntax for an object as bytes."""
+    if obj is None:
+        return b"null"
+    if obj is True:
+        return b"true"
+    if obj is False:
+        return b"false"
+    if isinstance(obj, PDFRef):
+        return b"%d %d R" % obj
+    if isinstance(obj, int):
+        return b"%d" % obj
+    if isinstance(obj, float):
+        return _format_real(obj).encode("ascii")
+    if isinstance(obj, Keyword):
+        return obj.encode("latin-1")
+    if isinstance(obj, str):
+        return _escape_name(obj).encode("latin-1")
+    if isinstance(obj, bytes):
+        return _escape_string(obj)
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b" ".join(serialize(x) for x in obj) + b"]"
+    if isinstance(obj, dict):
+        return b"<<" + b" ".join(
+            _escape_name(k).encode("latin-1") + b" " + serialize(v) for k, v in obj.items()) + b">>"
+    if isinstance(obj, PDFStream):
+        obj.dict["Length"] = len(obj.data)
+        return serialize(obj.dict) + b"\nstream\n" + obj.data + b"\nendstream"
+    raise TypeError(f"cannot serialize {type(obj).__name__} to PDF")
+
+def iter_refs(obj):
+    """Yields every indirect reference contained (directly or nested) in an object."""
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if isinstance(o, PDFRef):
+            yield o
+        elif isinstance(o, dict):
+            stack.extend(o.values())
+        elif isinstance(o, list):
+            stack.extend(o)
+        elif isinstance(o, PDFStream):
+            stack.extend(o.dict.values())
+
+def rewrite_refs(obj, mapping):
+    """Returns a copy of obj with every reference replaced by mapping[ref.num]."""
+    if isinstance(obj, PDFRef):
+        return mapping[obj.num]
+    if isinstance(obj, dict):
+        return {k: rewrite_refs(v, mapping) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [rewrite_refs(v, mapping) for v in obj]
+    if isinstance(obj, PDFStream):
+        return PDFStream(rewrite_refs(obj.dict, mapping), obj.data)
+    return obj
+
+# --- Documents ---
+
+class PDFDocument:
+    """A PDF file as a table of numbered objects plus its trailer."""
+    def __init__(self, objects=None, trailer=None, version="1.4"):
+        self.objects = objects if objects is not None else {}
+        self.trailer = trailer if trailer is not None else {}
+        self.version = version
+
+    def get(self, obj):
+        """Follows an indirect reference (other objects are returned unchanged)."""
+        while isinstance(obj, PDFRef):
+            obj = self.objects.get(obj.num)
+        return obj
+
+    def add(self, obj):
+        """Adds an object and returns the reference to it."""
+        num = max(self.objects, default=0) + 1
+        self.objects[num] = obj
+        return PDFRef(num, 0)
+
+    @property
+    def catalog(self):
+        return self.get(self.trailer["Root"])
+
+    def page_refs(self):
+        """Returns references to all pages in document order."""
+        refs = []
+        def walk(ref):
+            node = self.get(ref)
+            if node.get("Type") == "Pages":
+                for kid in node["Kids"]:
+                    walk(kid)
+            else:
+                refs.append(ref)
+        walk(self.catalog["Pages"])
+        return refs
+
+    def reachable(self, roots, skip_parents=False, exclude=()):
+        """
+        Returns the object numbers reachable from the given objects, in discovery order.
+        With skip_parents, /Parent links are not followed (so walking from a page
+        does not pull in the rest of the page tree). Objects numbered in exclude
+        are neither returned nor walked into.
+        """
+        seen = {}
+        stack = list(iter_refs(roots))
+        while stack:
+            ref = stack.pop()
+            if ref.num in seen or ref.num in exclude or ref.num not in self.objects:
+                continue
+            seen[ref.num] = None
+            obj = self.objects[ref.num]
+            if skip_parents and isinstance(obj, dict) and "Parent" in obj:
+                obj = {k: v for k, v in obj.items() if k != "Parent"}
+            stack.extend(iter_refs(obj))
+        return list(seen)
+
+    def tobytes(self, object_streams=False):
+        """
+        Serializes the document, dropping unreachable objects and renumbering the rest.
+        With object_streams, writes a compact PDF 1.5 file (see the module docstring).
+        """
+        keep = sorted(self.reachable(self.trailer))
+        mapping = {num: PDFRef(i + 1, 0) for i, num in enumerate(keep)}
+        trailer = rewrite_refs({k: v for k, v in self.trailer.items()
+                                if k in ("Root", "Info", "ID")}, mapping)
+
+        version = _compact_version(self.version) if object_streams else self.version
+        out = bytearray(b"%PDF-" + version.encode("ascii") + b"\n%\x93\x8c\x8b\x9e\n")
+        entries = [(0, 0, 65535)]
+        packed = []
+        body = hashlib.md5(usedforsecurity=False)
+        for num in keep:
+            obj = rewrite_refs(self.objects[num], mapping)
+            data = serialize(obj)
+            body.update(data)
+            if object_streams and not isinstance(obj, PDFStream):
+                entries.append(None)
+                packed.append((mapping[num].num, data))
+                continue
+            entries.append((1, len(out), 0))
+            out += b"%d 0 obj\n" % mapping[num].num + data + b"\nendobj\n"
+
+        for i in range(0, len(packed), OBJECTS_PER_STREAM):
+            group = packed[i:i + OBJECTS_PER_STREAM]
+            stream_num = len(entries)
+            for index, (num, data) in enumerate(group):
+                entries[num] = (2, stream_num, index)
+            entries.append((1, len(out), 0))
+            out += b"%d 0 obj\n" % stream_num + serialize(_object_stream(group)) + b"\nendobj\n"
+
+        if "ID" not in trailer:
+            digest = PDFString(body.digest())
+            trailer["ID"] = [digest, digest]
+
+        xref = len(out)
+        if object_streams:
+            entries.append((1, xref, 0))
+            out += b"%d 0 obj\n" % (len(entries) - 1) + serialize(_xref_stream(entries, trailer)) + b"\nendobj\n"
+        else:
+            trailer["Size"] = len(entries)
+            out += b"xref\n0 %d\n0000000000 65535 f \n" % len(entries)
+            for t, offset, gen in entries[1:]:
+                out += b"%010d 00000 n \n" % offset
+            out += b"trailer\n" + serialize(trailer) + b"\n"
+        out += b"startxref\n%d\n%%%%EOF\n" % xref
+        return bytes(out)
+
+    def write(self, path, object_streams=False):
+        with open(path, "wb") as f:
+            f.write(self.tobytes(object_streams))
+
+def _read_stream_at(data, offset, resolve_length):
+    """Parses the indirect object at offset; returns it (a PDFStream if it is a stream)."""
+    m = _OBJ_HEADER_RE.match(data, offset)
+    parser = Parser(data, m.end())
+    obj = parser.parse()
+    parser.skip_space()
+    if data.startswith(b"stream", parser.pos):
+        start = parser.pos + 6
+        start += 2 if data[start:start + 2] == b"\r\n" else 1
+        length = obj["Length"]
+        if isinstance(length, PDFRef):
+            length = resolve_length(length.num)
+        obj = PDFStream(obj, data[start:start + length])
+    return obj
+
+def _read_xref_stream(stream, offsets, packed):
+    """Adds the entries of a cross-reference stream to offsets and packed (object stream, index)."""
+    if "DecodeParms" in stream.dict:
+        raise ValueError("cross-reference streams with predictors are not supported")
+    widths = stream.dict["W"]
+    index = stream.dict.get("Index", [0, stream.dict["Size"]])
+    data = stream.decoded()
+    pos = 0
+    for start, count in zip(index[::2], index[1::2]):
+        for num in range(start, start + count):
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(data[pos:pos + width], "big") if width else None)
+                pos += width
+            kind = 1 if fields[0] is None else fields[0]
+            # Sections are read newest first, so the first entry for an object wins
+            if num in offsets or num in packed:
+                continue
+            if kind == 1:
+                offsets[num] = fields[1]
+            elif kind == 2:
+                packed[num] = (fields[1], fields[2])
+
+def read_pdf(data):
+    """Parses a PDF file (bytes) into a PDFDocument."""
+    version = re.match(rb"%PDF-(\d\.\d)", data)
+    startxref = data.rindex(b"startxref")
+    offset = int(data[startxref + 9:].split()[0])
+
+    offsets = {}
+    packed = {}
+    trailer = {}
+    while offset is not None:
+        parser = Parser(data, offset)
+        if parser.parse() != "xref":
+            # A cross-reference stream, which is also the trailer
+            section = _read_stream_at(data, offset, None)
+            _read_xref_stream(section, offsets, packed)
+            section = section.dict
+        else:
+            while True:
+                token = parser.parse()
+                if token == "trailer":
+                    break
+                start, count = token, parser.parse()
+                parser.skip_space()
+                for i in range(count):
+                    entry = data[parser.pos:parser.pos + 20].split()
+                    parser.pos += 20
+                    if entry[2] == b"n" and start + i not in packed:
+                        offsets.setdefault(start + i, int(entry[0]))
+            section = parser.parse()
+        for k, v in section.items():
+            if k not in ("Type", "W", "Index", "Length", "Filter", "DecodeParms"):
+                trailer.setdefault(k, v)
+        offset = section.get("Prev")
+
+    doc = PDFDocument(trailer=trailer, version=version.group(1).decode() if version else "1.4")
+    objects = doc.objects
+
+    def load(num):
+        if num not in objects:
+            objects[num] = _read_stream_at(data, offsets[num], load)
+        return objects[num]
+
+    for num in sorted(offsets):
+        load(num)
+
+    # Unpack object streams, then drop them and the cross-reference streams
+    streams = {}
+    for num, (stream_num, index) in sorted(packed.items()):
+        if stream_num not in streams:
+            stream = load(stream_num)
+            content = stream.decoded()
+            parser = Parser(content)
+            pairs = [(parser.parse(), parser.parse()) for i in range(stream.dict["N"])]
+            streams[stream_num] = (content, stream.dict["First"], pairs)
+        content, first, pairs = streams[stream_num]
+        obj_num, obj_offset = pairs[index]
+        objects[num] = Parser(content, first + obj_offset).parse()
+    for num in list(objects):
+        obj = objects[num]
+        if isinstance(obj, PDFStream) and obj.dict.get("Type") in ("ObjStm", "XRef"):
+            del objects[num]
+    return doc
+
+def _finish_document(out, pages_ref, kids, info_source):
+    """Fills in the page tree and adds a catalog, taking the Info dictionary from info_source."""
+    pages = out.get(pages_ref)
+    pages["Kids"] = kids
+    pages["Count"] = len(kids)
+    catalog = {"Type": PDFName("Catalog"), "Pages": pages_ref, "PageMode": PDFName("UseNone")}
+    out.trailer["Root"] = out.add(catalog)
+    info = info_source.get(info_source.trailer.get("Info"))
+    if info is not None:
+        out.trailer["Info"] = out.add(dict(info))
+
+def merge_documents(docs):
+    """
+    Concatenates the pages of several documents into a new document.
+    Document-level objects other than the pages and what they use are dropped;
+    the Info dictionary of the first document is kept.
+    """
+    out = PDFDocument(version=max(doc.version for doc in docs))
+    pages_ref = out.add({"Type": PDFName("Pages"), "Kids": [], "Count": 0})
+    kids = []
+
+    for doc in docs:
+        page_refs = doc.page_refs()
+        page_nums = {ref.num for ref in page_refs}
+        # Copy the pages and everything they use, but not their old page tree
+        nums = doc.reachable(page_refs, skip_parents=True)
+        base = max(out.objects) + 1
+        mapping = {num: PDFRef(base + i, 0) for i, num in enumerate(nums)}
+        for num in nums:
+            obj = rewrite_refs(doc.objects[num], mapping) if num not in page_nums else \
+                rewrite_refs({k: v for k, v in doc.objects[num].items() if k != "Parent"}, mapping)
+            if num in page_nums:
+                obj["Parent"] = pages_ref
+            out.objects[mapping[num].num] = obj
+        kids.extend(mapping[ref.num] for ref in page_refs)
+
+    _finish_document(out, pages_ref, kids, docs[0])
+    return out
+
+def _copy_pages(out, doc, page_refs, targets, mapping, pages_ref):
+    """
+    Copies pages of doc into out at the references in targets, with everything
+    they use. mapping holds objects of doc already placed in out and is updated.
+    """
+    pages = []
+    for ref, target in zip(page_refs, targets):
+        mapping[ref.num] = target
+        pages.append({k: v for k, v in doc.get(ref).items() if k != "Parent"})
+    nums = doc.reachable(pages, skip_parents=True, exclude=mapping)
+    base = max(out.objects) + 1
+    mapping.update((num, PDFRef(base + i, 0)) for i, num in enumerate(nums))
+    for num in nums:
+        out.objects[mapping[num].num] = rewrite_refs(doc.objects[num], mapping)
+    for page, target in zip(pages, targets):
+        page = rewrite_refs(page, mapping)
+        page["Parent"] = pages_ref
+        out.objects[target.num] = page
+
+def page_xobjects(doc, ref):
+    """Returns the XObject resources of a page as {name: ref}."""
+    resources = doc.get(doc.get(ref).get("Resources", {}))
+    return doc.get(resources.get("XObject", {}))
+
+def splice_pages(old, new, replaced):
+    """
+    Returns a copy of old in which some pages come from new. replaced maps page
+    indices of old to page indices of new. Form XObjects used by the new pages
+    also replace the forms of the same name on the pages kept from old, and
+    links to a replaced page are redirected to its replacement.
+    """
+    out = PDFDocument(version=max(old.version, new.version))
+    pages_ref = out.add({"Type": PDFName("Pages"), "Kids": [], "Count": 0})
+    old_refs, new_refs = old.page_refs(), new.page_refs()
+    kids = [out.add(None) for ref in old_refs]
+
+    placed = sorted(replaced.items())
+    new_mapping = {}
+    _copy_pages(out, new, [new_refs[j] for i, j in placed], [kids[i] for i, j in placed],
+                new_mapping, pages_ref)
+    forms = {}
+    for i, j in placed:
+        forms.update((name, new_mapping[ref.num]) for name, ref in page_xobjects(new, new_refs[j]).items())
+
+    # Links to replaced pages land on their replacement, and forms drawn again
+    # by the new pages are shared with the old ones
+    old_mapping = {ref.num: kids[i] for i, ref in enumerate(old_refs)}
+    kept = [i for i in range(len(old_refs)) if i not in replaced]
+    for i in kept:
+        for name, ref in page_xobjects(old, old_refs[i]).items():
+            if name in forms:
+                old_mapping[ref.num] = forms[name]
+    _copy_pages(out, old, [old_refs[i] for i in kept], [kids[i] for i in kept],
+                old_mapping, pages_ref)
+
+    _finish_document(out, pages_ref, kids, old)
+    return out
+
+def _link_target(obj):
+    """Returns (dictionary, key) holding the destination of a link annotation or GoTo action, or None."""
+    if isinstance(obj, dict):
+        if "Dest" in obj:
+            return obj, "Dest"
+        if obj.get("S") == "GoTo":
+            return obj, "D"
+    return None
+
+def resolve_named_destinations(doc, destinations):
+    """
+    Rewrites links pointing at named destinations (directly or through a
+    GoTo action) into direct [page /Fit] destinations. `destinations` maps
+    names to page indices.
+    """
+    page_refs = doc.page_refs()
+    for ref in page_refs:
+        for annot in doc.get(doc.get(ref).get("Annots", [])):
+            annot = doc.get(annot)
+            target = _link_target(annot) or _link_target(doc.get(annot.get("A")))
+            if target is None:
+                continue
+            obj, key = target
+            if isinstance(obj[key], PDFString):
+                name = obj[key].decode("latin-1")
+                if name not in destinations:
+                    raise ValueError(f"undefined destination target for '{name}'")
+                obj[key] = [page_refs[destinations[name]], PDFName("Fit")]
+
+def add_named_destinations(doc, destinations):
+    """
+    Lists destinations by name in the catalog's /Dests dictionary, for links
+    from other documents and apps. `destinations` maps names to page indices.
+    """
+    page_refs = doc.page_refs()
+    doc.catalog["Dests"] = {name: [page_refs[i], PDFName("Fit")] for name, i in destinations.items()}
+
+# Never merged: pages keep their place in the tree, and an annotation belongs to one page
+_UNSHARED_TYPES = ("Catalog", "Pages", "Page", "Annot")
+
+def _shareable(obj):
+    d = obj.dict if isinstance(obj, PDFStream) else obj
+    return not (isinstance(d, dict) and d.get("Type") in _UNSHARED_TYPES)
+
+def deduplicate(doc):
+    """
+    Collapses objects that are exact duplicates (same content, referring to
+    the same objects) into one and points every reference at it. Merging
+    objects can make the objects referring to them equal, so this repeats
+    until nothing changes. Inline resource dictionaries used by several pages
+    are moved into one object first, so that the pages share it. Returns the
+    number of objects removed.
+    """
+    shared = {}
+    for ref in doc.page_refs():
+        page = doc.get(ref)
+        if isinstance(page.get("Resources"), dict):
+            shared.setdefault(serialize(page["Resources"]), []).append(page)
+    for pages in shared.values():
+        if len(pages) > 1:
+            resources = doc.add(pages[0]["Resources"])
+            for page in pages:
+                page["Resources"] = resources
+
+    candidates = [num for num, obj in sorted(doc.objects.items()) if _shareable(obj)]
+    mapping = {num: PDFRef(num, 0) for num in doc.objects}
+    removed = 0
+    while True:
+        first = {}
+        merged = 0
+        for num in candidates:
+            if mapping[num].num != num:
+                continue
+            key = hashlib.sha256(serialize(rewrite_refs(doc.objects[num], mapping))).digest()
+            kept = first.setdefault(key, num)
+            if kept != num:
+                mapping[num] = PDFRef(kept, 0)
+                merged += 1
+        if not merged:
+            break
+        removed += merged
+        # An object kept in an earlier round may have been merged in this one
+        for num, ref in mapping.items():
+            while mapping[ref.num].num != ref.num:
+                ref = mapping[ref.num]
+            mapping[num] = ref
+
+    for num in list(doc.objects):
+        if mapping[num].num != num:
+            del doc.objects[num]
+        else:
+            doc.objects[num] = rewrite_refs(doc.objects[num], mapping)
+    doc.trailer = rewrite_refs(doc.trailer, mapping)
+    return removed
+
+class PDFStreamWriter:
+    """
+    Writes a document to a file one batch of pages at a time, so that only the
+    batch being added is held in memory. The number of pages is fixed up front:
+    page objects get reserved numbers, which lets links to pages that are not
+    written yet be resolved immediately. Forms are shared between batches by
+    resource name, as draw_form gives each distinct form its own name.
+    With named_destinations, the destinations are also listed by name in the
+    catalog. With object_streams, a compact PDF 1.5 file is written: the objects
+    of each batch that are not streams go into object streams as they come.
+    """
+    def __init__(self, f, num_pages, destinations=None, version="1.4", named_destinations=False,
+                 object_streams=False):
+        self.f = f
+        self.destinations = destinations or {}
+        self.named_destinations = named_destinations
+        self.object_streams = object_streams
+        if object_streams:
+            version = _compact_version(version)
+        self.version = version
+        self.pages_ref = PDFRef(1, 0)
+        self.page_refs = [PDFRef(2 + i, 0) for i in range(num_pages)]
+        self.next_num = num_pages + 2
+        self.pages_written = 0
+        self.forms = {}
+        self.info = None
+        self.entries = {}
+        self.packed = []
+        self.pos = 0
+        self.body = hashlib.md5(usedforsecurity=False)
+        self._write(b"%PDF-" + version.encode("ascii") + b"\n%\x93\x8c\x8b\x9e\n")
+
+    def _write(self, data):
+        self.f.write(data)
+        self.pos += len(data)
+
+    def _write_object(self, num, obj):
+        data = serialize(obj)
+        self.body.update(data)
+        if self.object_streams and not isinstance(obj, PDFStream):
+            self.packed.append((num, data))
+            if len(self.packed) >= OBJECTS_PER_STREAM:
+                self._write_packed()
+            return
+        self.entries[num] = (1, self.pos, 0)
+        self._write(b"%d 0 obj\n" % num + data + b"\nendobj\n")
+
+    def _write_packed(self):
+        """Writes the objects waiting to be packed as one object stream."""
+        if not self.packed:
+            return
+        num = self.next_num
+        self.next_num += 1
+        for index, (packed_num, data) in enumerate(self.packed):
+            self.entries[packed_num] = (2, num, index)
+        self.entries[num] = (1, self.pos, 0)
+        self._write(b"%d 0 obj\n" % num + serialize(_object_stream(self.packed)) + b"\nendobj\n")
+        self.packed = []
+
+    def _resolve_dest(self, obj):
+        """Turns a link or GoTo action to a named destination into a [page /Fit] destination."""
+        target = _link_target(obj)
+        if target is not None and isinstance(obj[target[1]], PDFString):
+            key = target[1]
+            name = obj[key].decode("latin-1")
+            if name not in self.destinations:
+                raise ValueError(f"undefined destination target for '{name}'")
+            obj = dict(obj, **{key: [self.page_refs[self.destinations[name]], PDFName("Fit")]})
+        return obj
+
+    def add_pages(self, doc):
+        """Appends all pages of doc (in order) and writes everything they use."""
+        page_refs = doc.page_refs()
+        if self.pages_written + len(page_refs) > len(self.page_refs):
+            raise ValueError("more pages than the writer was created for")
+        if self.info is None:
+            self.info = doc.get(doc.trailer.get("Info"))
+
+        mapping = {}
+        pages = []
+        for ref in page_refs:
+            mapping[ref.num] = self.page_refs[self.pages_written]
+            self.pages_written += 1
+            pages.append({k: v for k, v in doc.get(ref).items() if k != "Parent"})
+            for name, form in page_xobjects(doc, ref).items():
+                if name in self.forms:
+                    mapping[form.num] = self.forms[name]
+
+        nums = doc.reachable(pages, skip_parents=True, exclude=mapping)
+        for num in nums:
+            mapping[num] = PDFRef(self.next_num, 0)
+            self.next_num += 1
+        for num in nums:
+            obj = self._resolve_dest(rewrite_refs(doc.objects[num], mapping))
+            self._write_object(mapping[num].num, obj)
+        for ref, page in zip(page_refs, pages):
+            page = rewrite_refs(page, mapping)
+            page["Parent"] = self.pages_ref
+            self._write_object(mapping[ref.num].num, page)
+            for name, form in page_xobjects(doc, ref).items():
+                self.forms.setdefault(name, mapping[form.num])
+
+    def close(self):
+        """Writes the page tree, catalog, cross-reference table and trailer."""
+        if self.pages_written != len(self.page_refs):
+            raise ValueError(f"{self.pages_written} of {len(self.page_refs)} pages were written")
+        self._write_object(self.pages_ref.num, {
+            "Type": PDFName("Pages"), "Kids": self.page_refs, "Count": len(self.page_refs)})
+        catalog = PDFRef(self.next_num, 0)
+        self.next_num += 1
+        catalog_dict = {"Type": PDFName("Catalog"), "Pages": self.pages_ref, "PageMode": PDFName("UseNone")}
+        if self.named_destinations:
+            catalog_dict["Dests"] = {name: [self.page_refs[i], PDFName("Fit")]
+                                     for name, i in self.destinations.items()}
+        self._write_object(catalog.num, catalog_dict)
+        trailer = {"Root": catalog}
+        if self.info is not None:
+            trailer["Info"] = PDFRef(self.next_num, 0)
+            self.next_num += 1
+            self._write_object(trailer["Info"].num, dict(self.info))
+        self._write_packed()
+        digest = PDFString(self.body.digest())
+        trailer["ID"] = [digest, digest]
+
+        xref = self.pos
+        if self.object_streams:
+            self.entries[self.next_num] = (1, xref, 0)
+            entries = [(0, 0, 65535)] + [self.entries[num] for num in range(1, self.next_num + 1)]
+            out = b"%d 0 obj\n" % self.next_num + serialize(_xref_stream(entries, trailer)) + b"\nendobj\n"
+        else:
+            size = max(self.entries) + 1
+            trailer["Size"] = size
+            out = bytearray(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+            for num in range(1, size):
+                out += b"%010d 00000 n \n" % self.entries[num][1]
+            out += b"trailer\n" + serialize(trailer) + b"\n"
+        self._write(bytes(out) + b"startxref\n%d\n%%%%EOF\n" % xref)
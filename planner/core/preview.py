@@ -0,0 +1,369 @@
+"""
+PNG previews of single pages.
+
+`generate.py preview <template> --page <destination>` draws one page of a
+template instead of the whole document: the page's draw function is
+recorded into a display list (see displaylist.py) and the display list is
+replayed on RasterBackend, which draws it with Pillow at the resolution of
+the device (2388 x 1668 for the iPad Pro 11"). Shapes are drawn at twice
+that size and scaled down, for smooth edges.
+
+Text is drawn with a TrueType font close to Helvetica (Liberation Sans or
+Arial if installed, else the Vera fonts that ship with reportlab) and placed
+with Helvetica's metrics, so alignment matches the PDF even where glyph
+shapes differ. Links are not drawn.
+
+Previews are cached by page fingerprint (see page_fingerprint), so asking
+again for a page whose drawer, arguments and constants did not change only
+copies a PNG.
+"""
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from reportlab.pdfbase import pdfmetrics
+from functools import lru_cache
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+
+from .displaylist import PageCache, page_fingerprint, record_page, replay
+
+# iPad Pro 11" screen in landscape
+PREVIEW_SIZE = (2388, 1668)
+
+# Shapes are drawn this many times larger and scaled down (antialiasing)
+SUPERSAMPLE = 2
+
+# Bumped when the rasterizer draws differently, to invalidate cached previews
+RASTER_FORMAT = 1
+
+# TrueType fonts tried for each PDF font, in order
+_FONT_FILES = {
+    "Helvetica": ("LiberationSans-Regular.ttf", "Arial.ttf", "Vera.ttf"),
+    "Helvetica-Bold": ("LiberationSans-Bold.ttf", "Arial Bold.ttf", "VeraBd.ttf"),
+}
+
+# Segments per quarter circle of rounded corners and circles
+_ARC_SEGMENTS = 8
+
+# Segments per Bezier curve of icon paths
+_CURVE_SEGMENTS = 8
+
+# --- Pages ---
+
+def find_page(pages, page):
+    """
+    Returns the (destination, draw_func, args) entry of a page plan for a
+    destination name, or a page number counted from 1. Raises ValueError if
+    there is no such page.
+    """
+    for entry in pages:
+        if entry[0] == page:
+            return entry
+    if page.isdigit() and 1 <= int(page) <= len(pages):
+        return pages[int(page) - 1]
+    names = [dest for dest, draw_func, args in pages if dest]
+    hint = f" (destinations: {', '.join(names[:8])}{', ...' if len(names) > 8 else ''})" if names else ""
+    raise ValueError(f"no page '{page}': give a destination or a page number from 1 to {len(pages)}{hint}")
+
+# --- Raster backend ---
+
+def _concat(m, ctm):
+    """The matrix applying m, then ctm (both (a, b, c, d, e, f) as in PDF)."""
+    a, b, c, d, e, f = ctm
+    return (m[0] * a + m[1] * c, m[0] * b + m[1] * d,
+            m[2] * a + m[3] * c, m[2] * b + m[3] * d,
+            m[4] * a + m[5] * c + e, m[4] * b + m[5] * d + f)
+
+def _apply(ctm, points):
+    a, b, c, d, e, f = ctm
+    return [(a * x + c * y + e, b * x + d * y + f) for x, y in points]
+
+def _arc(cx, cy, r, start, stop):
+    """Points of an arc from start to stop degrees."""
+    steps = max(1, round(abs(stop - start) / 90 * _ARC_SEGMENTS))
+    return [(cx + r * math.cos(math.radians(start + (stop - start) * i / steps)),
+             cy + r * math.sin(math.radians(start + (stop - start) * i / steps))) for i in range(steps + 1)]
+
+def _round_rect_points(x, y, w, h, r):
+    x0, x1, y0, y1 = min(x, x + w), max(x, x + w), min(y, y + h), max(y, y + h)
+    r = min(r, (x1 - x0) / 2, (y1 - y0) / 2)
+    return (_arc(x1 - r, y0 + r, r, -90, 0) + _arc(x1 - r, y1 - r, r, 0, 90) +
+            _arc(x0 + r, y1 - r, r, 90, 180) + _arc(x0 + r, y0 + r, r, 180, 270))
+
+def _bezier(p0, p1, p2, p3):
+    points = []
+    for i in range(1, _CURVE_SEGMENTS + 1):
+        t = i / _CURVE_SEGMENTS
+        u = 1 - t
+        points.append((u**3 * p0[0] + 3 * u**2 * t * p1[0] + 3 * u * t**2 * p2[0] + t**3 * p3[0],
+                       u**3 * p0[1] + 3 * u**2 * t * p1[1] + 3 * u * t**2 * p2[1] + t**3 * p3[1]))
+    return points
+
+def _subpaths(path):
+    """Flattens a reportlab Path into lists of points, one per subpath."""
+    subpaths, current = [], []
+    points = iter(path.points)
+    for operator in path.operators:
+        if operator == 0:  # moveTo
+            if len(current) > 2:
+                subpaths.append(current)
+            current = [(next(points), next(points))]
+        elif operator == 1:  # lineTo
+            current.append((next(points), next(points)))
+        elif operator == 2:  # curveTo
+            controls = [(next(points), next(points)) for _ in range(3)]
+            current += _bezier(current[-1], *controls)
+        elif operator == 3 and len(current) > 2:  # closePath
+            subpaths.append(current)
+            current = []
+    if len(current) > 2:
+        subpaths.append(current)
+    return subpaths
+
+def _icon_shapes(shape, ctm):
+    """Yields (path, matrix) for the paths of an icon drawing."""
+    ctm = _concat(shape.transform, ctm) if getattr(shape, "transform", None) else ctm
+    if hasattr(shape, "contents"):
+        for child in shape.contents:
+            yield from _icon_shapes(child, ctm)
+    elif hasattr(shape, "operators") and not shape.isClipPath:
+        yield shape, ctm
+
+@lru_cache(maxsize=64)
+def _font(name, size):
+    for filename in _FONT_FILES.get(name, _FONT_FILES["Helvetica-Bold" if "Bold" in name else "Helvetica"]):
+        if filename.startswith("Vera"):
+            import reportlab
+            filename = os.path.join(os.path.dirname(reportlab.__file__), "fonts", filename)
+        try:
+            return ImageFont.truetype(filename, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def font_files():
+    """The TrueType files used for the PDF fonts on this machine."""
+    return {name: getattr(_font(name, 10), "path", "default") for name in _FONT_FILES}
+
+def _rgba(color, alpha):
+    r, g, b = (round(v * 255) for v in color[:3])
+    return (r, g, b, round(alpha * 255))
+
+class RasterBackend:
+    """Replays display lists on a Pillow image; image() returns the page at `size` pixels."""
+    def __init__(self, pagesize, size=PREVIEW_SIZE, supersample=SUPERSAMPLE):
+        W, H = pagesize
+        self.size = tuple(size)
+        self.supersample = supersample
+        sx, sy = size[0] * supersample / W, size[1] * supersample / H
+        self._image = Image.new("RGB", (size[0] * supersample, size[1] * supersample), "white")
+        self._opaque = ImageDraw.Draw(self._image)
+        self._blended = ImageDraw.Draw(self._image, "RGBA")
+        # Page space (origin at the bottom left, in points) to pixels
+        self.ctm = (sx, 0, 0, -sy, 0, H * sy)
+        self.fill = (0, 0, 0, 255)
+        self.stroke = (0, 0, 0, 255)
+        self.width = 1
+        self.font_name, self.font_size = "Helvetica", 12
+        self._stack = []
+
+    def image(self):
+        if self.supersample == 1:
+            return self._image.copy()
+        return self._image.reduce(self.supersample)
+
+    def _pen(self, color):
+        """The ImageDraw and color to paint with: opaque colors are drawn without blending, which is faster."""
+        return (self._opaque, color[:3]) if color[3] == 255 else (self._blended, color)
+
+    def _scale(self):
+        a, b, c, d = self.ctm[:4]
+        return math.sqrt(abs(a * d - b * c))
+
+    def _axis_aligned(self):
+        return abs(self.ctm[1]) < 1e-9 and abs(self.ctm[2]) < 1e-9
+
+    def _box(self, x, y, w, h):
+        (x0, y0), (x1, y1) = _apply(self.ctm, [(x, y), (x + w, y + h)])
+        return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+    def _outline(self, points):
+        width = max(1, round(self.width * self._scale()))
+        draw, color = self._pen(self.stroke)
+        draw.line(_apply(self.ctm, points + points[:1]), fill=color, width=width, joint="curve")
+
+    # State
+    def save(self):
+        self._stack.append((self.ctm, self.fill, self.stroke, self.width, self.font_name, self.font_size))
+
+    def restore(self):
+        self.ctm, self.fill, self.stroke, self.width, self.font_name, self.font_size = self._stack.pop()
+
+    def fill_color(self, color):
+        self.fill = _rgba(color, color[3])
+
+    def stroke_color(self, color):
+        self.stroke = _rgba(color, color[3])
+
+    def fill_alpha(self, a):
+        self.fill = self.fill[:3] + (round(a * 255),)
+
+    def stroke_alpha(self, a):
+        self.stroke = self.stroke[:3] + (round(a * 255),)
+
+    def line_width(self, width):
+        self.width = width
+
+    def font(self, name, size, leading):
+        self.font_name, self.font_size = name, size
+
+    def translate(self, dx, dy):
+        self.ctm = _concat((1, 0, 0, 1, dx, dy), self.ctm)
+
+    def rotate(self, theta):
+        cos, sin = math.cos(math.radians(theta)), math.sin(math.radians(theta))
+        self.ctm = _concat((cos, sin, -sin, cos, 0, 0), self.ctm)
+
+    # Shapes
+    def rect(self, x, y, w, h, stroke, fill):
+        points = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+        if fill:
+            draw, color = self._pen(self.fill)
+            if self._axis_aligned():
+                draw.rectangle(self._box(x, y, w, h), fill=color)
+            else:
+                draw.polygon(_apply(self.ctm, points), fill=color)
+        if stroke:
+            self._outline(points)
+
+    def round_rect(self, x, y, w, h, radius, stroke, fill):
+        points = _round_rect_points(x, y, w, h, radius)
+        if fill:
+            draw, color = self._pen(self.fill)
+            if self._axis_aligned():
+                box = self._box(x, y, w, h)
+                r = min(radius * self._scale(), (box[2] - box[0]) / 2, (box[3] - box[1]) / 2)
+                draw.rounded_rectangle(box, r, fill=color)
+            else:
+                draw.polygon(_apply(self.ctm, points), fill=color)
+        if stroke:
+            self._outline(points)
+
+    def circle(self, x, y, r, stroke, fill):
+        if fill:
+            draw, color = self._pen(self.fill)
+            if self._axis_aligned():
+                draw.ellipse(self._box(x - r, y - r, 2 * r, 2 * r), fill=color)
+            else:
+                draw.polygon(_apply(self.ctm, _arc(x, y, r, 0, 360)), fill=color)
+        if stroke:
+            self._outline(_arc(x, y, r, 0, 360))
+
+    def line(self, x1, y1, x2, y2):
+        width = max(1, round(self.width * self._scale()))
+        draw, color = self._pen(self.stroke)
+        draw.line(_apply(self.ctm, [(x1, y1), (x2, y2)]), fill=color, width=width)
+
+    def lines(self, linelist):
+        for x1, y1, x2, y2 in linelist:
+            self.line(x1, y1, x2, y2)
+
+    # Text, icons, links and forms
+    def text(self, x, y, text, align):
+        # Each glyph is drawn at its Helvetica position, so text is as wide as in the PDF
+        widths = [pdfmetrics.stringWidth(char, self.font_name, self.font_size) for char in text]
+        if align != "left":
+            x -= sum(widths) if align == "right" else sum(widths) / 2
+        scale = self._scale()
+        font = _font(self.font_name, max(1, round(self.font_size * scale)))
+        offsets = [sum(widths[:i]) * scale for i in range(len(text))]
+        (px, py), = _apply(self.ctm, [(x, y)])
+        a, b = self.ctm[:2]
+        angle = round(math.degrees(math.atan2(-b, a)), 6)
+        if abs(angle) < 0.01:
+            draw, color = self._pen(self.fill)
+            for char, offset in zip(text, offsets):
+                draw.text((px + offset, py), char, fill=color, font=font, anchor="ls")
+            return
+        # Rotated text: drawn into a mask centered on its origin, rotated (a quarter turn is a
+        # plain transpose) and painted through it
+        r = math.ceil(sum(widths) * scale + font.size)
+        mask = Image.new("L", (2 * r, 2 * r))
+        draw = ImageDraw.Draw(mask)
+        for char, offset in zip(text, offsets):
+            draw.text((r + offset, r), char, fill=self.fill[3], font=font, anchor="ls")
+        mask = mask.rotate(angle, Image.Resampling.BICUBIC)
+        self._image.paste(self.fill[:3], (round(px) - r, round(py) - r), mask)
+
+    def icon(self, key, x, y, size, color):
+        from .utils import load_icon
+        drawing = load_icon(key)
+        if drawing is None:
+            return
+        scale = size / drawing.width
+        ctm = _concat((scale, 0, 0, scale, x, y), self.ctm)
+        for path, matrix in _icon_shapes(drawing, ctm):
+            if color is None and path.fillColor is None:
+                continue
+            fill = _rgba(color, color[3]) if color else _rgba(path.fillColor.rgb(), path.fillColor.alpha)
+            # Subpaths are combined even-odd, which gives the holes of the icon glyphs
+            polygons = [_apply(matrix, points) for points in _subpaths(path)]
+            if not polygons:
+                continue
+            xs = [px for polygon in polygons for px, py in polygon]
+            ys = [py for polygon in polygons for px, py in polygon]
+            left, top = math.floor(min(xs)), math.floor(min(ys))
+            box = (math.ceil(max(xs)) - left + 1, math.ceil(max(ys)) - top + 1)
+            mask = Image.new("1", box)
+            for polygon in polygons:
+                layer = Image.new("1", box)
+                ImageDraw.Draw(layer).polygon([(px - left, py - top) for px, py in polygon], fill=1)
+                mask = ImageChops.logical_xor(mask, layer)
+            alpha = mask.convert("L").point(lambda v: v * fill[3] // 255)
+            self._image.paste(fill[:3], (left, top), alpha)
+
+    def link(self, destination, x1, y1, x2, y2):
+        pass
+
+    def form(self, name, ops, forms):
+        self.save()
+        replay({"ops": ops, "forms": forms}, self)
+        self.restore()
+
+def rasterize(display_list, size=PREVIEW_SIZE):
+    """Returns a display list drawn as an RGB Pillow image of `size` pixels."""
+    backend = RasterBackend(display_list["pagesize"], size)
+    replay(display_list, backend)
+    return backend.image()
+
+# --- Cache ---
+
+def preview_key(draw_func, args, pagesize, size=PREVIEW_SIZE):
+    """Hash of a preview's inputs: the page fingerprint, the size and the rasterizer with its fonts."""
+    h = hashlib.sha256(page_fingerprint(draw_func, args, pagesize).encode())
+    h.update(repr((tuple(size), SUPERSAMPLE, RASTER_FORMAT, sorted(font_files().items()))).encode())
+    return h.hexdigest()
+
+def render_preview(draw_func, args, pagesize, out_path, size=PREVIEW_SIZE, cache_dir=None):
+    """
+    Writes a PNG of the page draw_func(c, *args) to out_path. With cache_dir,
+    previews and display lists are kept there by page inputs and a cached
+    preview is copied. Returns whether the preview came from the cache.
+    """
+    if cache_dir is None:
+        rasterize(record_page(draw_func, args, pagesize), size).save(out_path)
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, preview_key(draw_func, args, pagesize, size) + ".png")
+    if os.path.exists(path):
+        shutil.copyfile(path, out_path)
+        return True
+    image = rasterize(PageCache(cache_dir).display_list(draw_func, args, pagesize), size)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        image.save(f, "PNG")
+    os.replace(tmp, path)
+    shutil.copyfile(path, out_path)
+    return False
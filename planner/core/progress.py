@@ -0,0 +1,52 @@
+"""
+Page-level progress and cancellation of a generation.
+
+Generators accept progress=Progress(callback). They call start with the
+number of pages of the document, and draw_pages reports every page drawn
+with advance. Between pages it calls check, which raises
+GenerationCancelled once cancel was called (from any thread), so a
+generation stops at the next page boundary.
+"""
+from collections import namedtuple
+import threading
+
+# Pages done out of total, and the destination of the last page drawn (None
+# for pages without one, or when several pages were done at once)
+ProgressEvent = namedtuple("ProgressEvent", "done total destination")
+
+class GenerationCancelled(Exception):
+    """Raised between pages of a cancelled generation."""
+
+class Progress:
+    """Counts the pages of a generation and reports them to callback(ProgressEvent)."""
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.total = 0
+        self.done = 0
+        self._cancelled = threading.Event()
+
+    def start(self, total):
+        """Called by the generator with the number of pages it will produce."""
+        self.total = total
+        self.done = 0
+        self._report(None)
+
+    def advance(self, pages=1, destination=None):
+        self.done += pages
+        self._report(destination)
+
+    def _report(self, destination):
+        if self.callback is not None:
+            self.callback(ProgressEvent(self.done, self.total, destination))
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raises GenerationCancelled if the generation was cancelled."""
+        if self._cancelled.is_set():
+            raise GenerationCancelled(f"cancelled after {self.done} of {self.total} pages")
@@ -0,0 +1,154 @@
+from reportlab.pdfbase import pdfdoc
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import io
+
+from .. import TEMPLATES
+from .constants import IPAD_PRO_11_LANDSCAPE
+from .pdffile import (read_pdf, merge_documents, resolve_named_destinations, add_named_destinations, deduplicate,
+                      PDFStreamWriter)
+from .tracing import attach, get_tracer
+from .statecanvas import StateCanvas
+
+# Function returning the page plan of each template, called as f(year, W, H) or f(W, H)
+PAGE_PLANS = {
+    "planner": "year_page_plan",
+    "meeting_notes": "meeting_notes_page_plan",
+    "bi_requirements": "bi_requirements_page_plan",
+}
+
+def draw_pages(c, pages, progress=None):
+    """
+    Draws a page plan: a list of (destination, draw_func, args) entries, one per page.
+    Each page is bookmarked under its destination (if any) and drawn with draw_func(c, *args).
+    An optional Progress is told of every page, and stops the drawing between
+    pages when it is cancelled.
+    """
+    tracer = get_tracer(c)
+    for destination, draw_func, args in pages:
+        if progress is not None:
+            progress.check()
+        if destination:
+            c.bookmarkPage(destination)
+        if tracer is None:
+            draw_func(c, *args)
+        else:
+            with tracer.span(c, destination or draw_func.__name__, "page"):
+                draw_func(c, *args)
+        c.showPage()
+        if progress is not None:
+            progress.advance(1, destination)
+
+def template_pages(template, year=None):
+    """Returns the page plan of a template, (destination, draw_func, args) per page, and its page size."""
+    if template not in TEMPLATES:
+        raise ValueError(f"unknown template '{template}'")
+    module, function, yearly = TEMPLATES[template]
+    plan = getattr(importlib.import_module(module, "planner"), PAGE_PLANS[template])
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return (plan(year, W, H) if yearly else plan(W, H)), (W, H)
+
+class _NamedDestination(pdfdoc.PDFObject):
+    """Writes a destination that is not in this document as a named destination."""
+    def __init__(self, name):
+        self.name = name
+
+    def format(self, document):
+        return pdfdoc.format(pdfdoc.PDFString(self.name), document)
+
+def export_destinations(c):
+    """
+    Lists every destination bookmarked on a canvas by name in the catalog's
+    /Dests dictionary, for links from other documents and apps. Links within
+    the document point at pages directly and do not need it.
+    """
+    c._doc.Catalog.Dests = pdfdoc.PDFDictionary({name: dest for name, dest in c._destinations.items()
+                                                 if dest.page is not None})
+
+def render_pages(pages, pagesize, tracer=None, forms=None, named_destinations=False, progress=None,
+                 **canvas_kwargs):
+    """
+    Renders part of a page plan to PDF bytes. Links to destinations drawn by
+    other parts of the plan are kept as named destinations, to be resolved
+    by merge_rendered once all parts are put together.
+    If a forms dict is given, every Form XObject defined with draw_form is
+    recorded in it as name: (draw_func, args). With named_destinations, the
+    destinations drawn by these pages are listed by name (see export_destinations).
+    progress is passed to draw_pages.
+    """
+    buf = io.BytesIO()
+    c = StateCanvas(buf, pagesize=pagesize, **canvas_kwargs)
+    attach(c, tracer)
+    c._form_log = forms
+    draw_pages(c, pages, progress)
+    if named_destinations:
+        export_destinations(c)
+    for name, dest in c._destinations.items():
+        if dest.page is None:
+            dest.fmt = _NamedDestination(name)
+            dest.page = name
+    c.save()
+    return buf.getvalue()
+
+def merge_rendered(parts, destinations, named_destinations=False):
+    """
+    Merges PDF bytes produced by render_pages into one document.
+    `destinations` maps every destination name to its page index in the result;
+    with named_destinations they are also listed by name (see export_destinations).
+    """
+    doc = merge_documents([read_pdf(data) for data in parts])
+    resolve_named_destinations(doc, destinations)
+    if named_destinations:
+        add_named_destinations(doc, destinations)
+    return doc
+
+def write_streaming(parts, out_path, num_pages, destinations, named_destinations=False, compact=False):
+    """
+    Writes PDF bytes produced by render_pages to out_path one part at a time.
+    parts may be a generator, so that only one rendered part is in memory at
+    once. `destinations` maps every destination name to its page index.
+    """
+    with open(out_path, "wb") as f:
+        writer = PDFStreamWriter(f, num_pages, destinations, named_destinations=named_destinations,
+                                 object_streams=compact)
+        for data in parts:
+            writer.add_pages(read_pdf(data))
+        writer.close()
+
+def compact_pdf(path):
+    """
+    Rewrites a PDF file as a compact PDF 1.5 file, with duplicate objects
+    merged (see deduplicate) and the rest packed into object streams and a
+    cross-reference stream. Returns (old size, new size).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    doc = read_pdf(data)
+    deduplicate(doc)
+    compact = doc.tobytes(object_streams=True)
+    with open(path, "wb") as f:
+        f.write(compact)
+    return len(data), len(compact)
+
+def plan_destinations(pages):
+    """Maps each destination of a page plan to its page index."""
+    return {dest: i for i, (dest, draw_func, args) in enumerate(pages) if dest}
+
+def render_parallel(render_func, chunks, jobs, on_result=None):
+    """
+    Calls render_func(*chunk) for every chunk in a pool of `jobs` worker
+    processes and returns the results in order. on_result(i, result) is
+    called as each result comes in; if it raises, the chunks not started yet
+    are dropped.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = []
+        try:
+            for result in pool.map(render_func, *zip(*chunks)):
+                if on_result is not None:
+                    on_result(len(results), result)
+                results.append(result)
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        return results
@@ -0,0 +1,290 @@
+"""
+Local render daemon.
+
+`generate.py serve` keeps a pool of worker processes that have imported the
+templates and loaded the icons and fonts (see batch.warm_up), so a request
+only pays for rendering. Documents are requested over HTTP, on localhost or
+on a Unix socket:
+
+    GET /<template>?year=2027&compact=1   the PDF (application/pdf)
+    GET /metrics                          counters and queue depth (JSON)
+
+The year (of yearly templates) and the generator's flags, such as compact or
+named_destinations, are given in the query string. At most `workers` documents are rendered at once and at most
+`max_queue` more wait for a worker; further requests are answered with 503.
+A request still waiting for its document after `timeout` seconds is answered
+with 504 (the worker finishes the document and discards it). The PDF is
+rendered to a temporary file and streamed back from it.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qsl
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import MAXYEAR, MINYEAR, datetime
+
+from .. import TEMPLATES, get_generator
+from .cache import DEFAULT_MAX_BYTES
+
+# Query values accepted as true and false for flag parameters
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off", "")
+
+# Generator flags that make no sense for a temporary output file
+_UNSERVED = ("incremental",)
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+def _init_worker(cache_dir, cache_max_bytes):
+    from .batch import warm_up
+    from .cache import OutputCache
+
+    _worker["generators"] = warm_up()
+    _worker["cache"] = OutputCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+def _ping():
+    return os.getpid()
+
+def _discard(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _render(template, args, kwargs):
+    """Runs a generator in a worker; returns (seconds, whether it came from the cache)."""
+    cache = _worker["cache"]
+    hits = cache.hits if cache else 0
+    start = time.perf_counter()
+    _worker["generators"][template](*args, cache=cache, **kwargs)
+    return time.perf_counter() - start, bool(cache) and cache.hits > hits
+
+class ServerBusy(Exception):
+    """Raised when the render queue is full."""
+
+def parse_params(template, query, compact=False):
+    """
+    Converts the query parameters of a request into the keyword arguments of
+    the template's generator: year (for yearly templates) and its flags, e.g.
+    compact or named_destinations. Raises ValueError for unknown templates and
+    parameters or malformed values.
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f"unknown template '{template}'")
+    parameters = inspect.signature(get_generator(template)).parameters
+    kwargs = {name: p.default for name, p in parameters.items()
+              if isinstance(p.default, bool) and name not in _UNSERVED}
+    if "compact" in kwargs:
+        kwargs["compact"] = compact
+    if TEMPLATES[template][2]:
+        kwargs["year"] = datetime.now().year + 1
+    for name, value in query:
+        if name not in kwargs:
+            raise ValueError(f"unknown parameter '{name}' for {template}")
+        if name == "year":
+            if not value.isdigit():
+                raise ValueError(f"year must be a number, not '{value}'")
+            if not MINYEAR <= int(value) <= MAXYEAR:
+                raise ValueError(f"year must be between {MINYEAR} and {MAXYEAR}, not {value}")
+            kwargs[name] = int(value)
+        elif value.lower() in _TRUE:
+            kwargs[name] = True
+        elif value.lower() in _FALSE:
+            kwargs[name] = False
+        else:
+            raise ValueError(f"{name} must be 1 or 0, not '{value}'")
+    return kwargs
+
+class RenderServer:
+    """A pool of warm worker processes with a bounded queue, shared by the request threads."""
+    def __init__(self, workers=1, max_queue=16, timeout=120, cache_dir=None, cache_max_bytes=None, compact=False):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.compact = compact
+        self._initargs = (cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES)
+        self._lock = threading.Lock()
+        self._tmp = tempfile.mkdtemp(prefix="planner-serve-")
+        self._started = time.time()
+        self._pool = None
+        self.stats = {"requests": 0, "completed": 0, "cached": 0, "failed": 0, "rejected": 0,
+                      "timeouts": 0, "in_flight": 0, "render_seconds": 0.0}
+
+    def start(self):
+        """Starts the workers and waits until every one of them has warmed up."""
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=self._initargs)
+        pids = [self._pool.submit(_ping) for _ in range(self.workers)]
+        return len({future.result() for future in pids})
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def metrics(self):
+        """Returns the request counters, with the number of requests waiting for a worker as queued."""
+        with self._lock:
+            metrics = dict(self.stats)
+        metrics.update(queued=max(0, metrics["in_flight"] - self.workers), workers=self.workers,
+                       max_queue=self.max_queue, uptime_seconds=round(time.time() - self._started, 1))
+        metrics["render_seconds"] = round(metrics["render_seconds"], 3)
+        return metrics
+
+    def _finished(self, future, path, abandoned):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.stats["failed"] += 1
+            else:
+                seconds, cached = future.result()
+                self.stats["completed"] += 1
+                self.stats["cached"] += cached
+                self.stats["render_seconds"] += seconds
+        if abandoned.is_set():
+            _discard(path)
+
+    def render(self, template, kwargs):
+        """
+        Renders a document in a worker and returns the path of the temporary
+        file holding it, which the caller deletes. Raises ServerBusy when the
+        queue is full, TimeoutError after self.timeout seconds, and whatever
+        the generator raised.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.stats["in_flight"] >= self.workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise ServerBusy(f"{self.stats['in_flight']} documents in progress")
+            self.stats["in_flight"] += 1
+            pool = self._pool
+
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self._tmp)
+        os.close(fd)
+        kwargs = dict(kwargs)
+        args = (kwargs.pop("year"), path) if TEMPLATES[template][2] else (path,)
+        abandoned = threading.Event()
+        try:
+            future = pool.submit(_render, template, args, kwargs)
+        except BrokenProcessPool:
+            with self._lock:
+                self.stats["in_flight"] -= 1
+                self.stats["failed"] += 1
+            _discard(path)
+            self._restart(pool)
+            raise
+        future.add_done_callback(lambda f: self._finished(f, path, abandoned))
+        try:
+            future.result(timeout=self.timeout)
+        except TimeoutError:
+            abandoned.set()
+            with self._lock:
+                self.stats["timeouts"] += 1
+            # Deleted by _finished, unless the document was finished meanwhile
+            if future.done():
+                _discard(path)
+            raise
+        except BrokenProcessPool:
+            _discard(path)
+            self._restart(pool)
+            raise
+        except BaseException:
+            _discard(path)
+            raise
+        return path
+
+    def _restart(self, broken):
+        """Replaces a pool whose worker died (e.g. killed or out of memory)."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=self._initargs)
+        broken.shutdown(wait=False)
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "planner-serve"
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, indent=2).encode() + b"\n"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        renderer = self.server.renderer
+        url = urlsplit(self.path)
+        name = url.path.strip("/")
+        if name == "metrics":
+            return self._send_json(200, renderer.metrics())
+        try:
+            kwargs = parse_params(name, parse_qsl(url.query, keep_blank_values=True), renderer.compact)
+        except ValueError as e:
+            return self._send_json(404 if name not in TEMPLATES else 400, {"error": str(e)})
+        try:
+            path = renderer.render(name, kwargs)
+        except ServerBusy:
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        except TimeoutError:
+            return self._send_json(504, {"error": f"not rendered within {renderer.timeout}s"})
+        except Exception as e:
+            return self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+        filename = f"{name}_{kwargs['year']}.pdf" if "year" in kwargs else f"{name}.pdf"
+        try:
+            with open(path, "rb") as f:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+                self.send_header("Content-Disposition", f'inline; filename="{filename}"')
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile, 64 * 1024)
+        finally:
+            _discard(path)
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def serve(renderer, host="127.0.0.1", port=8765, socket_path=None, on_ready=None):
+    """
+    Serves requests with renderer (a started RenderServer) until interrupted,
+    on host:port or, if socket_path is given, on that Unix socket.
+    on_ready(address) is called once the server is listening.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        httpd = _UnixHTTPServer(socket_path, _Handler)
+        address = socket_path
+    else:
+        httpd = ThreadingHTTPServer((host, port), _Handler)
+        address = f"http://{host}:{httpd.server_address[1]}"
+    httpd.renderer = renderer
+    try:
+        if on_ready:
+            on_ready(address)
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
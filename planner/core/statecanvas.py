@@ -0,0 +1,85 @@
+"""
+Canvas that drops redundant graphics state operators.
+
+The drawers set the fill and stroke colors, line width and font before each
+shape without checking whether they are already set, which repeats the same
+operators in the content stream for every cell of a grid. StateCanvas
+remembers the values it last emitted and skips setters that would not change
+them (reportlab itself already skips repeated alpha values). The remembered
+values are saved and restored with saveState and restoreState like the rest
+of reportlab's state, and forgotten at the start of every page and form,
+since a form inherits the state of the page that draws it. The number of
+skipped operators is kept in `elided`.
+"""
+from reportlab.pdfgen import canvas
+from reportlab.lib.colors import Color
+
+def _color_key(color):
+    """Returns a key equal for colors emitted with the same operator, or None if unsure."""
+    if type(color) is Color:
+        return (color.red, color.green, color.blue)
+    if isinstance(color, (tuple, list)):
+        return tuple(color)
+    return None
+
+class StateCanvas(canvas.Canvas):
+    """A reportlab Canvas eliding fill, stroke, line width and font changes that change nothing."""
+    STATE_ATTRIBUTES = canvas.Canvas.STATE_ATTRIBUTES + ["_emittedFill", "_emittedStroke", "_emittedWidth", "_emittedFont"]
+
+    elided = 0
+
+    def init_graphics_state(self):
+        super().init_graphics_state()
+        self._emittedFill = self._emittedStroke = self._emittedWidth = self._emittedFont = None
+
+    def beginForm(self, *args, **kwargs):
+        super().beginForm(*args, **kwargs)
+        # Not reset by reportlab when the page code is pushed aside
+        self._emittedFill = self._emittedStroke = self._emittedWidth = self._emittedFont = None
+
+    def setFillColor(self, aColor, alpha=None):
+        key = None if self._enforceColorSpace else _color_key(aColor)
+        if key is not None and key == self._emittedFill:
+            self.elided += 1
+            if alpha is None:
+                alpha = getattr(aColor, "alpha", None)
+            if alpha is not None:
+                self.setFillAlpha(alpha)
+            return
+        super().setFillColor(aColor, alpha)
+        self._emittedFill = key
+
+    def setStrokeColor(self, aColor, alpha=None):
+        key = None if self._enforceColorSpace else _color_key(aColor)
+        if key is not None and key == self._emittedStroke:
+            self.elided += 1
+            if alpha is None:
+                alpha = getattr(aColor, "alpha", None)
+            if alpha is not None:
+                self.setStrokeAlpha(alpha)
+            return
+        super().setStrokeColor(aColor, alpha)
+        self._emittedStroke = key
+
+    def setFillGray(self, gray, alpha=None):
+        super().setFillGray(gray, alpha)
+        self._emittedFill = None
+
+    def setStrokeGray(self, gray, alpha=None):
+        super().setStrokeGray(gray, alpha)
+        self._emittedStroke = None
+
+    def setLineWidth(self, width):
+        if width == self._emittedWidth:
+            self.elided += 1
+            return
+        super().setLineWidth(width)
+        self._emittedWidth = width
+
+    def setFont(self, psfontname, size, leading=None):
+        key = (psfontname, size, leading)
+        if key == self._emittedFont:
+            self.elided += 1
+            return
+        super().setFont(psfontname, size, leading)
+        self._emittedFont = key
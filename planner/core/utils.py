@@ -1,27 +1,69 @@
 from reportlab.lib import colors
-from reportlab.graphics import renderPDF
-from svglib.svglib import svg2rlg
+from reportlab.pdfbase import pdfdoc
 from reportlab.lib.units import mm
+from collections import OrderedDict
+import copy
 import os
+import threading
 from .constants import ICONS, ICON_DIR, CARD_COLOR, SEPARATOR_COLOR, LABEL_COLOR
+from .icons import load_bundled_icon
+from .links import link_rect
+from .tracing import traced
+
+# Parsed icons are kept for the life of the process; the scaled and colorized
+# variants actually drawn are kept in a small LRU since a document only uses a
+# handful of (icon, color, size) combinations. The LRU is locked, since
+# documents may be drawn in several threads at once (see planner.aio).
+ICON_VARIANT_CACHE_SIZE = 256
+
+_icon_drawings = {}
+_icon_variants = OrderedDict()
+_icon_stats = {"hits": 0, "misses": 0}
+_icon_lock = threading.Lock()
+
+def load_icon(icon_key):
+    """
+    Loads an icon once per process, from the precompiled bundle if it is up to
+    date, else by parsing its SVG file (None if the file is missing).
+    """
+    try:
+        return _icon_drawings[icon_key]
+    except KeyError:
+        pass
+
+    drawing = load_bundled_icon(ICONS[icon_key])
+    if drawing is None:
+        # svglib (and lxml) are only imported for icons missing from the bundle
+        path = os.path.join(ICON_DIR, ICONS[icon_key])
+        if os.path.exists(path):
+            from svglib.svglib import svg2rlg
+            drawing = svg2rlg(path)
+    _icon_drawings[icon_key] = drawing
+    return drawing
+
+def _get_icon_variant(icon_key, size, color):
+    """Returns the scaled and colorized drawing for an icon, building it on first use."""
+    key = (icon_key, size, color.rgba() if color else None)
+    with _icon_lock:
+        drawing = _icon_variants.get(key)
+        if drawing is not None:
+            _icon_stats["hits"] += 1
+            _icon_variants.move_to_end(key)
+            return drawing
+        _icon_stats["misses"] += 1
+
+    # Built outside the lock; a variant built by two threads at once is stored twice
+    base = load_icon(icon_key)
+    if base is None:
+        return None
+    drawing = copy.deepcopy(base)
 
-def draw_icon(c, icon_key, x, y, size, color=None):
-    """Draws and colorizes an SVG icon."""
-    if icon_key not in ICONS:
-        return
-    
-    path = os.path.join(ICON_DIR, ICONS[icon_key])
-    if not os.path.exists(path):
-        return
-        
-    drawing = svg2rlg(path)
-    
     # Scale the drawing
     scale = size / drawing.width
     drawing.width *= scale
     drawing.height *= scale
     drawing.scale(scale, scale)
-    
+
     # Colorize the drawing
     if color:
         def colorize(obj):
@@ -33,7 +75,48 @@ def draw_icon(c, icon_key, x, y, size, color=None):
                 for child in obj.contents:
                     colorize(child)
         colorize(drawing)
-        
+
+    with _icon_lock:
+        _icon_variants[key] = drawing
+        if len(_icon_variants) > ICON_VARIANT_CACHE_SIZE:
+            _icon_variants.popitem(last=False)
+    return drawing
+
+def preload_icons():
+    """Parses every icon now, e.g. when a worker process starts."""
+    for icon_key in ICONS:
+        load_icon(icon_key)
+
+def icon_cache_info():
+    """Returns hit/miss counters and sizes of the icon cache."""
+    return {
+        "hits": _icon_stats["hits"],
+        "misses": _icon_stats["misses"],
+        "icons": len(_icon_drawings),
+        "variants": len(_icon_variants),
+        "maxsize": ICON_VARIANT_CACHE_SIZE,
+    }
+
+def clear_icon_cache():
+    """Drops all cached icons and resets the counters."""
+    with _icon_lock:
+        _icon_drawings.clear()
+        _icon_variants.clear()
+        _icon_stats["hits"] = _icon_stats["misses"] = 0
+
+@traced
+def draw_icon(c, icon_key, x, y, size, color=None):
+    """Draws and colorizes an SVG icon."""
+    if icon_key not in ICONS:
+        return
+    if getattr(c, "recording", False):
+        return c.record_icon(icon_key, x, y, size, color)
+
+    drawing = _get_icon_variant(icon_key, size, color)
+    if drawing is None:
+        return
+
+    from reportlab.graphics import renderPDF
     renderPDF.draw(drawing, c, x, y)
 
 def is_dark_color(color):
@@ -44,6 +127,7 @@ def is_dark_color(color):
     luminance = (0.299 * r + 0.587 * g + 0.114 * b)
     return luminance < 0.6
 
+@traced
 def draw_apple_tab(c, x, y, w, h, text, active=False, destination=None, color=LABEL_COLOR, icon_key=None):
     """Draws a native-looking iPadOS segmented control or button with optional hyperlink."""
     c.saveState()
@@ -75,10 +159,36 @@ def draw_apple_tab(c, x, y, w, h, text, active=False, destination=None, color=LA
     
     if destination:
         # Create the clickable link area
-        c.linkRect("", destination, (x, y, x+w, y+h), Border='[0 0 0]')
+        link_rect(c, destination, (x, y, x+w, y+h))
         
     c.restoreState()
 
+def draw_form(c, name, draw_func, *args):
+    """
+    Draws content through a named Form XObject, defining it on first use.
+    The form is stored once per document and each later call only references it.
+    Forms cannot carry link annotations, so links must be added on the page.
+    If the canvas has a form log (see render_pages), the definition is recorded.
+    """
+    if getattr(c, "recording", False):
+        return c.record_form(name, draw_func, args)
+    if not c.hasForm(name):
+        log = getattr(c, "_form_log", None)
+        if log is not None:
+            log[name] = (draw_func, args)
+        c.beginForm(name)
+        draw_func(c, *args)
+        c.endForm(Resources=_form_resources(c))
+    c.doForm(name)
+
+def _form_resources(c):
+    """Resources for the form being defined (reportlab drops ExtGState from forms)."""
+    resources = pdfdoc.PDFResourceDictionary()
+    resources.basicFonts()
+    resources.allProcs()
+    resources.ExtGState = c._extgstate.getState()
+    return resources
+
 def draw_centered_rows(c, x, y_top, w, h, num_rows, row_h, draw_row_func):
     """
     Helper to draw a block of rows centered vertically within a box.
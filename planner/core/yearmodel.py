@@ -0,0 +1,274 @@
+"""
+Precomputed calendar data and page geometry for a planner.
+
+The planner drawers used to rebuild calendars and construct a datetime for
+every cell. A YearModel computes the calendar facts of a year once, in flat
+lists, and caches the cell geometry of the monthly pages per page size.
+
+A planner runs from any first to any last date and is split into periods of
+up to 12 consecutive months, which may cross a year boundary. Each period
+has its own calendar, overview and tracker pages, and its months are the
+side tabs of its pages. A PeriodModel caches the geometry of the pages that
+show several months.
+"""
+from reportlab.lib.units import mm
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+import calendar
+import re
+
+# Page margin shared by all planner layouts
+MARGIN = 20 * mm
+
+# Months per period (one page of side tabs)
+PERIOD_MONTHS = 12
+
+class _Layouts:
+    """Layouts built on first use and kept per key (layout name and page size)."""
+    def __init__(self):
+        self._layouts = {}
+
+    def _layout(self, key, build, *args):
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = build(*args)
+        return layout
+
+class YearModel(_Layouts):
+    """
+    Calendar facts for one year. Month-indexed lists have a dummy entry at
+    index 0 so they can be indexed by month number; day-indexed lists are
+    indexed by day of year - 1.
+    """
+    def __init__(self, year):
+        super().__init__()
+        self.year = year
+        self.days_in_month = [0] + [calendar.monthrange(year, m)[1] for m in range(1, 13)]
+        # Day-of-year index of the 1st of each month
+        self.month_offset = [0] * 13
+        for m in range(2, 13):
+            self.month_offset[m] = self.month_offset[m-1] + self.days_in_month[m-1]
+        self.days_in_year = sum(self.days_in_month)
+
+        first = calendar.weekday(year, 1, 1)
+        self.weekdays = [(first + i) % 7 for i in range(self.days_in_year)]
+        self.weekend = [wd >= 5 for wd in self.weekdays]
+        # Weeks of each month as rows of 7 day numbers (0 outside the month), Monday first
+        cal = calendar.Calendar(firstweekday=0)
+        self.weeks = [()] + [tuple(tuple(w) for w in cal.monthdayscalendar(year, m)) for m in range(1, 13)]
+
+    def has_day(self, month, day):
+        return 1 <= day <= self.days_in_month[month]
+
+    def day_index(self, month, day):
+        """Day of year - 1."""
+        return self.month_offset[month] + day - 1
+
+    def weekday(self, month, day):
+        return self.weekdays[self.month_offset[month] + day - 1]
+
+    def is_weekend(self, month, day):
+        return self.weekend[self.month_offset[month] + day - 1]
+
+    def monthly_layout(self, month, W, H):
+        """
+        Month grid right of the sidebar. Returns a dict with the grid origin,
+        cell size and the (day, x, y, is_weekend) of every cell (day 0 for
+        cells outside the month).
+        """
+        def build(month, W, H):
+            sidebar_w = (W - 2*MARGIN) * 0.25
+            grid_x = MARGIN + sidebar_w + 10*mm
+            grid_w = W - MARGIN - grid_x
+            grid_top = H - 40*mm
+            grid_bottom = 15*mm
+            grid_h = grid_top - grid_bottom
+            weeks = self.weeks[month]
+            cell_w = grid_w / 7
+            cell_h = grid_h / len(weeks)
+            cells = tuple((day, grid_x + d_idx * cell_w, grid_top - (r+1) * cell_h,
+                           day != 0 and self.is_weekend(month, day))
+                          for r, week in enumerate(weeks) for d_idx, day in enumerate(week))
+            return {"sidebar_w": sidebar_w, "grid_x": grid_x, "grid_top": grid_top,
+                    "cell_w": cell_w, "cell_h": cell_h, "cells": cells}
+        return self._layout(("monthly", month, W, H), build, month, W, H)
+
+@lru_cache(maxsize=32)
+def year_model(year):
+    """Returns the (shared) YearModel for a year."""
+    return YearModel(year)
+
+# --- Periods ---
+
+class Period(namedtuple("Period", "months first last bounds")):
+    """
+    A period of a planner: its months as (year, month) pairs, with the first
+    and last date of the whole planner, and those dates as (year, month, day)
+    bounds.
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """The year and month the period starts with, as used in destination names."""
+        return "%d_%d" % self.months[0]
+
+    @property
+    def neighbors(self):
+        """
+        The last month of the previous period and the first month of the next
+        one, as (year, month) pairs, each None if the planner has no such period.
+        """
+        (year, month), (last_year, last_month) = self.months[0], self.months[-1]
+        previous = following = None
+        if (year, month) > self.bounds[0][:2]:
+            previous = (year, month - 1) if month > 1 else (year - 1, 12)
+        if (last_year, last_month) < self.bounds[1][:2]:
+            following = (last_year, last_month + 1) if last_month < 12 else (last_year + 1, 1)
+        return previous, following
+
+    def has_day(self, year, month, day):
+        """Whether the planner has a page for a day."""
+        first, last = self.bounds
+        return first <= (year, month, day) <= last
+
+def year_label(months):
+    """The year of some months, or the first and last year if they span several."""
+    first, last = months[0][0], months[-1][0]
+    return f"{first}" if first == last else f"{first}–{last}"
+
+def period_label(months):
+    """The months of a period, e.g. "Mar 2026 – Feb 2027", or its year if they are January to December."""
+    (first_year, first_month), (last_year, last_month) = months[0], months[-1]
+    if first_month == 1 and last_month == 12 and first_year == last_year:
+        return f"{first_year}"
+    return f"{calendar.month_abbr[first_month]} {first_year} – {calendar.month_abbr[last_month]} {last_year}"
+
+def planner_periods(first, last):
+    """Splits the months from the date first to the date last into periods of PERIOD_MONTHS months."""
+    if last < first:
+        raise ValueError(f"the planner ends ({last}) before it starts ({first})")
+    count = (last.year - first.year) * 12 + last.month - first.month + 1
+    months = [(first.year + (first.month - 1 + i) // 12, (first.month - 1 + i) % 12 + 1) for i in range(count)]
+    bounds = ((first.year, first.month, first.day), (last.year, last.month, last.day))
+    return [Period(tuple(months[i:i + PERIOD_MONTHS]), first, last, bounds) for i in range(0, count, PERIOD_MONTHS)]
+
+def parse_date(text, end=False):
+    """
+    Parses YYYY-MM-DD, or YYYY-MM as the first (or with end, the last) day of
+    the month. Raises ValueError for anything else.
+    """
+    match = re.fullmatch(r"(\d{4})-(\d{1,2})(?:-(\d{1,2}))?", text.strip())
+    if not match:
+        raise ValueError(f"'{text}' is not a date (YYYY-MM-DD or YYYY-MM)")
+    year, month, day = (int(g) if g else None for g in match.groups())
+    if not 1 <= month <= 12:
+        raise ValueError(f"'{text}' is not a date: no month {month}")
+    if day is None:
+        day = calendar.monthrange(year, month)[1] if end else 1
+    try:
+        return date(year, month, day)
+    except ValueError as e:
+        raise ValueError(f"'{text}' is not a date: {e}") from None
+
+class PeriodModel(_Layouts):
+    """
+    Geometry of the pages showing all the months of a period. Layouts are
+    lists indexed by the position of a month in the period (its side tab).
+    """
+    def __init__(self, months):
+        super().__init__()
+        self.months = months
+
+    def tracker_layout(self, W, H):
+        """
+        Tracker grid: a row of 31 cells per month, for up to 12 months. Returns a
+        dict with the grid origin and cell size, the y of each month row, and
+        per month the (day, x, is_weekend) of each existing day.
+        """
+        def build(W, H):
+            legend_x = MARGIN + 15*mm
+            grid_x = MARGIN + 15*mm
+            grid_y = H - 52*mm
+            grid_w = W - MARGIN - legend_x - 10*mm
+            grid_h = grid_y - 15*mm
+            cell_w = grid_w / 31
+            cell_h = grid_h / PERIOD_MONTHS
+            cells = []
+            for year, m in self.months:
+                model = year_model(year)
+                cells.append(tuple((d, grid_x + (d-1)*cell_w, model.is_weekend(m, d))
+                                   for d in range(1, model.days_in_month[m] + 1)))
+            return {
+                "grid_x": grid_x, "grid_y": grid_y, "cell_w": cell_w, "cell_h": cell_h,
+                "row_y": [grid_y - (i+1)*cell_h for i in range(len(self.months))],
+                "cells": cells,
+            }
+        return self._layout(("tracker", W, H), build, W, H)
+
+    def summary_layout(self, W, H):
+        """
+        Calendar of the period: 4 x 3 mini months. Returns a list of dicts per
+        month with the block origin (x, y), the mini calendar origin and width,
+        and the (day, x, y, is_weekend) of every day.
+        """
+        def build(W, H):
+            grid_top = H - 34*mm
+            grid_bottom = 15*mm
+            grid_w = W - 2*MARGIN
+            grid_h = grid_top - grid_bottom
+            cell_w = grid_w / 4
+            cell_h = grid_h / 3
+
+            months = []
+            for i, (year, m) in enumerate(self.months):
+                model = year_model(year)
+                col = i % 4
+                row = i // 4
+                x = MARGIN + col * cell_w
+                y = grid_top - row * cell_h
+                mini_w = cell_w - 10*mm
+                mini_x = x + 5*mm
+                mini_y = y - 12*mm
+                days = []
+                for r, week in enumerate(model.weeks[m]):
+                    wy = mini_y - 4.5*mm - r*3.8*mm
+                    for d_idx, day in enumerate(week):
+                        if day != 0:
+                            dx = mini_x + d_idx*(mini_w/7) + (mini_w/14)
+                            days.append((day, dx, wy, model.is_weekend(m, day)))
+                months.append({
+                    "x": x, "y": y, "mini_x": mini_x, "mini_y": mini_y, "mini_w": mini_w,
+                    "header_x": tuple(mini_x + i*(mini_w/7) + (mini_w/14) for i in range(7)),
+                    "days": tuple(days),
+                })
+            return months
+        return self._layout(("summary", W, H), build, W, H)
+
+    def six_month_layout(self, start, W, H):
+        """
+        Six columns of day rows for the months of the period from position
+        start. Returns a dict with the column width, header y, row height and,
+        per column, the (year, month), its x and the (day, y, is_weekend,
+        weekday) of each existing day.
+        """
+        def build(start, W, H):
+            cols = 6
+            col_w = (W - 2*MARGIN) / cols
+            top_y = H - 40*mm
+            bottom_y = 15*mm
+            row_h = (top_y - bottom_y - 10*mm) / 31
+            columns = []
+            for i, (year, m) in enumerate(self.months[start:start + cols]):
+                model = year_model(year)
+                days = tuple((day, top_y - 8*mm - (day-1) * row_h, model.is_weekend(m, day), model.weekday(m, day))
+                             for day in range(1, model.days_in_month[m] + 1))
+                columns.append(((year, m), MARGIN + i * col_w, days))
+            return {"col_w": col_w, "top_y": top_y, "row_h": row_h, "columns": columns}
+        return self._layout(("six_month", start, W, H), build, start, W, H)
+
+@lru_cache(maxsize=32)
+def period_model(months):
+    """Returns the (shared) PeriodModel for the months of a period."""
+    return PeriodModel(months)
@@ -1,9 +1,9 @@
-from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib import colors
 import calendar
 import os
-from datetime import datetime, timedelta
+from contextlib import nullcontext
+from datetime import date, datetime
 
 from ..core.constants import (
     IPAD_PRO_11_LANDSCAPE, BACKGROUND_COLOR, CARD_COLOR, LABEL_COLOR,
@@ -11,27 +11,60 @@ from ..core.constants import (
     SYSTEM_GRAY_3, SYSTEM_GRAY_4, SYSTEM_GRAY_5, SYSTEM_GRAY_6,
     SECONDARY_LABEL, TERTIARY_LABEL, MONTH_COLORS
 )
-from ..core.utils import draw_icon, is_dark_color, draw_apple_tab
+from ..core.utils import draw_icon, is_dark_color, draw_apple_tab, draw_form
+from ..core.render import (
+    draw_pages, render_pages, merge_rendered, plan_destinations, render_parallel, write_streaming,
+    export_destinations, compact_pdf,
+)
+from ..core.pdffile import deduplicate
+from ..core.statecanvas import StateCanvas
+from ..core.links import link_rect
+from ..core.tracing import traced, attach, Tracer
+from ..core.yearmodel import year_model, period_model, planner_periods, year_label, period_label
+from ..core.cache import cached_output
+from ..core.incremental import build_incremental, depends_on
 
-def draw_side_tabs(c, W, H, current_month=None):
-    """Draws vertical month tabs on the right side of the page."""
+def _side_tab_rect(W, H, slot, is_active=False):
+    """Returns (x, y, w, h) of the slot-th tab from the top (from 1), popped out if it is active."""
     tab_w = 8 * mm
     tab_h = (H - 40*mm) / 12
     x = W - tab_w + 2*mm # Slightly overlapping edge for "tab" look
-    
+    y = H - 30*mm - slot*tab_h
+
+    # If active, make it pop out more
+    draw_x = x - (4*mm if is_active else 0)
+    draw_w = tab_w + (4*mm if is_active else 0)
+    return draw_x, y, draw_w, tab_h
+
+def _period_tab_rect(W, H, index):
+    """
+    Returns (x, y, w, h) of the tab above the side tabs (index 0), leading to
+    the previous period, or below them (index 1), leading to the next one.
+    """
+    tab_w = 8 * mm
+    tab_h = 7 * mm
+    x = W - tab_w + 2*mm
+    if index == 0:
+        y = H - 30*mm + 1*mm
+    else:
+        y = H - 30*mm - (H - 40*mm) - 1*mm - tab_h
+    return x, y, tab_w, tab_h
+
+@traced
+def draw_side_tabs(c, W, H, months, current_month=None, links=True, neighbors=(None, None)):
+    """
+    Draws vertical tabs on the right side of the page for months, the
+    (year, month) pairs of a period, popping out current_month. neighbors
+    are the months the tabs above and below lead to in the previous and next
+    period (see Period.neighbors), drawn as chevrons when they are not None.
+    """
     c.saveState()
-    for i in range(12):
-        m = i + 1
-        y = H - 30*mm - (i+1)*tab_h
-        
-        color = MONTH_COLORS[i]
+    for slot, (year, m) in enumerate(months, 1):
+        draw_x, y, draw_w, tab_h = _side_tab_rect(W, H, slot, (year, m) == current_month)
+
+        color = MONTH_COLORS[m-1]
         c.setFillColor(color)
-        
-        # If active, make it pop out more
-        is_active = (m == current_month)
-        draw_x = x - (4*mm if is_active else 0)
-        draw_w = tab_w + (4*mm if is_active else 0)
-        
+
         # Draw Tab with rounded left corners
         c.roundRect(draw_x, y, draw_w, tab_h - 0.5*mm, 2*mm, fill=1, stroke=0)
         
@@ -52,11 +85,120 @@ def draw_side_tabs(c, W, H, current_month=None):
         c.drawCentredString(0, -1*mm, calendar.month_abbr[m].upper())
         c.restoreState()
         
-        # Link to Monthly Page
-        c.linkRect("", f"Month_{m}", (draw_x, y, W, y + tab_h), Border='[0 0 0]')
-        
+        if links:
+            link_side_tab(c, W, H, months, slot, current_month)
+
+    for index, neighbor in enumerate(neighbors):
+        if neighbor is None:
+            continue
+        x, y, w, h = _period_tab_rect(W, H, index)
+        c.setFillColor(CARD_COLOR)
+        c.setStrokeColor(SEPARATOR_COLOR)
+        c.setLineWidth(0.1)
+        c.roundRect(x, y, w, h, 2*mm, fill=1, stroke=1)
+        # Chevron pointing up to the previous period, down to the next
+        cx, cy = x + 3*mm, y + h/2
+        tip = 0.9*mm if index == 0 else -0.9*mm
+        c.setStrokeColor(SECONDARY_LABEL)
+        c.setLineWidth(1)
+        c.lines([(cx - 1.5*mm, cy - tip, cx, cy + tip), (cx, cy + tip, cx + 1.5*mm, cy - tip)])
+        if links:
+            link_period_tab(c, W, H, neighbors, index)
+
     c.restoreState()
 
+def link_side_tab(c, W, H, months, slot, current_month=None):
+    """Adds the link from the slot-th side tab to its monthly page."""
+    year, month = months[slot-1]
+    draw_x, y, draw_w, tab_h = _side_tab_rect(W, H, slot, (year, month) == current_month)
+    link_rect(c, f"Month_{year}_{month}", (draw_x, y, W, y + tab_h))
+
+def link_period_tab(c, W, H, neighbors, index):
+    """Adds the link from the tab above (index 0) or below (index 1) the side tabs to its month."""
+    year, month = neighbors[index]
+    x, y, w, h = _period_tab_rect(W, H, index)
+    link_rect(c, f"Month_{year}_{month}", (x, y, W, y + h))
+
+# (label, page, icon) of the navigation tabs at the top right. Each period has
+# these pages; the destination is the page name followed by the period key.
+NAV_TABS = [
+    ("Calendar", "YearlySummary", "calendar"),
+    ("Summary", "SixMonth", "overview"),
+    ("Tracker", "YearlyTracker", "goals"),
+]
+
+def _nav_tab_rect(W, H, i):
+    """Returns (x, y, w, h) of the i-th navigation tab."""
+    tab_w = 32 * mm
+    gap = 3 * mm
+    r_margin = 15 * mm
+    x = W - r_margin - tab_w*(3 - i) - gap*(2 - i)
+    return x, H - 22*mm, tab_w, 9*mm
+
+def draw_page_title(c, W, H, label, title):
+    """
+    Draws the header of a period page: the year label in bold, then the
+    title. The font shrinks if the header would reach the navigation tabs
+    (e.g. for a label spanning two years).
+    """
+    margin = 20 * mm
+    size = 34
+    width = c.stringWidth(f"{label} ", "Helvetica-Bold", size) + c.stringWidth(title, "Helvetica", size)
+    room = _nav_tab_rect(W, H, 0)[0] - 4*mm - margin
+    if width > room:
+        size = size * room / width
+    c.setFont("Helvetica-Bold", size)
+    c.setFillColor(LABEL_COLOR)
+    c.drawString(margin, H - 22*mm, label)
+    c.setFont("Helvetica", size)
+    c.drawString(margin + c.stringWidth(f"{label} ", "Helvetica-Bold", size), H - 22*mm, title)
+
+@traced
+def draw_nav_tabs(c, W, H, period_key, active=None, color=LABEL_COLOR, links=True):
+    """Draws the Calendar / Summary / Tracker tabs of a period, highlighting the active page."""
+    for i, (label, page, icon_key) in enumerate(NAV_TABS):
+        x, y, w, h = _nav_tab_rect(W, H, i)
+        draw_apple_tab(c, x, y, w, h, label, active=(page == active),
+                       destination=f"{page}_{period_key}" if links else None, color=color, icon_key=icon_key)
+
+def _draw_chrome(c, W, H, months, current_month, active_tab, color, neighbors):
+    # Background
+    c.setFillColor(BACKGROUND_COLOR)
+    c.rect(0, 0, W, H, fill=1, stroke=0)
+
+    draw_side_tabs(c, W, H, months, current_month=current_month, links=False, neighbors=neighbors)
+    draw_nav_tabs(c, W, H, None, active=active_tab, color=color, links=False)
+
+@traced
+def draw_page_chrome(c, W, H, months, current_month=None, active_tab=None, color=LABEL_COLOR,
+                     neighbors=(None, None)):
+    """
+    Draws the background, side tabs (for months, the (year, month) pairs of a
+    period, with tabs to the neighboring periods' months) and navigation tabs
+    shared by all planner pages.
+    The artwork is a Form XObject defined once per document for each variant;
+    the links are added to every page since forms cannot carry annotations.
+    """
+    window = "%d_%d_%d" % (months[0] + (len(months),))
+    current = current_month[1] if current_month else 0
+    name = f"Chrome_{window}_{current}_{active_tab or 'None'}_{color.hexval()[2:]}"
+    # Periods with neighbors only occur in planners spanning several periods
+    ends = "".join(flag for flag, neighbor in zip("pn", neighbors) if neighbor is not None)
+    if ends:
+        name += f"_{ends}"
+    draw_form(c, name, _draw_chrome, W, H, months, current_month, active_tab, color, neighbors)
+
+    for slot in range(1, len(months) + 1):
+        link_side_tab(c, W, H, months, slot, current_month)
+    for index, neighbor in enumerate(neighbors):
+        if neighbor is not None:
+            link_period_tab(c, W, H, neighbors, index)
+    period_key = "%d_%d" % months[0]
+    for i, (label, page, icon_key) in enumerate(NAV_TABS):
+        x, y, w, h = _nav_tab_rect(W, H, i)
+        link_rect(c, f"{page}_{period_key}", (x, y, x + w, y + h))
+
+@traced
 def draw_home_button(c, W, H, margin, color=LABEL_COLOR):
     """Draws a subtle Home button in the top right."""
     btn_w = 25 * mm
@@ -79,34 +221,20 @@ def draw_home_button(c, W, H, margin, color=LABEL_COLOR):
     c.setFont("Helvetica-Bold", 10)
     c.drawString(x + 9*mm, y + btn_h/2 - 1.2*mm, "Home")
     
-    c.linkRect("", "Cover", (x, y, x + btn_w, y + btn_h), Border='[0 0 0]')
+    link_rect(c, "Cover", (x, y, x + btn_w, y + btn_h))
     c.restoreState()
 
-def draw_yearly_tracker(c, year, W, H):
+@traced
+def draw_yearly_tracker(c, period, W, H):
     margin = 20 * mm
     c.saveState()
     
-    # Background
-    c.setFillColor(BACKGROUND_COLOR)
-    c.rect(0, 0, W, H, fill=1, stroke=0)
+    # Background, Side Tabs & Navigation Tabs
+    draw_page_chrome(c, W, H, period.months, active_tab="YearlyTracker",
+                     neighbors=period.neighbors)
     
     # Header
-    c.setFont("Helvetica-Bold", 34)
-    c.setFillColor(LABEL_COLOR)
-    c.drawString(margin, H - 22*mm, f"{year}")
-    c.setFont("Helvetica", 34)
-    c.drawString(margin + c.stringWidth(f"{year} ", "Helvetica-Bold", 34), H - 22*mm, "Tracker")
-    
-    # Side Tabs
-    draw_side_tabs(c, W, H)
-    
-    # Navigation Tabs
-    tab_w = 32 * mm
-    gap = 3 * mm
-    r_margin = 15 * mm
-    draw_apple_tab(c, W - r_margin - tab_w*3 - gap*2, H - 22*mm, tab_w, 9*mm, "Calendar", destination="YearlySummary", icon_key="calendar")
-    draw_apple_tab(c, W - r_margin - tab_w*2 - gap, H - 22*mm, tab_w, 9*mm, "Summary", destination="SixMonth_1", icon_key="overview")
-    draw_apple_tab(c, W - r_margin - tab_w, H - 22*mm, tab_w, 9*mm, "Tracker", active=True, destination="YearlyTracker", icon_key="goals")
+    draw_page_title(c, W, H, year_label(period.months), "Tracker")
 
     # Legend / Key at Top
     legend_y = H - 42*mm
@@ -149,13 +277,11 @@ def draw_yearly_tracker(c, year, W, H):
         c.line(lx + 6*mm, legend_y + 1*mm, lx + item_w - 5*mm, legend_y + 1*mm)
 
     # Grid Setup
-    grid_x = margin + 15*mm
-    grid_y = H - 52*mm
-    grid_w = grid_w_full
-    grid_h = grid_y - 15*mm
-    
-    cell_w = grid_w / 31
-    cell_h = grid_h / 12
+    layout = period_model(period.months).tracker_layout(W, H)
+    grid_x = layout["grid_x"]
+    grid_y = layout["grid_y"]
+    cell_w = layout["cell_w"]
+    cell_h = layout["cell_h"]
     
     # Day Labels (1-31)
     c.setFont("Helvetica-Bold", 7)
@@ -163,8 +289,8 @@ def draw_yearly_tracker(c, year, W, H):
     for d in range(1, 32):
         c.drawCentredString(grid_x + (d-0.5)*cell_w, grid_y + 2*mm, str(d))
         
-    for m in range(1, 13):
-        my = grid_y - m*cell_h
+    for i, (year, m) in enumerate(period.months):
+        my = layout["row_y"][i]
         month_color = MONTH_COLORS[m-1]
         
         # Month Label
@@ -172,40 +298,38 @@ def draw_yearly_tracker(c, year, W, H):
         c.setFillColor(month_color)
         c.drawRightString(grid_x - 2*mm, my + cell_h/2 - 1*mm, calendar.month_abbr[m].upper())
         
-        for d in range(1, 32):
-            mx = grid_x + (d-1)*cell_w
+        for d, mx, is_weekend in layout["cells"][i]:
+            # Cell Background
+            c.setStrokeColor(SECONDARY_LABEL)
+            c.setStrokeAlpha(0.4)
+            c.setLineWidth(0.15)
+            if is_weekend:
+                c.setFillColor(colors.HexColor("#EBE8D8"))
+            else:
+                c.setFillColor(CARD_COLOR)
             
-            try:
-                dt = datetime(year, m, d)
-                is_weekend = dt.weekday() >= 5
-                
-                # Cell Background
-                c.setStrokeColor(SECONDARY_LABEL)
-                c.setStrokeAlpha(0.4)
-                c.setLineWidth(0.15)
-                if is_weekend:
-                    c.setFillColor(colors.HexColor("#EBE8D8"))
-                else:
-                    c.setFillColor(CARD_COLOR)
-                
-                c.roundRect(mx + 0.4*mm, my + 0.4*mm, cell_w - 0.8*mm, cell_h - 0.8*mm, 0.5*mm, fill=1, stroke=1)
-                
-                # Quadrant Split (Revolutionary System)
-                # Vertical line
-                c.line(mx + cell_w/2, my + 0.4*mm, mx + cell_w/2, my + cell_h - 0.4*mm)
-                # Horizontal line
-                c.line(mx + 0.4*mm, my + cell_h/2, mx + cell_w - 0.4*mm, my + cell_h/2)
-                c.setStrokeAlpha(1.0)
-                
-                # Link to Daily Page
-                c.linkRect("", f"Day_{year}_{m}_{d}", (mx, my, mx + cell_w, my + cell_h), Border='[0 0 0]')
-                
-            except ValueError:
-                pass
+            c.roundRect(mx + 0.4*mm, my + 0.4*mm, cell_w - 0.8*mm, cell_h - 0.8*mm, 0.5*mm, fill=1, stroke=1)
+            
+            # Quadrant Split (Revolutionary System)
+            # Vertical line
+            c.line(mx + cell_w/2, my + 0.4*mm, mx + cell_w/2, my + cell_h - 0.4*mm)
+            # Horizontal line
+            c.line(mx + 0.4*mm, my + cell_h/2, mx + cell_w - 0.4*mm, my + cell_h/2)
+            c.setStrokeAlpha(1.0)
+            
+            # Link to Daily Page
+            if period.has_day(year, m, d):
+                link_rect(c, f"Day_{year}_{m}_{d}", (mx, my, mx + cell_w, my + cell_h))
                 
     c.restoreState()
 
-def draw_cover(c, W, H, title):
+@traced
+@depends_on(lambda W, H, title, periods=(): {"MONTH_COLORS": MONTH_COLORS[0]})
+def draw_cover(c, W, H, title, periods=()):
+    """
+    Draws the cover. periods lists (key, label) of the periods of a planner
+    spanning several, drawn as buttons to their calendars.
+    """
     c.saveState()
     # Minimalist Apple Cover
     c.setFillColor(BACKGROUND_COLOR)
@@ -226,49 +350,38 @@ def draw_cover(c, W, H, title):
     c.setStrokeColor(MONTH_COLORS[0])
     c.setLineWidth(1.5)
     c.line(W/2 - 20*mm, H/2 - 30*mm, W/2 + 20*mm, H/2 - 30*mm)
+
+    # Period buttons, up to 5 per row
+    btn_w = 48 * mm
+    btn_h = 9 * mm
+    gap = 4 * mm
+    per_row = 5
+    for row_start in range(0, len(periods), per_row):
+        row = periods[row_start:row_start + per_row]
+        x = (W - len(row) * btn_w - (len(row) - 1) * gap) / 2
+        y = H/2 - 48*mm - (row_start // per_row) * (btn_h + gap)
+        for key, label in row:
+            draw_apple_tab(c, x, y, btn_w, btn_h, label, destination=f"YearlySummary_{key}")
+            x += btn_w + gap
     c.restoreState()
 
-def draw_summary_page(c, year, W, H):
+@traced
+def draw_summary_page(c, period, W, H):
     margin = 20 * mm
     c.saveState()
     
-    # Background
-    c.setFillColor(BACKGROUND_COLOR)
-    c.rect(0, 0, W, H, fill=1, stroke=0)
+    # Background, Side Tabs & Navigation Tabs
+    draw_page_chrome(c, W, H, period.months, active_tab="YearlySummary",
+                     neighbors=period.neighbors)
     
     # Header
-    c.setFont("Helvetica-Bold", 34)
-    c.setFillColor(LABEL_COLOR)
-    c.drawString(margin, H - 22*mm, f"{year}")
-    c.setFont("Helvetica", 34)
-    c.drawString(margin + c.stringWidth(f"{year} ", "Helvetica-Bold", 34), H - 22*mm, "Calendar")
-    
-    # Side Tabs
-    draw_side_tabs(c, W, H)
-    
-    # Navigation Tabs (Top Right)
-    tab_w = 32 * mm
-    gap = 3 * mm
-    r_margin = 15 * mm
-    draw_apple_tab(c, W - r_margin - tab_w*3 - gap*2, H - 22*mm, tab_w, 9*mm, "Calendar", active=True, destination="YearlySummary", icon_key="calendar")
-    draw_apple_tab(c, W - r_margin - tab_w*2 - gap, H - 22*mm, tab_w, 9*mm, "Summary", destination="SixMonth_1", icon_key="overview")
-    draw_apple_tab(c, W - r_margin - tab_w, H - 22*mm, tab_w, 9*mm, "Tracker", destination="YearlyTracker", icon_key="goals")
+    draw_page_title(c, W, H, year_label(period.months), "Calendar")
     
     # Grid Setup (4 cols x 3 rows)
-    grid_top = H - 34*mm
-    grid_bottom = 15*mm
-    grid_w = W - 2*margin
-    grid_h = grid_top - grid_bottom
-    
-    cell_w = grid_w / 4
-    cell_h = grid_h / 3
-    
-    cal = calendar.Calendar(firstweekday=0)
-    for m in range(1, 13):
-        col = (m-1) % 4
-        row = (m-1) // 4
-        x = margin + col * cell_w
-        y = grid_top - row * cell_h
+    layout = period_model(period.months).summary_layout(W, H)
+    for (year, m), block in zip(period.months, layout):
+        x = block["x"]
+        y = block["y"]
         
         # Month Name (Clickable)
         c.setFont("Helvetica-Bold", 12)
@@ -277,75 +390,53 @@ def draw_summary_page(c, year, W, H):
         month_name = calendar.month_name[m]
         c.drawString(x + 5*mm, y - 6*mm, month_name)
         # Link to Monthly Page
-        c.linkRect("", f"Month_{m}", (x + 5*mm, y - 8*mm, x + 5*mm + c.stringWidth(month_name, "Helvetica-Bold", 12), y), Border='[0 0 0]')
+        link_rect(c, f"Month_{year}_{m}", (x + 5*mm, y - 8*mm, x + 5*mm + c.stringWidth(month_name, "Helvetica-Bold", 12), y))
         
         # Mini Calendar
-        mini_w = cell_w - 10*mm
-        mini_x = x + 5*mm
-        mini_y = y - 12*mm
+        mini_y = block["mini_y"]
         
         # Day Headers
         c.setFont("Helvetica-Bold", 6)
         c.setFillColor(SYSTEM_GRAY)
         days = ["M", "T", "W", "T", "F", "S", "S"]
-        for i, d in enumerate(days):
-            c.drawCentredString(mini_x + i*(mini_w/7) + (mini_w/14), mini_y, d)
+        for hx, d in zip(block["header_x"], days):
+            c.drawCentredString(hx, mini_y, d)
         
         # Calendar Days
-        weeks = cal.monthdayscalendar(year, m)
-        for r, week in enumerate(weeks):
-            wy = mini_y - 4.5*mm - r*3.8*mm
-            for d_idx, day in enumerate(week):
-                if day != 0:
-                    c.setFont("Helvetica", 7)
-                    dt = datetime(year, m, day)
-                    if dt.weekday() >= 5:
-                        c.setFillColor(SYSTEM_GRAY)
-                    else:
-                        c.setFillColor(LABEL_COLOR)
-                    
-                    dx = mini_x + d_idx*(mini_w/7) + (mini_w/14)
-                    c.drawCentredString(dx, wy, str(day))
-                    # Link to Daily Page
-                    c.linkRect("", f"Day_{year}_{m}_{day}", (dx - 2*mm, wy - 1*mm, dx + 2*mm, wy + 3*mm), Border='[0 0 0]')
+        for day, dx, wy, is_weekend in block["days"]:
+            c.setFont("Helvetica", 7)
+            if is_weekend:
+                c.setFillColor(SYSTEM_GRAY)
+            else:
+                c.setFillColor(LABEL_COLOR)
+            
+            c.drawCentredString(dx, wy, str(day))
+            # Link to Daily Page
+            if period.has_day(year, m, day):
+                link_rect(c, f"Day_{year}_{m}_{day}", (dx - 2*mm, wy - 1*mm, dx + 2*mm, wy + 3*mm))
     c.restoreState()
 
-def draw_six_month_overview(c, year, start_month, W, H):
+@traced
+@depends_on(lambda period, start, W, H: {"MONTH_COLORS": [MONTH_COLORS[m-1] for year, m in period.months[start:start+6]]})
+def draw_six_month_overview(c, period, start, W, H):
+    """Draws the six months of a period from position start (0 or 6)."""
     margin = 20 * mm
     c.saveState()
     
-    # Background
-    c.setFillColor(BACKGROUND_COLOR)
-    c.rect(0, 0, W, H, fill=1, stroke=0)
+    # Background, Side Tabs & Navigation Tabs
+    draw_page_chrome(c, W, H, period.months, active_tab="SixMonth",
+                     neighbors=period.neighbors)
     
     # Header
-    c.setFont("Helvetica-Bold", 34)
-    c.setFillColor(LABEL_COLOR)
-    c.drawString(margin, H - 22*mm, f"{year}")
-    c.setFont("Helvetica", 34)
-    c.drawString(margin + c.stringWidth(f"{year} ", "Helvetica-Bold", 34), H - 22*mm, "Summary")
-    
-    # Side Tabs
-    draw_side_tabs(c, W, H)
-    
-    # Navigation Tabs
-    tab_w = 32 * mm
-    gap = 3 * mm
-    r_margin = 15 * mm
-    draw_apple_tab(c, W - r_margin - tab_w*3 - gap*2, H - 22*mm, tab_w, 9*mm, "Calendar", destination="YearlySummary", icon_key="calendar")
-    draw_apple_tab(c, W - r_margin - tab_w*2 - gap, H - 22*mm, tab_w, 9*mm, "Summary", active=True, destination="SixMonth_1", icon_key="overview")
-    draw_apple_tab(c, W - r_margin - tab_w, H - 22*mm, tab_w, 9*mm, "Tracker", destination="YearlyTracker", icon_key="goals")
+    draw_page_title(c, W, H, year_label(period.months[start:start+6]), "Summary")
     
     # 6 Columns for 6 Months
-    cols = 6
-    col_w = (W - 2*margin) / cols
-    top_y = H - 40*mm
-    bottom_y = 15*mm
-    row_h = (top_y - bottom_y - 10*mm) / 31
+    layout = period_model(period.months).six_month_layout(start, W, H)
+    col_w = layout["col_w"]
+    top_y = layout["top_y"]
+    row_h = layout["row_h"]
     
-    for i in range(cols):
-        m = start_month + i
-        x = margin + i * col_w
+    for (year, m), x, days in layout["columns"]:
         
         # Month Header (Grouped Style) - Clickable
         month_color = MONTH_COLORS[m-1]
@@ -355,72 +446,70 @@ def draw_six_month_overview(c, year, start_month, W, H):
         c.setFont("Helvetica-Bold", 9)
         month_name = calendar.month_name[m].upper()
         c.drawCentredString(x + col_w/2, top_y + 0.35*mm, month_name)
-        c.linkRect("", f"Month_{m}", (x + 1*mm, top_y - 2*mm, x + col_w - 1*mm, top_y + 5*mm), Border='[0 0 0]')
+        link_rect(c, f"Month_{year}_{m}", (x + 1*mm, top_y - 2*mm, x + col_w - 1*mm, top_y + 5*mm))
         
         # Days
-        for day in range(1, 32):
-            y = top_y - 8*mm - (day-1) * row_h
+        for day, y, is_weekend, weekday in days:
+            # Row Background
+            if is_weekend:
+                c.setFillColor(colors.HexColor("#EBE8D8")) # Slightly darker for weekends
+            else:
+                c.setFillColor(CARD_COLOR)
+            c.rect(x + 1*mm, y - row_h/2, col_w - 2*mm, row_h, fill=1, stroke=0)
             
-            try:
-                dt = datetime(year, m, day)
-                is_weekend = dt.weekday() >= 5
-                
-                # Row Background
-                if is_weekend:
-                    c.setFillColor(colors.HexColor("#EBE8D8")) # Slightly darker for weekends
-                else:
-                    c.setFillColor(CARD_COLOR)
-                c.rect(x + 1*mm, y - row_h/2, col_w - 2*mm, row_h, fill=1, stroke=0)
-                
-                # Separator
-                c.setStrokeColor(SEPARATOR_COLOR)
-                c.setLineWidth(0.05)
-                c.line(x + 2*mm, y - row_h/2, x + col_w - 2*mm, y - row_h/2)
-                
-                # Day Number
-                c.setFillColor(LABEL_COLOR if not is_weekend else SYSTEM_GRAY)
-                c.setFont("Helvetica-Bold", 7)
-                c.drawRightString(x + 4.5*mm, y - 0.7*mm, str(day))
-                
-                # Day Name (Initial)
-                c.setFont("Helvetica", 7)
-                c.setFillColor(SYSTEM_GRAY_2 if not is_weekend else SYSTEM_GRAY_3)
-                c.drawString(x + 5.5*mm, y - 0.7*mm, dt.strftime("%a")[0])
-                
-                # Link to Daily Page
-                c.linkRect("", f"Day_{year}_{m}_{day}", (x + 1*mm, y - row_h/2, x + col_w - 1*mm, y + row_h/2), Border='[0 0 0]')
-                
-            except ValueError:
-                pass
+            # Separator
+            c.setStrokeColor(SEPARATOR_COLOR)
+            c.setLineWidth(0.05)
+            c.line(x + 2*mm, y - row_h/2, x + col_w - 2*mm, y - row_h/2)
+            
+            # Day Number
+            c.setFillColor(LABEL_COLOR if not is_weekend else SYSTEM_GRAY)
+            c.setFont("Helvetica-Bold", 7)
+            c.drawRightString(x + 4.5*mm, y - 0.7*mm, str(day))
+            
+            # Day Name (Initial)
+            c.setFont("Helvetica", 7)
+            c.setFillColor(SYSTEM_GRAY_2 if not is_weekend else SYSTEM_GRAY_3)
+            c.drawString(x + 5.5*mm, y - 0.7*mm, calendar.day_abbr[weekday][0])
+            
+            # Link to Daily Page
+            if period.has_day(year, m, day):
+                link_rect(c, f"Day_{year}_{m}_{day}", (x + 1*mm, y - row_h/2, x + col_w - 1*mm, y + row_h/2))
+
+    # Switch between the halves of the period
+    halves = range(0, len(period.months), 6)
+    if len(halves) > 1:
+        btn_w = 30 * mm
+        btn_h = 8 * mm
+        gap = 2 * mm
+        x = (W - len(halves) * btn_w - (len(halves) - 1) * gap) / 2
+        for half in halves:
+            months = period.months[half:half+6]
+            label = f"{calendar.month_abbr[months[0][1]]} – {calendar.month_abbr[months[-1][1]]}"
+            destination = None if half == start else "SixMonth_%d_%d" % months[0]
+            draw_apple_tab(c, x, 6*mm, btn_w, btn_h, label, active=(half == start), destination=destination)
+            x += btn_w + gap
     c.restoreState()
 
-def draw_monthly_page(c, year, month, W, H):
+@traced
+@depends_on(lambda period, year, month, W, H: {"MONTH_COLORS": MONTH_COLORS[month-1]})
+def draw_monthly_page(c, period, year, month, W, H):
     margin = 20 * mm
     month_color = MONTH_COLORS[month-1]
     c.saveState()
     
-    # Background
-    c.setFillColor(BACKGROUND_COLOR)
-    c.rect(0, 0, W, H, fill=1, stroke=0)
+    # Background, Side Tabs & Navigation Tabs
+    draw_page_chrome(c, W, H, period.months, current_month=(year, month), color=month_color,
+                     neighbors=period.neighbors)
     
     # Header
     c.setFont("Helvetica-Bold", 34)
     c.setFillColor(month_color)
     c.drawString(margin, H - 22*mm, calendar.month_name[month])
     
-    # Side Tabs
-    draw_side_tabs(c, W, H, current_month=month)
-    
-    # Navigation Tabs
-    tab_w = 32 * mm
-    gap = 3 * mm
-    r_margin = 15 * mm
-    draw_apple_tab(c, W - r_margin - tab_w*3 - gap*2, H - 22*mm, tab_w, 9*mm, "Calendar", destination="YearlySummary", color=month_color, icon_key="calendar")
-    draw_apple_tab(c, W - r_margin - tab_w*2 - gap, H - 22*mm, tab_w, 9*mm, "Summary", destination="SixMonth_1", color=month_color, icon_key="overview")
-    draw_apple_tab(c, W - r_margin - tab_w, H - 22*mm, tab_w, 9*mm, "Tracker", destination="YearlyTracker", color=month_color, icon_key="goals")
-    
     # Sidebar (Left) - 25% width
-    sidebar_w = (W - 2*margin) * 0.25
+    layout = year_model(year).monthly_layout(month, W, H)
+    sidebar_w = layout["sidebar_w"]
     # Reduced line counts and spacing to fit on screen
     sections = [("Key Dates", 4, "important"), ("Monthly Tasks", 4, "goals"), ("Notes", 5, "notes")]
     sec_y = H - 45*mm
@@ -446,17 +535,10 @@ def draw_monthly_page(c, year, month, W, H):
         sec_y -= group_h + 12*mm
 
     # Calendar Grid (Right)
-    grid_x = margin + sidebar_w + 10*mm
-    grid_w = W - margin - grid_x
-    grid_top = H - 40*mm
-    grid_bottom = 15*mm
-    grid_h = grid_top - grid_bottom
-    
-    cal = calendar.Calendar(firstweekday=0)
-    weeks = cal.monthdayscalendar(year, month)
-    num_weeks = len(weeks)
-    cell_w = grid_w / 7
-    cell_h = grid_h / num_weeks
+    grid_x = layout["grid_x"]
+    grid_top = layout["grid_top"]
+    cell_w = layout["cell_w"]
+    cell_h = layout["cell_h"]
     
     # Day Headers
     c.setFont("Helvetica-Bold", 10)
@@ -466,41 +548,39 @@ def draw_monthly_page(c, year, month, W, H):
         c.drawCentredString(grid_x + i*cell_w + cell_w/2, grid_top + 3*mm, d)
 
     # Grid
-    for r, week in enumerate(weeks):
-        for d_idx, day in enumerate(week):
-            x = grid_x + d_idx * cell_w
-            y = grid_top - (r+1) * cell_h
-            
-            c.setStrokeColor(SEPARATOR_COLOR)
-            c.setLineWidth(0.2)
+    for day, x, y, is_weekend in layout["cells"]:
+        c.setStrokeColor(SEPARATOR_COLOR)
+        c.setLineWidth(0.2)
+        
+        # Fill all cells with CARD_COLOR
+        c.setFillColor(CARD_COLOR)
+        c.rect(x, y, cell_w, cell_h, fill=1, stroke=1)
+        
+        if day != 0:
+            if is_weekend:
+                # Slightly darker for weekends
+                c.setFillColor(colors.HexColor("#EBE8D8"))
+                c.rect(x+0.2, y+0.2, cell_w-0.4, cell_h-0.4, fill=1, stroke=0)
             
-            # Fill all cells with CARD_COLOR
-            c.setFillColor(CARD_COLOR)
-            c.rect(x, y, cell_w, cell_h, fill=1, stroke=1)
+            c.setFillColor(LABEL_COLOR)
+            c.setFont("Helvetica-Bold", 12)
+            c.drawString(x + 3*mm, y + cell_h - 7*mm, str(day))
             
-            if day != 0:
-                dt = datetime(year, month, day)
-                if dt.weekday() >= 5:
-                    # Slightly darker for weekends
-                    c.setFillColor(colors.HexColor("#EBE8D8"))
-                    c.rect(x+0.2, y+0.2, cell_w-0.4, cell_h-0.4, fill=1, stroke=0)
-                
-                c.setFillColor(LABEL_COLOR)
-                c.setFont("Helvetica-Bold", 12)
-                c.drawString(x + 3*mm, y + cell_h - 7*mm, str(day))
-                
-                # Link to Daily Page (Entire Cell)
-                c.linkRect("", f"Day_{year}_{month}_{day}", (x, y, x + cell_w, y + cell_h), Border='[0 0 0]')
+            # Link to Daily Page (Entire Cell)
+            if period.has_day(year, month, day):
+                link_rect(c, f"Day_{year}_{month}_{day}", (x, y, x + cell_w, y + cell_h))
     c.restoreState()
 
-def draw_daily_page(c, date, W, H):
+@traced
+@depends_on(lambda period, date, W, H: {"MONTH_COLORS": MONTH_COLORS[date.month-1]})
+def draw_daily_page(c, period, date, W, H):
     margin = 20 * mm
     month_color = MONTH_COLORS[date.month-1]
     c.saveState()
     
-    # Background
-    c.setFillColor(BACKGROUND_COLOR)
-    c.rect(0, 0, W, H, fill=1, stroke=0)
+    # Background, Side Tabs & Navigation Tabs
+    draw_page_chrome(c, W, H, period.months, current_month=(date.year, date.month), color=month_color,
+                     neighbors=period.neighbors)
     
     # Header (Native iPadOS Style)
     date_str = date.strftime("%A, %B %d").upper()
@@ -525,17 +605,6 @@ def draw_daily_page(c, date, W, H):
     c.setFont("Helvetica", 12)
     c.drawString(margin + 5*mm + c.stringWidth(date_str + " ", "Helvetica-Bold", 12), text_y, year_str)
     
-    # Side Tabs
-    draw_side_tabs(c, W, H, current_month=date.month)
-    
-    # Navigation Tabs
-    tab_w = 32 * mm
-    gap = 3 * mm
-    r_margin = 15 * mm
-    draw_apple_tab(c, W - r_margin - tab_w*3 - gap*2, H - 22*mm, tab_w, 9*mm, "Calendar", destination="YearlySummary", color=month_color, icon_key="calendar")
-    draw_apple_tab(c, W - r_margin - tab_w*2 - gap, H - 22*mm, tab_w, 9*mm, "Summary", destination="SixMonth_1", color=month_color, icon_key="overview")
-    draw_apple_tab(c, W - r_margin - tab_w, H - 22*mm, tab_w, 9*mm, "Tracker", destination="YearlyTracker", color=month_color, icon_key="goals")
-    
     # Layout: 3 Columns
     col_gap = 10 * mm
     col1_w = (W - 2*margin - 2*col_gap) * 0.30 # To Do
@@ -650,10 +719,10 @@ def draw_daily_page(c, date, W, H):
     c.line(x3 + 12*mm, top_y - sched_padding_top, x3 + 12*mm, bottom_y + sched_padding_bottom)
     c.setStrokeAlpha(1.0)
 
-    # Year Progress Bar (Centered at Bottom)
-    day_of_year = date.timetuple().tm_yday
-    total_days = 365
-    progress = day_of_year / total_days
+    # Progress Bar through the planner (Centered at Bottom)
+    day_number = date.toordinal() - period.first.toordinal() + 1
+    total_days = period.last.toordinal() - period.first.toordinal() + 1
+    progress = day_number / total_days
     
     bar_w = 80 * mm
     bar_h = 1.2 * mm
@@ -680,52 +749,147 @@ def draw_daily_page(c, date, W, H):
 
     c.restoreState()
 
-def generate_year_pdf(year, out_path):
+def range_page_plan(first, last, W, H):
+    """
+    Returns the page plan of a planner from the date first to the date last:
+    (destination, draw_func, args) per page. After the cover, each period of
+    up to 12 months has its calendar, overviews and tracker, then its monthly
+    and daily pages.
+    """
+    periods = planner_periods(first, last)
+    # The cover leads to each period of a planner spanning several
+    cover_periods = tuple((p.key, period_label(p.months)) for p in periods) if len(periods) > 1 else ()
+    pages = [
+        # 1. Cover
+        ("Cover", draw_cover, (W, H, year_label([(first.year, 1), (last.year, 1)]), cover_periods)),
+    ]
+    for period in periods:
+        key = period.key
+        # 2. Calendar
+        pages.append((f"YearlySummary_{key}", draw_summary_page, (period, W, H)))
+        # 3. Six-Month Overviews
+        for start in range(0, len(period.months), 6):
+            pages.append(("SixMonth_%d_%d" % period.months[start], draw_six_month_overview, (period, start, W, H)))
+        # 4. Tracker
+        pages.append((f"YearlyTracker_{key}", draw_yearly_tracker, (period, W, H)))
+
+        # 5. Monthly & Daily Pages
+        for year, month in period.months:
+            pages.append((f"Month_{year}_{month}", draw_monthly_page, (period, year, month, W, H)))
+            for day in range(1, year_model(year).days_in_month[month] + 1):
+                if period.has_day(year, month, day):
+                    pages.append((f"Day_{year}_{month}_{day}", draw_daily_page, (period, datetime(year, month, day), W, H)))
+    return pages
+
+def year_page_plan(year, W, H):
+    """Returns the page plan of a yearly planner: (destination, draw_func, args) per page."""
+    return range_page_plan(date(year, 1, 1), date(year, 12, 31), W, H)
+
+def _year_chunks(pages):
+    """Splits a planner plan into (start, stop) ranges: front matter, then one per month."""
+    starts = [0] + [i for i, (dest, draw_func, args) in enumerate(pages) if dest.startswith("Month_")]
+    return list(zip(starts, starts[1:] + [len(pages)]))
+
+def _render_chunk(pages, trace=False):
     W, H = IPAD_PRO_11_LANDSCAPE
-    c = canvas.Canvas(out_path, pagesize=(W, H))
-    
-    # 1. Cover
-    c.bookmarkPage("Cover")
-    draw_cover(c, W, H, f"{year}")
-    c.showPage()
-    
-    # 2. Yearly Summary
-    c.bookmarkPage("YearlySummary")
-    draw_summary_page(c, year, W, H)
-    c.showPage()
-    
-    # 3. Six-Month Overviews
-    c.bookmarkPage("SixMonth_1")
-    draw_six_month_overview(c, year, 1, W, H)
-    c.showPage()
-    c.bookmarkPage("SixMonth_7")
-    draw_six_month_overview(c, year, 7, W, H)
-    c.showPage()
-
-    # 4. Yearly Tracker
-    c.bookmarkPage("YearlyTracker")
-    draw_yearly_tracker(c, year, W, H)
-    c.showPage()
-    
-    # 5. Monthly & Daily Pages
-    start_date = datetime(year, 1, 1)
-    end_date = datetime(year, 12, 31)
-    
-    current_month = 0
-    curr = start_date
-    while curr <= end_date:
-        if curr.month != current_month:
-            current_month = curr.month
-            c.bookmarkPage(f"Month_{current_month}")
-            draw_monthly_page(c, year, current_month, W, H)
-            c.showPage()
-        
-        c.bookmarkPage(f"Day_{year}_{curr.month}_{curr.day}")
-        draw_daily_page(c, curr, W, H)
-        c.showPage()
-        curr += timedelta(days=1)
-        
+    tracer = Tracer() if trace else None
+    data = render_pages(pages, (W, H), tracer=tracer, invariant=1)
+    return data, tracer.spans if tracer else None
+
+def _generate(pages, out_path, jobs, tracer, incremental, streaming, named_destinations, compact, progress):
+    """Writes a planner page plan to out_path (see generate_range_pdf)."""
+    W, H = IPAD_PRO_11_LANDSCAPE
+    if progress is not None:
+        progress.start(len(pages))
+    if incremental:
+        return build_incremental(pages, (W, H), out_path, tracer=tracer,
+                                 named_destinations=named_destinations, compact=compact, progress=progress)
+    
+    if streaming:
+        parts = (render_pages(pages[start:stop], (W, H), tracer=tracer, progress=progress, invariant=1)
+                 for start, stop in _year_chunks(pages))
+        write_streaming(parts, out_path, len(pages), plan_destinations(pages), named_destinations, compact)
+        return
+    
+    if jobs > 1:
+        chunks = [(pages[start:stop], tracer is not None) for start, stop in _year_chunks(pages)]
+        def rendered(i, result):
+            # Chunks render in other processes: progress moves a month at a time
+            if progress is not None:
+                progress.advance(len(chunks[i][0]))
+                progress.check()
+        results = render_parallel(_render_chunk, chunks, jobs, on_result=rendered)
+        if tracer is not None:
+            for data, spans in results:
+                tracer.extend(spans)
+        with tracer.span(None, "merge", "merge") if tracer else nullcontext():
+            doc = merge_rendered([data for data, spans in results], plan_destinations(pages), named_destinations)
+            if compact:
+                deduplicate(doc)
+            doc.write(out_path, object_streams=compact)
+        return
+    
+    c = StateCanvas(out_path, pagesize=(W, H), invariant=1)
+    attach(c, tracer)
+    draw_pages(c, pages, progress)
+    if named_destinations:
+        export_destinations(c)
     c.save()
+    if compact:
+        with tracer.span(None, "compact", "merge") if tracer else nullcontext():
+            compact_pdf(out_path)
+
+def _build_mode(jobs=1, incremental=False, streaming=False, **kwargs):
+    """
+    How _generate writes a planner: merged chunks and streamed months lay out
+    the same pages in different objects, and are cached apart from serial builds.
+    """
+    if incremental:
+        # Writes the same bytes as a serial build
+        return "serial"
+    if streaming:
+        return "streaming"
+    return "parallel" if jobs > 1 else "serial"
+
+@cached_output("planner", key_args=("year", "named_destinations", "compact"), build_mode=_build_mode)
+def generate_year_pdf(year, out_path, jobs=1, tracer=None, incremental=False, streaming=False,
+                      named_destinations=False, compact=False, progress=None):
+    """
+    Generates the planner for a year. With jobs > 1 the front matter and each
+    month are rendered in worker processes and merged into the same document.
+    An optional Tracer records spans for every page and draw call, and an
+    optional cache=OutputCache(...) serves unchanged outputs from disk.
+    With incremental, only the pages whose inputs changed since the last
+    incremental build of out_path are rendered; returns the reused/rebuilt counts.
+    With streaming, each month is written to out_path as soon as it is drawn,
+    so memory use does not grow with the number of pages (jobs is ignored).
+    Links always point at their target page directly; with named_destinations
+    every page destination is also listed by name, for links such as
+    planner.pdf#Day_2027_1_5 from other apps. With compact, duplicate objects
+    are merged and the file is written with object streams and a
+    cross-reference stream (PDF 1.5). An optional Progress is told of every
+    page drawn (of every month with jobs > 1) and can cancel the generation
+    between pages.
+    """
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return _generate(year_page_plan(year, W, H), out_path, jobs, tracer, incremental, streaming,
+                     named_destinations, compact, progress)
+
+@cached_output("planner_range", key_args=("first", "last", "named_destinations", "compact"),
+               build_mode=_build_mode)
+def generate_range_pdf(first, last, out_path, jobs=1, tracer=None, incremental=False, streaming=False,
+                       named_destinations=False, compact=False, progress=None):
+    """
+    Generates a planner from the date first to the date last, e.g. an
+    academic year from September to August or several years. Its months are
+    split into periods of 12 (see planner_periods), each with its own
+    calendar, overviews, tracker and side tabs. The options are those of
+    generate_year_pdf; the year planner is the range from January 1 to
+    December 31.
+    """
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return _generate(range_page_plan(first, last, W, H), out_path, jobs, tracer, incremental, streaming,
+                     named_destinations, compact, progress)
 
 if __name__ == "__main__":
     # Default to next year if run directly
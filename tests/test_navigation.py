@@ -0,0 +1,37 @@
+"""Every page of a planner must be reachable by links from the cover."""
+from datetime import date
+
+from planner import generate_range_pdf
+from planner.core.pdffile import read_pdf
+
+def link_targets(doc):
+    """Returns the indexes of the pages each page links to."""
+    page_refs = doc.page_refs()
+    index = {ref.num: i for i, ref in enumerate(page_refs)}
+    targets = []
+    for ref in page_refs:
+        pages = set()
+        for annot in doc.get(doc.get(ref).get("Annots", [])):
+            annot = doc.get(annot)
+            dest = doc.get(annot.get("Dest") or doc.get(annot.get("A", {})).get("D"))
+            if isinstance(dest, list):
+                pages.add(index[dest[0].num])
+        targets.append(pages)
+    return targets
+
+def reachable(targets, start=0):
+    seen = {start}
+    stack = [start]
+    while stack:
+        for page in targets[stack.pop()]:
+            if page not in seen:
+                seen.add(page)
+                stack.append(page)
+    return seen
+
+def test_range_spanning_periods_is_navigable(tmp_path):
+    path = tmp_path / "range.pdf"
+    generate_range_pdf(date(2026, 3, 10), date(2027, 4, 5), str(path))
+    targets = link_targets(read_pdf(path.read_bytes()))
+    assert len(targets) == 414
+    assert reachable(targets) == set(range(len(targets)))
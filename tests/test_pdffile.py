@@ -0,0 +1,104 @@
+"""
+The PDF reader and writer (planner/core/pdffile.py), checked against what
+reportlab writes: documents read back, merged or spliced must draw the same
+pages with the same link targets as a serial build.
+"""
+from datetime import date
+
+import pytest
+
+from planner.core.constants import IPAD_PRO_11_LANDSCAPE
+from planner.core.pdffile import (PDFStream, Parser, deduplicate, page_xobjects, read_pdf,
+                                  resolve_named_destinations, serialize, splice_pages)
+from planner.core.render import merge_rendered, plan_destinations, render_pages
+from planner.templates.planner import _year_chunks, range_page_plan
+
+@pytest.fixture(scope="module")
+def plan():
+    W, H = IPAD_PRO_11_LANDSCAPE
+    return range_page_plan(date(2026, 1, 1), date(2026, 2, 28), W, H)
+
+@pytest.fixture(scope="module")
+def serial(plan):
+    return render_pages(plan, IPAD_PRO_11_LANDSCAPE, invariant=1)
+
+def _decoded(doc, obj):
+    obj = doc.get(obj)
+    if isinstance(obj, PDFStream):
+        return obj.decoded()
+    return b"\n".join(doc.get(part).decoded() for part in obj or [])
+
+def _forms(doc, xobjects):
+    """{name: (decoded data, forms it draws)} of XObject resources, following nested forms."""
+    forms = {}
+    for name, ref in xobjects.items():
+        form = doc.get(ref)
+        resources = doc.get(form.dict.get("Resources", {}))
+        forms[name] = (form.decoded(), _forms(doc, doc.get(resources.get("XObject", {}))))
+    return forms
+
+def rendered_pages(doc):
+    """
+    Describes every page by what it draws: its content, the forms it draws
+    and its links as (rect, target page index).
+    """
+    page_refs = doc.page_refs()
+    index = {ref.num: i for i, ref in enumerate(page_refs)}
+    pages = []
+    for ref in page_refs:
+        page = doc.get(ref)
+        links = []
+        for annot in doc.get(page.get("Annots", [])):
+            annot = doc.get(annot)
+            dest = doc.get(annot.get("Dest") or doc.get(annot.get("A", {})).get("D"))
+            rect = tuple(round(v, 2) for v in doc.get(annot["Rect"]))
+            links.append((rect, index[dest[0].num]))
+        pages.append((_decoded(doc, page["Contents"]), _forms(doc, page_xobjects(doc, ref)), sorted(links)))
+    return pages
+
+@pytest.mark.parametrize("object_streams", [False, True])
+def test_round_trip(serial, object_streams):
+    doc = read_pdf(serial)
+    data = doc.tobytes(object_streams=object_streams)
+    assert (b"/ObjStm" in data) == object_streams
+    again = read_pdf(data)
+    assert sorted(again.objects) == sorted(doc.objects)
+    assert rendered_pages(again) == rendered_pages(doc)
+    # Writing what was read back gives the same bytes
+    assert again.tobytes(object_streams=object_streams) == data
+
+@pytest.mark.parametrize("value", [b"plain", b"(nested) \\ escapes", b"line\nbreak", b"cr\r\nlf\r", b"\x00\xff binary"])
+def test_strings_round_trip(value):
+    assert Parser(serialize(value)).parse() == value
+
+def test_literal_strings_escape_cr():
+    # Readers take a raw CR in a literal string for LF
+    assert serialize(b"a\rb") == b"(a\\rb)"
+
+def _merged(plan):
+    parts = [render_pages(plan[start:stop], IPAD_PRO_11_LANDSCAPE, invariant=1)
+             for start, stop in _year_chunks(plan)]
+    assert len(parts) > 2
+    return merge_rendered(parts, plan_destinations(plan))
+
+def test_merge_keeps_link_targets(plan, serial):
+    assert rendered_pages(read_pdf(_merged(plan).tobytes())) == rendered_pages(read_pdf(serial))
+
+def test_splice_keeps_link_targets(plan, serial):
+    replaced = [0, 3, 10, 40, len(plan) - 1]
+    new = read_pdf(render_pages([plan[i] for i in replaced], IPAD_PRO_11_LANDSCAPE, invariant=1))
+    doc = splice_pages(read_pdf(serial), new, {i: j for j, i in enumerate(replaced)})
+    resolve_named_destinations(doc, plan_destinations(plan))
+    assert rendered_pages(read_pdf(doc.tobytes())) == rendered_pages(read_pdf(serial))
+
+@pytest.mark.parametrize("build", ["serial", "merged"])
+def test_deduplicate_keeps_pages(plan, serial, build):
+    doc = read_pdf(serial) if build == "serial" else _merged(plan)
+    before = rendered_pages(doc)
+    count = len(doc.objects)
+    removed = deduplicate(doc)
+    if build == "merged":
+        # Every chunk brings its own fonts and link border
+        assert removed > 0 and len(doc.objects) < count
+    assert rendered_pages(doc) == before
+    assert rendered_pages(read_pdf(doc.tobytes(object_streams=True))) == before